@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import discord
+
+from ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+EVENT_TITLES = {
+    "created": "⚔️ **Tier Challenge Created**",
+    "accepted": "✅ **Tier Challenge Accepted**",
+    "matched": "🎯 **Matchmaking Battle Started**",
+    "expired": "🚫 **Tier Challenge Expired**",
+    "completed": "🏁 **Tier Battle Completed**",
+}
+
+# Discord limits: 4096 chars per embed description, 10 embeds and 6000
+# embed chars per message
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBEDS_PER_MESSAGE = 10
+MESSAGE_EMBED_CHARS = 6000
+
+
+@dataclass(frozen=True)
+class AdminEvent:
+    kind: str
+    fields: Tuple[Tuple[str, str], ...]
+
+    def render(self) -> str:
+        title = EVENT_TITLES.get(self.kind, f"**{self.kind}**")
+        return f"{title} — " + " · ".join(f"**{k}:** {v}" for k, v in self.fields)
+
+
+class AdminLogDispatcher:
+    """Sends admin-log events from a background task, off the command path.
+
+    ``emit()`` never awaits and never raises: events go into a bounded queue
+    (and are dropped and counted if it is full). Every ``interval`` seconds
+    the worker merges whatever has queued into multi-line embeds, paced by
+    the channel's TokenBucket. A slow or failing admin channel only delays
+    the log, never the player-facing command.
+    """
+
+    def __init__(
+        self,
+        bot: discord.Client,
+        channel_id: int,
+        interval: float = 3.0,
+        max_queue: int = 500,
+        bucket: TokenBucket | None = None,
+    ):
+        self.bot = bot
+        self.channel_id = channel_id
+        self.interval = interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._bucket = bucket or TokenBucket()
+        self._channel: discord.TextChannel | None = None
+        self._task: asyncio.Task | None = None
+
+        self.emitted = 0
+        self.dropped = 0
+        self.messages_sent = 0
+        self.send_failures = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def emit(self, kind: str, **fields) -> None:
+        """Queue an event, e.g. ``emit("created", challenger=a.mention, challenged=b.mention)``."""
+        event = AdminEvent(kind, tuple((k.title(), str(v)) for k, v in fields.items()))
+        try:
+            self._queue.put_nowait(event)
+            self.emitted += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "emitted": self.emitted,
+            "dropped": self.dropped,
+            "messages_sent": self.messages_sent,
+            "send_failures": self.send_failures,
+        }
+
+    def _resolve_channel(self) -> discord.TextChannel | discord.PartialMessageable | None:
+        if self._channel is None:
+            ch = self.bot.get_channel(self.channel_id)
+            if ch is None:
+                # Not cached here: the leader logs every guild's expiries, including
+                # guilds on other shards or processes, so go over REST
+                return self.bot.get_partial_messageable(self.channel_id)
+            self._channel = ch if isinstance(ch, discord.TextChannel) else None
+        return self._channel
+
+    @staticmethod
+    def _build_messages(events: List[AdminEvent]) -> List[List[discord.Embed]]:
+        """Pack rendered events into as few messages as Discord's embed limits allow."""
+        messages: List[List[discord.Embed]] = []
+        embeds: List[discord.Embed] = []
+        lines: List[str] = []
+        embed_size = message_size = 0
+
+        def close_embed():
+            nonlocal lines, embed_size, message_size
+            embeds.append(discord.Embed(description="\n".join(lines), color=discord.Color.dark_red()))
+            message_size += embed_size
+            lines, embed_size = [], 0
+
+        for event in events:
+            line = event.render()[:EMBED_DESCRIPTION_LIMIT]
+            cost = len(line) + 1
+            if lines and (embed_size + cost > EMBED_DESCRIPTION_LIMIT or message_size + embed_size + cost > MESSAGE_EMBED_CHARS):
+                close_embed()
+            if embeds and (len(embeds) == EMBEDS_PER_MESSAGE or message_size + cost > MESSAGE_EMBED_CHARS):
+                messages.append(embeds)
+                embeds, message_size = [], 0
+            lines.append(line)
+            embed_size += cost
+        if lines:
+            close_embed()
+        if embeds:
+            messages.append(embeds)
+        return messages
+
+    async def _run(self) -> None:
+        while True:
+            events = [await self._queue.get()]
+            await asyncio.sleep(self.interval)
+            while not self._queue.empty():
+                events.append(self._queue.get_nowait())
+
+            channel = self._resolve_channel()
+            if channel is None:
+                self.dropped += len(events)
+                continue
+
+            for embeds in self._build_messages(events):
+                await self._bucket.acquire()
+                try:
+                    await channel.send(embeds=embeds)
+                    self.messages_sent += 1
+                except discord.HTTPException:
+                    self.send_failures += 1
+                    log.exception("admin log send failed")
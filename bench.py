@@ -0,0 +1,427 @@
+"""Offline benchmarks: no Discord connection, no tokens.
+
+    python bench.py load [--players 200] [--rounds 5] [--rtt-ms 0] [--guilds 1,2]
+    python bench.py db [--sizes 1000,100000,1000000]
+    python bench.py all --out bench_output.txt
+
+``load`` runs the real Tier and General cogs against fake interactions,
+members and DMs. Player pairs play full rounds concurrently: /tier, DM
+"accept", /battlecomplete plus the winner button, /points, /leaderboard
+and /redeem, spread over the guilds given by --guilds (or $BENCH_GUILDS).
+It reports throughput, p50/p99 latency per step, and how long the event
+loop was blocked. config.py is not read: the cogs get a stand-in with
+those guilds and every channel off, so the bench runs before the real
+IDs are filled in.
+
+``db`` seeds a scratch database at each size and times every DataStore
+method, plus the in-memory PointsCache queries, with plain synchronous
+calls. It ends with a season rollover of the whole seeded guild, timing
+each of its steps.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import types
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from cache import PointsCache
+from storage import AsyncDataStore, DataStore, battle_id, now_ms, to_ms
+
+
+def pct(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+
+# ----------------------------
+# Fake Discord layer
+# ----------------------------
+class FakeUser:
+    bot = False
+    roles: list = []
+
+    def __init__(self, uid: int, rtt: float = 0.0):
+        self.id = uid
+        self.name = self.display_name = f"player{uid}"
+        self.mention = f"<@{uid}>"
+        self.rtt = rtt
+        self.dms = 0
+
+    async def send(self, content=None, **kwargs):
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        self.dms += 1
+
+
+class FakeResponse:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.sent: dict | None = None
+
+    def is_done(self) -> bool:
+        return self.sent is not None
+
+    async def send_message(self, content=None, **kwargs):
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        self.sent = dict(kwargs, content=content)
+
+    edit_message = send_message
+
+
+class FakeFollowup:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+
+    async def send(self, content=None, **kwargs):
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+
+
+class FakeInteraction:
+    guild = object()
+
+    def __init__(self, client, guild_id: int, user: FakeUser, rtt: float):
+        self.client = client
+        self.guild_id = guild_id
+        self.user = user
+        self.response = FakeResponse(rtt)
+        self.followup = FakeFollowup(rtt)
+        self.extras: dict = {}
+
+
+class FakeDM:
+    guild = None
+
+    def __init__(self, author: FakeUser, content: str):
+        self.author = author
+        self.content = content
+
+
+class FakeBot:
+    """Just enough of commands.Bot for the cogs, NameCache and the dispatchers."""
+
+    latency = 0.0
+    coordinator = None
+    is_leader = True
+
+    def __init__(self, store: AsyncDataStore):
+        self.store = store
+        self.users: Dict[int, FakeUser] = {}
+        self.cogs: dict = {}
+
+    def get_user(self, uid: int):
+        return self.users.get(uid)
+
+    def get_guild(self, guild_id: int):
+        return None
+
+    def get_channel(self, channel_id):
+        return None  # admin log, welcome and leaderboard channels are off
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+    def add_listener(self, func, name=None):
+        pass
+
+
+# ----------------------------
+# Load simulation
+# ----------------------------
+class LoopMonitor:
+    """Samples event-loop lateness; any delay past ``interval`` counts as blocked time."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.blocked = 0.0
+        self.worst = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        self._task.cancel()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            late = max(0.0, loop.time() - expected)
+            self.blocked += late
+            self.worst = max(self.worst, late)
+
+
+def use_guilds(guild_ids: List[int]) -> None:
+    """Stand in for config.py, serving ``guild_ids`` with no admin roles and every channel off."""
+    config = types.ModuleType("config")
+    config.GUILD_CONFIGS = [
+        types.SimpleNamespace(
+            guild_id=gid,
+            admin_role_ids=frozenset(),
+            admin_log_channel_id=None,
+            announcement_channel_id=None,
+            welcome_channel_id=None,
+            rules_image_channel_id=None,
+            leaderboard_channel_id=None,
+        )
+        for gid in guild_ids
+    ]
+    config.GUILDS = {cfg.guild_id: cfg for cfg in config.GUILD_CONFIGS}
+    config.LEGACY_GUILD_ID = guild_ids[0]
+    config.guild_objects = lambda: []
+    sys.modules["config"] = config
+
+
+async def run_load(players: int, rounds: int, rtt_ms: float, guild_ids: List[int], out: Callable[[str], None]) -> None:
+    # The cogs import config; it must be replaced before they are
+    use_guilds(guild_ids)
+    from general import General
+    from names import NameCache
+    from tier import Tier
+
+    rtt = rtt_ms / 1000
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    store = AsyncDataStore(os.path.join(tmp, "load.sqlite3"))
+    await store.warm()
+    bot = FakeBot(store)
+    names = NameCache(bot, store)
+    tier = Tier(bot, store, names)
+    general = General(bot, store, names)
+    bot.cogs = {"Tier": tier, "General": general}
+    await tier.cog_load()
+    await general.cog_load()
+
+    tier_cmds = {c.name: c for c in tier.get_app_commands()}
+    general_cmds = {c.name: c for c in general.get_app_commands()}
+    users = [FakeUser(10_000 + i, rtt) for i in range(players - players % 2)]
+    bot.users = {u.id: u for u in users}
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+
+    async def timed(step: str, coro):
+        started = time.perf_counter()
+        await coro
+        latencies[step].append(time.perf_counter() - started)
+
+    async def command(cog, cmds, name: str, guild_id: int, user: FakeUser, **params) -> FakeInteraction:
+        interaction = FakeInteraction(bot, guild_id, user, rtt)
+        await timed(f"/{name}", cmds[name].callback(cog, interaction, **params))
+        return interaction
+
+    async def play(guild_id: int, a: FakeUser, b: FakeUser) -> None:
+        for _ in range(rounds):
+            await command(tier, tier_cmds, "tier", guild_id, a, member=b)
+            # A DM from someone without a challenge exercises the fast-path reject
+            await timed("dm (no challenge)", tier.on_message(FakeDM(a, "hello")))
+            await timed("dm accept", tier.on_message(FakeDM(b, "accept")))
+
+            done = await command(tier, tier_cmds, "battlecomplete", guild_id, a, member=b)
+            view = done.response.sent.get("view")
+            if view is not None:
+                button = next(item for item in view.children if item.player is a)
+                await timed("winner button", button.callback(FakeInteraction(bot, guild_id, a, rtt)))
+                view.stop()
+
+            await command(general, general_cmds, "points", guild_id, a)
+            await command(general, general_cmds, "leaderboard", guild_id, b)
+            await command(general, general_cmds, "leaderboard", guild_id, a, around_me=True)
+            await command(general, general_cmds, "redeem", guild_id, b, item="custom_name")
+
+    monitor = LoopMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        play(guild_ids[i // 2 % len(guild_ids)], users[i], users[i + 1]) for i in range(0, len(users), 2)
+    ))
+    elapsed = time.perf_counter() - started
+    monitor.stop()
+
+    await store.flush()
+    writer = store.stats()
+    await general.cog_unload()
+    await tier.cog_unload()
+    store.close()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    total = sum(len(v) for v in latencies.values())
+    out(f"== load: {len(users)} players in {len(guild_ids)} guild(s), {rounds} rounds, simulated RTT {rtt_ms:g} ms ==")
+    out(f"{total} ops in {elapsed:.2f}s -> {total / elapsed:,.0f} ops/s")
+    out(f"event loop blocked {monitor.blocked * 1000:.1f} ms total "
+        f"({monitor.blocked / elapsed:.1%} of wall time), worst stall {monitor.worst * 1000:.1f} ms")
+    out(f"writer: {writer['ops']} ops in {writer['batches']} batches, "
+        f"commit p50 {writer['commit_ms_p50']:.2f} ms / p99 {writer['commit_ms_p99']:.2f} ms")
+    out(f"{'step':<22}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, samples in latencies.items():
+        out(f"{step:<22}{len(samples):>8}{pct(samples, 0.50) * 1000:>10.2f}"
+            f"{pct(samples, 0.99) * 1000:>10.2f}{max(samples) * 1000:>10.2f}")
+    out("")
+
+
+# ----------------------------
+# DataStore micro-benchmarks
+# ----------------------------
+BENCH_GUILD = 1
+
+def seed(store: DataStore, guild_id: int, rows: int) -> None:
+    """Fill every hot table with ``rows`` rows (pending/active/completed get half each)."""
+    now = now_ms()
+    half = rows // 2
+    with store.transaction() as con:
+        con.executemany(
+            "INSERT INTO points(guild_id, user_id, points) VALUES(?, ?, ?)",
+            ((guild_id, uid, random.randrange(1000)) for uid in range(rows)),
+        )
+        con.executemany(
+            "INSERT INTO pending(guild_id, challenged_id, challenger_id, created_at) VALUES(?, ?, ?, ?)",
+            ((guild_id, uid, uid + half, now) for uid in range(half)),
+        )
+        con.executemany(
+            "INSERT INTO reminders(guild_id, challenged_id, due_at) VALUES(?, ?, ?)",
+            ((guild_id, uid, now) for uid in range(half)),
+        )
+        con.executemany(
+            "INSERT INTO active(guild_id, battle_id, user_a, user_b, accepted_at) VALUES(?, ?, ?, ?, ?)",
+            ((guild_id, battle_id(uid, uid + rows), uid, uid + rows, now) for uid in range(half)),
+        )
+        con.executemany(
+            "INSERT INTO completed(guild_id, user_id) VALUES(?, ?)", ((guild_id, uid) for uid in range(half))
+        )
+    store._connect().execute("ANALYZE")
+
+
+def bench_op(fn: Callable[[], object], iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def run_db(sizes: List[int], iterations: int, out: Callable[[str], None]) -> None:
+    for rows in sizes:
+        tmp = tempfile.mkdtemp(prefix="bench-")
+        store = DataStore(os.path.join(tmp, "db.sqlite3"))
+        started = time.perf_counter()
+        seed(store, BENCH_GUILD, rows)
+        out(f"== db: {rows:,} rows (seeded in {time.perf_counter() - started:.1f}s) ==")
+
+        g = BENCH_GUILD
+        half = rows // 2
+        rand = lambda: random.randrange(rows)  # noqa: E731
+        old = to_ms(datetime(2000, 1, 1))
+        fresh = iter(range(rows * 3, rows * 4))
+        cache = PointsCache()
+        cache.load(store.all_points(g))
+
+        def accept_then_restore():
+            uid = next(fresh)
+            store.add_pending(g, uid, uid + 1)
+            store.accept_pending(g, uid)
+            store.remove_active(g, uid, uid + 1)
+
+        # (name, fn, iteration divisor): full-table reads run far fewer times
+        ops: List[Tuple[str, Callable[[], object], int]] = [
+            ("get_points", lambda: store.get_points(g, rand()), 1),
+            ("get_points_row", lambda: store.get_points_row(g, rand()), 1),
+            ("top_points(10)", lambda: store.top_points(g, 10), 1),
+            ("all_points", lambda: store.all_points(g), 0),
+            ("add_points", lambda: store.add_points(g, rand(), 1, "bench"), 1),
+            ("add_points_many(50)", lambda: store.add_points_many(g, [(rand(), 1) for _ in range(50)], "bench"), 10),
+            ("debit_points", lambda: store.debit_points(g, rand(), 1, "bench"), 1),
+            ("set_points", lambda: store.set_points(g, rand(), 500, "bench"), 1),
+            ("get_pending", lambda: store.get_pending(g, random.randrange(half or 1)), 1),
+            ("page_pending(first)", lambda: store.page_pending(g, None, 21), 1),
+            ("page_pending(user)", lambda: store.page_pending(g, None, 21, rand()), 1),
+            ("list_pending", lambda: store.list_pending(g), 0),
+            ("try_add_pending", lambda: store.try_add_pending(g, next(fresh), 1), 1),
+            ("accept_pending", accept_then_restore, 1),
+            ("get_active", lambda: (lambda u: store.get_active(g, u, u + rows))(random.randrange(half or 1)), 1),
+            ("page_active(first)", lambda: store.page_active(g, None, 21), 1),
+            ("page_active(user)", lambda: store.page_active(g, None, 21, rand()), 1),
+            ("mark_completed", lambda: store.mark_completed(g, rand()), 1),
+            ("import_rows(500)", lambda: store.import_rows(g, "points", [(rand(), random.randrange(1000)) for _ in range(500)], "bench"), 10),
+            ("page_completed", lambda: store.page_completed(g, random.randrange(rows), 21), 1),
+            ("next_due", store.next_due, 1),
+            ("expire_pending(none)", lambda: store.expire_pending(old), 1),
+            ("cache.rank", lambda: cache.rank(rand()), 1),
+            ("cache.top(10)", lambda: cache.top(10), 1),
+            ("cache.around(5)", lambda: cache.around(rand(), 5), 1),
+        ]
+
+        out(f"{'op':<24}{'iters':>7}{'p50 us':>11}{'p99 us':>11}{'ops/s':>12}")
+        for name, fn, divisor in ops:
+            n = max(3, iterations // divisor) if divisor else 3
+            samples = bench_op(fn, n)
+            out(f"{name:<24}{n:>7}{pct(samples, 0.50) * 1e6:>11.1f}"
+                f"{pct(samples, 0.99) * 1e6:>11.1f}{n / sum(samples):>12,.0f}")
+
+        # Last: it archives and resets the whole guild. Each step is one
+        # writer transaction, so the longest step is what other guilds wait
+        started = time.perf_counter()
+        season = store.begin_rollover(g)
+        samples = [time.perf_counter() - started]
+        while True:
+            started = time.perf_counter()
+            done = store.rollover_step(g, season)
+            samples.append(time.perf_counter() - started)
+            if done:
+                break
+        out(f"{'rollover (begin+steps)':<24}{len(samples):>7}{pct(samples, 0.50) * 1e6:>11.1f}"
+            f"{pct(samples, 0.99) * 1e6:>11.1f}{len(samples) / sum(samples):>12,.0f}")
+        out(f"rollover of {done[1]:,} players: {sum(samples):.2f}s in total, longest step {max(samples) * 1000:.1f} ms")
+        out("")
+        store.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("suite", choices=["load", "db", "all"], nargs="?", default="all")
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="simulated Discord API latency per send")
+    parser.add_argument(
+        "--guilds", default=os.environ.get("BENCH_GUILDS", "1"),
+        help="comma-separated guild IDs to spread the load over (default: $BENCH_GUILDS or 1)",
+    )
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--out", help="also append results to this file (e.g. bench_output.txt)")
+    args = parser.parse_args()
+
+    # The cogs load welcome.png/rules.png relative to the working directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sink = open(args.out, "a") if args.out else None
+
+    def out(line: str) -> None:
+        print(line)
+        if sink:
+            sink.write(line + "\n")
+
+    random.seed(0)
+    try:
+        if args.suite in ("load", "all"):
+            asyncio.run(run_load(args.players, args.rounds, args.rtt_ms, [int(g) for g in args.guilds.split(",")], out))
+        if args.suite in ("db", "all"):
+            run_db([int(s) for s in args.sizes.split(",")], args.iterations, out)
+    finally:
+        if sink:
+            sink.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
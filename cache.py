@@ -0,0 +1,134 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+
+class PointsCache:
+    """In-memory ``user_id -> points`` map mirroring the points table.
+
+    Once warmed the map serves every read. AsyncDataStore updates it before
+    queueing this process's writes; points written by other processes of a
+    cluster arrive through the change feed (``apply_changes()``), so
+    between polls the map can briefly lag the database.
+
+    A SortedList of ``(-points, user_id)`` keys is kept in step with the map
+    as an order-statistics index, so leaderboard and rank queries cost
+    O(log n) instead of a scan and sort.
+    """
+
+    def __init__(self):
+        self._points: Dict[int, int] = {}
+        self._ranked = SortedList()
+
+    def load(self, rows: Iterable[Tuple[int, int]]) -> None:
+        self._points = {uid: pts for uid, pts in rows}
+        self._ranked = SortedList((-pts, uid) for uid, pts in self._points.items())
+
+    def get(self, user_id: int) -> int:
+        return self._points.get(user_id, 0)
+
+    def set(self, user_id: int, points: int) -> None:
+        old = self._points.get(user_id)
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+        self._points[user_id] = points
+        self._ranked.add((-points, user_id))
+
+    def add(self, user_id: int, amount: int) -> int:
+        new_val = self._points.get(user_id, 0) + amount
+        self.set(user_id, new_val)
+        return new_val
+
+    def discard(self, user_id: int) -> None:
+        old = self._points.pop(user_id, None)
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+
+    def clear(self) -> None:
+        self._points.clear()
+        self._ranked.clear()
+
+    # ---------- ranking ----------
+    def rank_of_points(self, points: int) -> int:
+        """1-based rank for a score; tied players share the best rank."""
+        return self._ranked.bisect_left((-points,)) + 1
+
+    def rank(self, user_id: int) -> Optional[int]:
+        pts = self._points.get(user_id)
+        return None if pts is None else self.rank_of_points(pts)
+
+    def top(self, limit: int = 10) -> List[Tuple[int, int]]:
+        return [(uid, -neg) for neg, uid in self._ranked.islice(0, limit)]
+
+    def around(self, user_id: int, radius: int = 5) -> List[Tuple[int, int, int]]:
+        """``(rank, user_id, points)`` for the players within ``radius`` places of ``user_id``."""
+        pts = self._points.get(user_id)
+        if pts is None:
+            return []
+        pos = self._ranked.index((-pts, user_id))
+        start = max(0, pos - radius)
+        return [
+            (self.rank_of_points(-neg), uid, -neg)
+            for neg, uid in self._ranked.islice(start, pos + radius + 1)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+
+class BattleIndex:
+    """In-memory per-player view of the pending and active tables.
+
+    A challenged player maps to their PendingChallenge; both players of an
+    active battle map to the ActiveBattle. Either way the player is busy and
+    cannot be challenged.
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, object] = {}
+        self._active: Dict[int, object] = {}
+
+    def load(self, pending: Iterable, active: Iterable) -> None:
+        self._pending = {}
+        self._active = {}
+        for p in pending:
+            self.add_pending(p)
+        for a in active:
+            self.add_active(a)
+
+    def get(self, user_id: int):
+        return self._active.get(user_id) or self._pending.get(user_id)
+
+    def get_pending(self, challenged_id: int):
+        return self._pending.get(challenged_id)
+
+    def add_pending(self, pending) -> None:
+        self._pending[pending.challenged_id] = pending
+
+    def remove_pending(self, challenged_id: int) -> None:
+        self._pending.pop(challenged_id, None)
+
+    def clear_pending(self) -> None:
+        self._pending.clear()
+
+    def add_active(self, battle) -> None:
+        self._active[battle.user_a] = battle
+        self._active[battle.user_b] = battle
+
+    def get_active(self, user_a: int, user_b: int):
+        battle = self._active.get(user_a)
+        if battle is not None and user_b in (battle.user_a, battle.user_b):
+            return battle
+        return None
+
+    def remove_active(self, user_a: int, user_b: int) -> None:
+        for uid in (user_a, user_b):
+            battle = self._active.get(uid)
+            if battle is not None and {battle.user_a, battle.user_b} == {user_a, user_b}:
+                del self._active[uid]
+
+    def clear_active(self) -> None:
+        self._active.clear()
+
+    def counts(self) -> dict:
+        return {"pending": len(self._pending), "active": len(self._active) // 2}
@@ -0,0 +1,299 @@
+import argparse
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from cache import BattleIndex
+from storage import ActiveBattle, AsyncDataStore, DataStore, now_ms
+
+log = logging.getLogger(__name__)
+
+
+# ----------------------------
+# COORDINATION
+# ----------------------------
+
+class Coordinator:
+    """Per-process side of a cluster sharing one SQLite file.
+
+    Follows the change feed so this process's caches pick up writes made by
+    the others, and campaigns for a lease so exactly one process at a time
+    is the leader. Only the leader runs timed work (reminders, expiry,
+    leaderboard publishing, snapshots); a leader that stops renewing loses
+    the lease after ``ttl`` seconds and another process takes over.
+    """
+
+    def __init__(
+        self,
+        store: AsyncDataStore,
+        lease: str = "leader",
+        ttl: float = 15.0,
+        feed_interval: float = 0.25,
+        retain: float = 600.0,
+    ):
+        self.store = store
+        self.lease = lease
+        self.ttl = ttl
+        self.feed_interval = feed_interval
+        # Journal rows older than this are pruned by the leader
+        self.retain = retain
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._listeners: List[Callable[[bool], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def on_leadership(self, callback: Callable[[bool], None]) -> None:
+        """Register a plain callback run with the new state whenever leadership is won or lost."""
+        self._listeners.append(callback)
+
+    async def start(self) -> None:
+        await self.store.start_change_feed(self.feed_interval)
+        await self._campaign()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.store.stop_change_feed()
+        if self.is_leader:
+            # Hand over now instead of making the others wait out the TTL
+            await self.store.release_lease(self.lease, self.holder)
+            self._set_leader(False)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            await self._campaign()
+            if self.is_leader:
+                try:
+                    await self.store.prune_changes(time.time() - self.retain)
+                except Exception:
+                    log.exception("pruning the change journal failed")
+
+    async def _campaign(self) -> None:
+        try:
+            won = await self.store.acquire_lease(self.lease, self.holder, self.ttl)
+        except Exception:
+            # Could not renew: step down rather than risk two leaders
+            log.exception("lease renewal failed")
+            won = False
+        self._set_leader(won)
+
+    def _set_leader(self, leading: bool) -> None:
+        if leading == self.is_leader:
+            return
+        self.is_leader = leading
+        log.info("%s %s leadership", self.holder, "won" if leading else "lost")
+        for callback in self._listeners:
+            try:
+                callback(leading)
+            except Exception:
+                log.exception("leadership listener failed")
+
+
+# ----------------------------
+# LAUNCHER
+# ----------------------------
+
+def shard_groups(shard_count: int, processes: int) -> List[List[int]]:
+    """Split shard IDs into ``processes`` contiguous groups of near-equal size."""
+    size = math.ceil(shard_count / processes)
+    return [list(range(i, min(i + size, shard_count))) for i in range(0, shard_count, size)]
+
+
+def launch(shard_count: int, processes: int, restart_delay: float = 5.0) -> None:
+    """Run the bot as ``processes`` AutoShardedBot processes and restart any that exit."""
+    ctx = multiprocessing.get_context("spawn")
+    groups = shard_groups(shard_count, processes)
+    procs: Dict[int, multiprocessing.Process] = {}
+
+    def spawn(index: int) -> None:
+        ids = groups[index]
+        proc = ctx.Process(
+            target=_run_group,
+            args=(ids, shard_count, index),
+            name=f"shards-{ids[0]}-{ids[-1]}",
+        )
+        proc.start()
+        procs[index] = proc
+        print(f"🚀 Started {proc.name} (pid {proc.pid})")
+
+    for index in range(len(groups)):
+        spawn(index)
+
+    try:
+        while True:
+            time.sleep(1)
+            for index, proc in list(procs.items()):
+                if not proc.is_alive():
+                    print(f"⚠️ {proc.name} exited with {proc.exitcode}, restarting in {restart_delay:.0f}s")
+                    time.sleep(restart_delay)
+                    spawn(index)
+    except KeyboardInterrupt:
+        for proc in procs.values():
+            proc.terminate()
+        for proc in procs.values():
+            proc.join()
+
+
+def _run_group(shard_ids: List[int], shard_count: int, index: int) -> None:
+    import main  # imported here: main imports this module
+
+    main.run(shard_ids, shard_count, clustered=True, metrics_port=main.METRICS_PORT + index)
+
+
+# ----------------------------
+# FAKE SHARDS
+# ----------------------------
+# Processes that skip the gateway entirely and hammer a shared database
+# with the bot's own store calls, to check cache convergence and failover.
+
+FAKE_GUILDS = (1, 2)
+FAKE_PLAYERS = 50
+
+
+def _busy_map(battles: BattleIndex) -> dict:
+    return {uid: battles.get(uid) for uid in range(FAKE_PLAYERS)}
+
+
+def run_fake(processes: int, seconds: float, crash: bool) -> bool:
+    db_path = os.path.join(tempfile.mkdtemp(prefix="cluster-"), "fake.sqlite3")
+    DataStore(db_path).close()  # create the schema once, before the race
+
+    ctx = multiprocessing.get_context("spawn")
+    survivors = processes - 1 if crash else processes
+    barrier = ctx.Barrier(survivors)
+    # Set by the leader that crashes, so its successor does not follow it
+    crashed = ctx.Event() if crash else None
+    results = ctx.Queue()
+    epoch = time.time()
+    procs = [
+        ctx.Process(
+            target=_fake_shard,
+            args=(db_path, index, seconds, crashed, epoch, barrier, results),
+            name=f"fake-shard-{index}",
+        )
+        for index in range(processes)
+    ]
+    for proc in procs:
+        proc.start()
+    reports = [results.get() for _ in range(survivors)]
+    for proc in procs:
+        proc.join()
+
+    # The caches a freshly started process would warm from the final database
+    store = DataStore(db_path)
+    truth = {}
+    for gid in FAKE_GUILDS:
+        battles = BattleIndex()
+        battles.load(store.list_pending(gid), store.list_active(gid))
+        truth[gid] = (sorted(store.all_points(gid)), _busy_map(battles))
+    store.close()
+
+    ok = True
+    for index, state, history in sorted(reports):
+        converged = state == truth
+        ok = ok and converged
+        changes = ", ".join(f"{'won' if leading else 'lost'}@{at:.1f}s" for at, leading in history) or "never led"
+        print(f"shard {index}: caches {'match' if converged else 'DIVERGED from'} the database; leadership: {changes}")
+
+    # Leadership intervals must not overlap (allowing for clock jitter at hand-over)
+    spans = []
+    for _, _, history in reports:
+        won = None
+        for at, leading in history:
+            if leading:
+                won = at
+            elif won is not None:
+                spans.append((won, at))
+                won = None
+        if won is not None:
+            spans.append((won, math.inf))
+    spans.sort()
+    overlap = any(b[0] < a[1] - 0.05 for a, b in zip(spans, spans[1:]))
+    ok = ok and not overlap
+    if crash:
+        print("the first leader crashed mid-run without releasing its lease")
+    print(f"{'✅' if ok else '❌'} {survivors}/{processes} shards converged, leaders {'overlapped' if overlap else 'never overlapped'}")
+    return ok
+
+
+def _fake_shard(db_path, index, seconds, crashed, epoch, barrier, results) -> None:
+    asyncio.run(_fake_main(db_path, index, seconds, crashed, epoch, barrier, results))
+
+
+async def _fake_main(db_path, index, seconds, crashed, epoch, barrier, results) -> None:
+    store = AsyncDataStore(db_path, journal=True)
+    coordinator = Coordinator(store, ttl=1.5, feed_interval=0.1)
+    history = []
+    coordinator.on_leadership(lambda leading: history.append((time.time() - epoch, leading)))
+    await coordinator.start()
+    await store.warm()
+
+    rng = random.Random(index)
+    deadline = time.monotonic() + seconds
+    crash_at = time.monotonic() + seconds / 3
+    while time.monotonic() < deadline:
+        if crashed and coordinator.is_leader and time.monotonic() > crash_at and not crashed.is_set():
+            crashed.set()
+            os._exit(1)
+        gid = rng.choice(FAKE_GUILDS)
+        uid = rng.randrange(FAKE_PLAYERS)
+        roll = rng.random()
+        if roll < 0.5:
+            await store.add_points(gid, uid, rng.randint(1, 5), "fake")
+        elif roll < 0.7:
+            await store.debit_points(gid, uid, 3, "fake")
+        elif roll < 0.85:
+            opponent = rng.randrange(FAKE_PLAYERS)
+            if opponent != uid:
+                await store.challenge(gid, uid, opponent, created_at=now_ms())
+        elif roll < 0.95:
+            await store.accept_pending(gid, uid, now_ms())
+        else:
+            busy = await store.get_busy(gid, uid)
+            if isinstance(busy, ActiveBattle):
+                await store.remove_active(gid, busy.user_a, busy.user_b)
+        await asyncio.sleep(rng.uniform(0, 0.005))
+
+    # Everyone stops writing, then the feed gets a moment to catch up
+    await asyncio.to_thread(barrier.wait)
+    await asyncio.sleep(coordinator.feed_interval * 3)
+    while await store.apply_changes():
+        pass
+    state = {
+        gid: (sorted(store.points[gid].top(FAKE_PLAYERS)), _busy_map(store.battles[gid]))
+        for gid in FAKE_GUILDS
+    }
+    await coordinator.stop()
+    store.close()
+    results.put((index, state, history))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot as a multi-process shard cluster")
+    sub = parser.add_subparsers(dest="mode", required=True)
+    run_p = sub.add_parser("run", help="launch the real bot")
+    run_p.add_argument("--shards", type=int, required=True)
+    run_p.add_argument("--processes", type=int, required=True)
+    fake_p = sub.add_parser("fake", help="simulate shards against a temporary database")
+    fake_p.add_argument("--processes", type=int, default=3)
+    fake_p.add_argument("--seconds", type=float, default=6.0)
+    fake_p.add_argument("--crash", action="store_true", help="kill the leader a third of the way in")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.mode == "run":
+        launch(args.shards, args.processes)
+    else:
+        sys.exit(0 if run_fake(args.processes, args.seconds, args.crash) else 1)
@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional
+
+import discord
+
+
+@dataclass(frozen=True)
+class GuildConfig:
+    """Everything that differs between the servers one bot process serves."""
+
+    guild_id: int
+    # Role IDs allowed to use admin commands
+    admin_role_ids: FrozenSet[int]
+    admin_log_channel_id: Optional[int] = None
+    announcement_channel_id: Optional[int] = None
+    welcome_channel_id: Optional[int] = None
+    rules_image_channel_id: Optional[int] = None
+    # Optional: channel for a self-updating pinned leaderboard (None = off)
+    leaderboard_channel_id: Optional[int] = None
+
+
+# ----------------------------
+# CONFIG (one entry per server)
+# ----------------------------
+
+GUILD_CONFIGS = [
+    GuildConfig(
+        guild_id=1460697436262760460,
+        # 🔴 Role IDs allowed to use admin commands (can add more)
+        admin_role_ids=frozenset({
+            ID1,
+            ID2
+        }),
+        # 🔴 Channels
+        admin_log_channel_id=Admim Channel ID,
+        announcement_channel_id=Announcement Channel,
+        welcome_channel_id=Welcome Channel,
+        rules_image_channel_id=Rules_Image_Channel,
+        leaderboard_channel_id=None,
+    ),
+]
+
+GUILDS: Dict[int, GuildConfig] = {cfg.guild_id: cfg for cfg in GUILD_CONFIGS}
+
+# Data from before multi-guild support belongs to the first configured server
+LEGACY_GUILD_ID = GUILD_CONFIGS[0].guild_id
+
+
+def guild_objects() -> list[discord.Object]:
+    return [discord.Object(id=guild_id) for guild_id in GUILDS]
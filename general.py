@@ -1,25 +1,24 @@
+import asyncio
+import functools
+import os
+import shutil
+import tempfile
+import time
+from typing import Literal
+
 import discord
 from discord import app_commands
-from discord.ext import commands
-from storage import DataStore
-
-# ----------------------------
-# CONFIG
-# ----------------------------
-
-GUILD_ID = 1460697436262760460
-
-# 🔴 Role IDs allowed to use admin commands (can add more)
-ADMIN_ROLE_IDS = {
-    ID1,
-    ID2
-}
-
-# 🔴 Channels
-ANNOUNCEMENT_CHANNEL_ID = Announcement Channel
-WELCOME_CHANNEL_ID = Welcome Channel
-RULES_IMAGE_CHANNEL_ID = Rules_Image_Channel
-
+from discord.ext import commands, tasks
+from config import GUILDS, guild_objects
+from leaderboard import LiveLeaderboard
+from media import MediaCache
+from metrics import REGISTRY, instrument_commands
+from names import NameCache
+from transfer import detect_format, import_rows_async, read_rows, write_rows
+from welcome import WelcomePipeline
+from storage import AsyncDataStore
+
+TransferKind = Literal["points", "pending", "active", "completed"]
 
 # ----------------------------
 # ROLE CHECK
@@ -30,11 +29,15 @@ def has_admin_role():
         if not interaction.guild:
             return False
 
+        cfg = GUILDS.get(interaction.guild_id)
+        if cfg is None:
+            return False
+
         member = interaction.user
         if not isinstance(member, discord.Member):
             return False
 
-        return any(role.id in ADMIN_ROLE_IDS for role in member.roles)
+        return any(role.id in cfg.admin_role_ids for role in member.roles)
 
     return app_commands.check(predicate)
 
@@ -43,10 +46,22 @@ def has_admin_role():
 # GENERAL COG
 # ----------------------------
 
+@instrument_commands
 class General(commands.Cog):
-    def __init__(self, bot: commands.Bot):
+    def __init__(self, bot: commands.Bot, store: AsyncDataStore, names: NameCache):
         self.bot = bot
-        self.store = DataStore("bot_state.sqlite3")
+        self.store = store
+        self.names = names
+        self.media = MediaCache(store)
+        # Per guild: joins are coalesced per welcome channel, boards per server
+        self.welcomes = {
+            gid: WelcomePipeline(functools.partial(self._send_welcome, gid))
+            for gid in GUILDS
+        }
+        self.boards = {
+            gid: LiveLeaderboard(bot, store, names, gid, channel_id=cfg.leaderboard_channel_id)
+            for gid, cfg in GUILDS.items()
+        }
 
         self.shop_items = {
             "legacy-title": 250,
@@ -77,42 +92,203 @@ class General(commands.Cog):
     # ----------------------------
     # POINTS API
     # ----------------------------
-    def add_points(self, user_id: int, amount: int) -> int:
-        return self.store.add_points(user_id, amount)
+    async def add_points(self, guild_id: int, user_id: int, amount: int, reason: str = "adjust") -> int:
+        return await self.store.add_points(guild_id, user_id, amount, reason)
+
+    async def add_points_many(self, guild_id: int, deltas: list[tuple[int, int]], reason: str = "adjust") -> dict[int, int]:
+        return await self.store.add_points_many(guild_id, deltas, reason)
+
+    # ----------------------------
+    # LEDGER SNAPSHOTS
+    # ----------------------------
+    async def cog_load(self):
+        self.snapshot_ledger.start()
+        for pipeline in self.welcomes.values():
+            pipeline.start()
+        self.store.on_points_changed(self._points_changed)
+        if self.bot.coordinator:
+            self.bot.coordinator.on_leadership(self._leadership_changed)
+        REGISTRY.gauge(
+            "bot_welcome_queue", "Welcome queue depth per guild",
+            lambda: {gid: p.stats()["queue_depth"] for gid, p in self.welcomes.items()},
+        )
+        # Resize/recompress the static images once, before the first join
+        await self.media.prepare("welcome.png")
+        await self.media.prepare("rules.png")
+
+    async def cog_unload(self):
+        self.snapshot_ledger.cancel()
+        for pipeline in self.welcomes.values():
+            pipeline.stop()
+
+    def _points_changed(self, guild_id: int) -> None:
+        board = self.boards.get(guild_id)
+        if board:
+            board.mark_dirty()
+
+    def _leadership_changed(self, leading: bool) -> None:
+        # The new leader takes over the pinned boards (once the bot is ready)
+        if leading and getattr(self.bot, "_startup_checked", False):
+            for board in self.boards.values():
+                asyncio.create_task(board.start())
+
+    @tasks.loop(hours=6)
+    async def snapshot_ledger(self):
+        if not self.bot.is_leader:
+            return
+        for gid in GUILDS:
+            await self.store.snapshot_ledger(gid)
 
     # ----------------------------
     # /points
     # ----------------------------
     @app_commands.command(name="points", description="View your points")
     async def points_cmd(self, interaction: discord.Interaction):
-        pts = self.store.get_points(interaction.user.id)
+        pts = await self.store.get_points(interaction.guild_id, interaction.user.id)
         await interaction.response.send_message(f"⭐ You have **{pts} points**.")
 
     # ----------------------------
     # /leaderboard
     # ----------------------------
     @app_commands.command(name="leaderboard", description="View top players")
-    async def leaderboard(self, interaction: discord.Interaction):
-        top = self.store.top_points(limit=10)
-        if not top:
+    @app_commands.describe(
+        around_me="Show the players ranked around you instead of the top 10",
+        season="A past season's final standings (see /seasons)",
+    )
+    async def leaderboard(self, interaction: discord.Interaction, around_me: bool = False, season: app_commands.Range[int, 1] | None = None):
+        if season is not None:
+            return await self._leaderboard_season(interaction, season, around_me)
+        if around_me:
+            return await self._leaderboard_around(interaction)
+
+        # Served from the cached rendering; rebuilt only after points change
+        embed = await self.boards[interaction.guild_id].embed()
+        if not embed:
             return await interaction.response.send_message(
                 "❌ No points have been earned yet.",
                 ephemeral=True
             )
 
+        await interaction.response.send_message(embed=embed)
+
+    async def _leaderboard_around(self, interaction: discord.Interaction):
+        gid = interaction.guild_id
+        uid = interaction.user.id
+        rows = await self.store.points_around(gid, uid, radius=5)
+        if not rows:
+            return await interaction.response.send_message(
+                "❌ You don’t have any points yet.",
+                ephemeral=True
+            )
+
+        names = await self.names.resolve_many(gid, (row_uid for _, row_uid, _ in rows))
         lines = []
-        for i, (uid, pts) in enumerate(top, start=1):
-            user = self.bot.get_user(uid)
-            name = user.display_name if user else f"User {uid}"
-            lines.append(f"**#{i}** {name} — ⭐ {pts}")
+        for rank, row_uid, pts in rows:
+            line = f"**#{rank}** {names[row_uid]} — ⭐ {pts}"
+            lines.append(f"➤ {line}" if row_uid == uid else line)
 
         embed = discord.Embed(
-            title="🏆 Tier Leaderboard",
+            title="🏆 Players Around You",
             description="\n".join(lines),
             color=discord.Color.purple(),
         )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        await interaction.response.send_message(embed=embed)
+    async def _leaderboard_season(self, interaction: discord.Interaction, season: int, around_me: bool):
+        gid = interaction.guild_id
+        uid = interaction.user.id
+        if around_me:
+            rows = await self.store.season_around(gid, season, uid, radius=5)
+        else:
+            rows = await self.store.season_standings(gid, season, limit=10)
+        if not rows:
+            seasons = await self.store.list_seasons(gid)
+            if not any(number == season for number, _, _ in seasons):
+                msg = f"❌ There is no season {season} yet." + (f" Past seasons: 1–{seasons[-1][0]}." if seasons else "")
+            else:
+                msg = f"❌ You had no points in season {season}." if around_me else f"❌ Nobody earned points in season {season}."
+            return await interaction.response.send_message(msg, ephemeral=True)
+
+        names = await self.names.resolve_many(gid, (row_uid for _, row_uid, _ in rows))
+        lines = []
+        for rank, row_uid, pts in rows:
+            line = f"**#{rank}** {names[row_uid]} — ⭐ {pts}"
+            lines.append(f"➤ {line}" if row_uid == uid else line)
+
+        embed = discord.Embed(
+            title=f"🏆 Season {season} Final Standings",
+            description="\n".join(lines),
+            color=discord.Color.purple(),
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=around_me)
+
+    # ----------------------------
+    # /seasons, /endseason (ADMIN)
+    # ----------------------------
+    @app_commands.command(name="seasons", description="List past seasons")
+    async def seasons(self, interaction: discord.Interaction):
+        seasons = await self.store.list_seasons(interaction.guild_id)
+        if not seasons:
+            return await interaction.response.send_message("❌ No season has ended yet.", ephemeral=True)
+
+        embed = discord.Embed(
+            title="📚 Past Seasons",
+            description="\n".join(
+                f"• **Season {number}** — ended <t:{ended_at // 1000}:D>, {players:,} players"
+                for number, ended_at, players in seasons[-25:]
+            ),
+            color=discord.Color.blue(),
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="endseason", description="ADMIN: Archive the standings and reset points for a new season")
+    @has_admin_role()
+    async def endseason(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        started = time.perf_counter()
+        season, players = await self.store.rollover_season(interaction.guild_id)
+        await interaction.followup.send(
+            f"🏁 Season {season} archived with {players:,} players in {time.perf_counter() - started:.1f}s; "
+            f"points and completions are reset. Final standings: `/leaderboard season:{season}`.",
+            ephemeral=True,
+        )
+
+    # ----------------------------
+    # /rank
+    # ----------------------------
+    @app_commands.command(name="rank", description="View your leaderboard position")
+    async def rank(self, interaction: discord.Interaction, member: discord.Member | None = None):
+        gid = interaction.guild_id
+        target = member or interaction.user
+        rank = await self.store.get_rank(gid, target.id)
+        if rank is None:
+            return await interaction.response.send_message(
+                f"❌ {target.display_name} has no points yet.",
+                ephemeral=True
+            )
+
+        pts = await self.store.get_points(gid, target.id)
+        total = await self.store.player_count(gid)
+        await interaction.response.send_message(
+            f"🏅 {target.display_name} is ranked **#{rank}** of {total} with **{pts} points**."
+        )
+
+    # ----------------------------
+    # /rating
+    # ----------------------------
+    @app_commands.command(name="rating", description="View a player's Elo rating from tier battles")
+    async def rating(self, interaction: discord.Interaction, member: discord.Member | None = None):
+        target = member or interaction.user
+        rating, games, wins = await self.store.get_rating(interaction.guild_id, target.id)
+        if not games:
+            return await interaction.response.send_message(
+                f"❌ {target.display_name} has no rated battles yet.",
+                ephemeral=True
+            )
+
+        await interaction.response.send_message(
+            f"📈 {target.display_name} is rated **{rating:.0f}** ({wins}W–{games - wins}L over {games} battles)."
+        )
 
     # ----------------------------
     # /shop
@@ -144,15 +320,14 @@ class General(commands.Cog):
 
         cost = self.shop_items[item]
         uid = interaction.user.id
-        balance = self.store.get_points(uid)
 
-        if balance < cost:
+        # Single conditional debit: fails as a whole if the balance is too low
+        if await self.store.debit_points(interaction.guild_id, uid, cost, reason=f"redeem:{item}") is None:
             return await interaction.response.send_message(
                 "❌ Not enough points.",
                 ephemeral=True
             )
 
-        self.store.set_points(uid, balance - cost)
         await interaction.response.send_message(
             f"✅ Redeemed **{item}** for {cost} points."
         )
@@ -168,7 +343,7 @@ class General(commands.Cog):
                 "Amount must not be 0.", ephemeral=True
             )
 
-        new_total = self.store.add_points(member.id, amount)
+        new_total = await self.store.add_points(interaction.guild_id, member.id, amount, reason=f"admin:{interaction.user.id}")
         await interaction.response.send_message(
             f"✅ {member.mention} now has **{new_total}** points.",
             ephemeral=True
@@ -180,7 +355,7 @@ class General(commands.Cog):
     @app_commands.command(name="announce", description="ADMIN: Send announcement")
     @has_admin_role()
     async def announce(self, interaction, message: str):
-        channel = self.bot.get_channel(ANNOUNCEMENT_CHANNEL_ID)
+        channel = self.bot.get_channel(GUILDS[interaction.guild_id].announcement_channel_id)
         if not isinstance(channel, discord.TextChannel):
             return
 
@@ -192,29 +367,89 @@ class General(commands.Cog):
         await channel.send(embed=embed)
         await interaction.response.send_message("✅ Announcement sent.", ephemeral=True)
 
+    # ----------------------------
+    # /export, /import (ADMIN)
+    # ----------------------------
+    @app_commands.command(name="export", description="ADMIN: Download points or battle state as a file")
+    @app_commands.describe(kind="What to export", file_format="File format")
+    @app_commands.rename(file_format="format")
+    @has_admin_role()
+    async def export_cmd(self, interaction: discord.Interaction, kind: TransferKind, file_format: Literal["csv", "ndjson"] = "csv"):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        tmp = tempfile.mkdtemp(prefix="export-")
+        path = os.path.join(tmp, f"{kind}.{file_format}")
+
+        def sink(rows) -> int:
+            with open(path, "w", newline="", encoding="utf-8") as fp:
+                return write_rows(fp, file_format, kind, rows)
+
+        try:
+            count = await self.store.export_rows(interaction.guild_id, kind, sink)
+            await interaction.followup.send(f"📤 Exported {count:,} {kind} rows.", file=discord.File(path), ephemeral=True)
+        except discord.HTTPException:
+            await interaction.followup.send(
+                "❌ The export is too large to upload; run `python transfer.py export` on the host.", ephemeral=True
+            )
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @app_commands.command(name="import", description="ADMIN: Load points or battle state from a CSV/NDJSON file")
+    @app_commands.describe(kind="What the file contains", file="CSV with a header row, or NDJSON", dry_run="Only report what would change")
+    @has_admin_role()
+    async def import_cmd(self, interaction: discord.Interaction, kind: TransferKind, file: discord.Attachment, dry_run: bool = False):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        tmp = tempfile.mkdtemp(prefix="import-")
+        path = os.path.join(tmp, "upload")
+        last_update = time.monotonic()
+        committed = 0
+
+        async def progress(report) -> None:
+            nonlocal last_update, committed
+            committed = report.rows
+            if time.monotonic() - last_update >= 2:
+                last_update = time.monotonic()
+                await interaction.edit_original_response(content=f"⏳ {report.progress()}")
+
+        try:
+            await file.save(path)
+            with open(path, newline="", encoding="utf-8") as fp:
+                rows = read_rows(fp, detect_format(file.filename), kind)
+                report = await import_rows_async(self.store, interaction.guild_id, kind, rows, dry_run=dry_run, progress=progress)
+        except (ValueError, UnicodeDecodeError) as e:
+            note = f" ({committed:,} rows before it were committed)" if committed and not dry_run else ""
+            return await interaction.edit_original_response(content=f"❌ {file.filename}: {e}{note}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        await interaction.edit_original_response(content=f"{'🔎' if dry_run else '📥'} ```\n{report.summary()[:1900]}\n```")
+
     # ----------------------------
     # MEMBER JOIN WELCOME
     # ----------------------------
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
-        channel = self.bot.get_channel(WELCOME_CHANNEL_ID)
+        # Queued; joins that arrive together are welcomed in one message
+        pipeline = self.welcomes.get(member.guild.id)
+        if pipeline:
+            pipeline.submit(member)
+
+    async def _send_welcome(self, guild_id: int, members: list[discord.Member]):
+        channel = self.bot.get_channel(GUILDS[guild_id].welcome_channel_id)
         if not isinstance(channel, discord.TextChannel):
             return
 
         embed = discord.Embed(
             title="🎉 Welcome to KRYCORE Esports",
             description=(
-                f"Welcome {member.mention} to **KRYCORE Esports**.\n\n"
+                f"Welcome {', '.join(m.mention for m in members)} to **KRYCORE Esports**.\n\n"
                 "**Prepare to compete. Prepare to dominate.**"
             ),
             color=discord.Color.red()
         )
 
-        file = discord.File("welcome.png", filename="welcome.png")
-        embed.set_image(url="attachment://welcome.png")
         embed.set_footer(text="KRYCORE Esports • Official Community")
 
-        await channel.send(embed=embed, file=file)
+        await self.media.send(channel, embed, "welcome.png")
 
     # ----------------------------
     # STARTUP IMAGE (ONCE)
@@ -225,11 +460,15 @@ class General(commands.Cog):
             return
 
         self.bot._startup_checked = True
+        for gid in GUILDS:
+            await self.boards[gid].start()
+            await self._send_startup_image(gid)
 
-        if self.store.get_flag("startup_image_sent"):
+    async def _send_startup_image(self, guild_id: int):
+        if await self.store.get_flag(guild_id, "startup_image_sent"):
             return
 
-        channel = self.bot.get_channel(RULES_IMAGE_CHANNEL_ID)
+        channel = self.bot.get_channel(GUILDS[guild_id].rules_image_channel_id)
         if not isinstance(channel, discord.TextChannel):
             return
 
@@ -242,12 +481,10 @@ class General(commands.Cog):
             color=discord.Color.red()
         )
 
-        file = discord.File("rules.png", filename="rules.png")
-        embed.set_image(url="attachment://rules.png")
         embed.set_footer(text="KRYCORE Esports • System Message")
 
-        await channel.send(embed=embed, file=file)
-        self.store.set_flag("rules_sent", True)
+        await self.media.send(channel, embed, "rules.png")
+        await self.store.set_flag(guild_id, "rules_sent", True)
 
 
 # ----------------------------
@@ -255,6 +492,4 @@ class General(commands.Cog):
 # ----------------------------
 
 async def setup(bot: commands.Bot):
-    guild = discord.Object(id=GUILD_ID)
-
-    await bot.add_cog(General(bot), guild=guild)
+    await bot.add_cog(General(bot, bot.store, bot.names), guilds=guild_objects())
@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import logging
+
+import discord
+
+from ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+MESSAGE_SETTING = "leaderboard_message_id"
+
+
+class LiveLeaderboard:
+    """One guild's cached top-N leaderboard embed, optionally mirrored to a pinned message.
+
+    Points changes only mark the board dirty. The embed is re-rendered at
+    most once per ``debounce`` seconds, and the pinned message (when
+    ``channel_id`` is set) is edited only if the rendered text's hash
+    actually changed. ``/leaderboard`` reuses the cached embed instead of
+    rebuilding it on every call. In a multi-process cluster only the
+    leader (``bot.is_leader``) touches the pinned message.
+    """
+
+    def __init__(self, bot: discord.Client, store, names, guild_id: int, channel_id: int | None = None, limit: int = 10, debounce: float = 10.0):
+        self.bot = bot
+        self.store = store
+        self.names = names
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.limit = limit
+        self.debounce = debounce
+        self._bucket = TokenBucket()
+        self._embed: discord.Embed | None = None
+        self._hash: str | None = None
+        self._dirty = True
+        self._refresh_task: asyncio.Task | None = None
+        self._message: discord.Message | None = None
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+        if self.channel_id and self.bot.is_leader and self._refresh_task is None:
+            self._refresh_task = asyncio.get_running_loop().create_task(self._debounced_refresh())
+
+    async def embed(self) -> discord.Embed | None:
+        """The current leaderboard embed, or None when nobody has points."""
+        if self._dirty:
+            await self._render()
+        return self._embed
+
+    async def _render(self) -> bool:
+        """Rebuild the embed; returns True if its content changed."""
+        self._dirty = False
+        top = await self.store.top_points(self.guild_id, limit=self.limit)
+        names = await self.names.resolve_many(self.guild_id, (uid for uid, _ in top))
+        lines = [f"**#{i}** {names[uid]} — ⭐ {pts}" for i, (uid, pts) in enumerate(top, start=1)]
+
+        digest = hashlib.sha256("\n".join(lines).encode()).hexdigest()
+        if digest == self._hash:
+            return False
+        self._hash = digest
+        self._embed = discord.Embed(
+            title="🏆 Tier Leaderboard",
+            description="\n".join(lines),
+            color=discord.Color.purple(),
+        ) if lines else None
+        return True
+
+    # ---------- pinned message ----------
+    async def start(self) -> None:
+        """Find or create the pinned message and bring it up to date."""
+        if not self.channel_id or not self.bot.is_leader:
+            return
+        await self._render()
+        await self._publish()
+
+    async def _debounced_refresh(self) -> None:
+        try:
+            await asyncio.sleep(self.debounce)
+            self._refresh_task = None
+            if await self._render():
+                await self._publish()
+        except Exception:
+            log.exception("leaderboard refresh failed")
+
+    async def _resolve_message(self, channel: discord.abc.Messageable) -> discord.Message | None:
+        if self._message:
+            return self._message
+        message_id = await self.store.get_setting(self.guild_id, MESSAGE_SETTING)
+        if message_id:
+            try:
+                self._message = await channel.fetch_message(message_id)
+            except discord.NotFound:
+                self._message = None
+        return self._message
+
+    async def _publish(self) -> None:
+        channel = self.bot.get_channel(self.channel_id)
+        if channel is None and self.bot.coordinator:
+            # The leader may not run the shard that caches this guild; go over REST
+            channel = self.bot.get_partial_messageable(self.channel_id)
+        if not isinstance(channel, (discord.TextChannel, discord.PartialMessageable)):
+            return
+
+        embed = self._embed or discord.Embed(
+            title="🏆 Tier Leaderboard",
+            description="No points have been earned yet.",
+            color=discord.Color.purple(),
+        )
+        await self._bucket.acquire()
+        message = await self._resolve_message(channel)
+        if message:
+            try:
+                await message.edit(embed=embed)
+                return
+            except discord.NotFound:
+                self._message = None
+
+        self._message = await channel.send(embed=embed)
+        await self.store.set_setting(self.guild_id, MESSAGE_SETTING, self._message.id)
+        try:
+            await self._message.pin()
+        except discord.HTTPException:
+            pass
@@ -0,0 +1,51 @@
+"""Check a guild's points table against its ledger, or rebuild it from the ledger.
+
+    python ledger.py check --guild G     # lists differences; exit status 1 if any
+    python ledger.py rebuild --guild G   # replaces the guild's points rows
+
+Both replay the newest ledger snapshot plus the entries after it. Run
+``rebuild`` with the bot stopped: a single-process bot does not see changes
+made from outside.
+"""
+import argparse
+import sys
+from typing import List, Optional, Tuple
+
+from storage import DataStore
+
+
+def diff_points(store: DataStore, guild_id: int) -> List[Tuple[int, Optional[int], Optional[int]]]:
+    """``(user_id, stored, replayed)`` for every player whose balance disagrees with the ledger."""
+    stored = dict(store.all_points(guild_id))
+    replayed = dict(store.ledger_points(guild_id))
+    return [
+        (uid, stored.get(uid), replayed.get(uid))
+        for uid in sorted(stored.keys() | replayed.keys())
+        if stored.get(uid) != replayed.get(uid)
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check or rebuild points from the ledger")
+    parser.add_argument("--db", default="bot_state.sqlite3")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("check", "rebuild"):
+        sub.add_parser(name).add_argument("--guild", type=int, required=True)
+    args = parser.parse_args(argv)
+
+    store = DataStore(args.db)
+    try:
+        if args.command == "rebuild":
+            print(f"Rebuilt {store.rebuild_points(args.guild):,} points rows", file=sys.stderr)
+            return 0
+        diffs = diff_points(store, args.guild)
+        for uid, stored, replayed in diffs:
+            print(f"{uid}\tstored={stored}\tledger={replayed}")
+        print(f"{len(diffs):,} players differ", file=sys.stderr)
+        return 1 if diffs else 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,130 @@
+import argparse
+import hashlib
+import json
+import sys
+import time
+
 import discord
 from discord.ext import commands
 
-GUILD_ID = SERVERID
+from cluster import Coordinator, launch
+from config import LEGACY_GUILD_ID, guild_objects
+from metrics import REGISTRY, instrument_store
+from names import NameCache
+from storage import AsyncDataStore
 
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True  # needed for DM "accept"
 
-class MyBot(commands.Bot):
+# Pass --force-sync to push the command tree even if its hash is unchanged
+FORCE_SYNC = "--force-sync" in sys.argv
+
+# Prometheus scrape endpoint (GET /metrics); cluster process N serves on METRICS_PORT + N
+METRICS_PORT = 9100
+
+TOKEN = "token"
+
+
+def command_tree_hash(tree: discord.app_commands.CommandTree, guild: discord.abc.Snowflake) -> str:
+    """Stable hash of the payload tree.sync() would send for ``guild``."""
+    payload = sorted(
+        (cmd.to_dict(tree) for cmd in tree.get_commands(guild=guild)),
+        key=lambda d: (d.get("type", 1), d["name"]),
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class MyBot(commands.AutoShardedBot):
+    def __init__(self, *args, clustered: bool = False, metrics_port: int = METRICS_PORT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics_port = metrics_port
+        # One store shared by every cog; in a cluster every process opens the same file
+        self.store = AsyncDataStore("bot_state.sqlite3", legacy_guild_id=LEGACY_GUILD_ID, journal=clustered)
+        # Cross-process cache sync and leader election (None when running alone)
+        self.coordinator = Coordinator(self.store) if clustered else None
+        self.names = NameCache(self, self.store)
+        instrument_store(self.store)
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process runs timed work: always, unless another cluster process leads."""
+        return self.coordinator is None or self.coordinator.is_leader
+
     async def setup_hook(self):
+        await REGISTRY.start(port=self.metrics_port)
+        REGISTRY.gauge("bot_gateway_latency_seconds", "Heartbeat latency to the Discord gateway", lambda: self.latency)
+        REGISTRY.gauge("bot_db_writer", "Group-commit writer stats and queue depth", self.store.stats)
+
+        # Warm in-memory caches before any command can run; the change feed
+        # starts first so nothing committed by other processes meanwhile is missed
+        started = time.perf_counter()
+        if self.coordinator:
+            await self.coordinator.start()
+        await self.store.warm()
+        await self.names.warm()
+        self.names.attach()
+        warmed = time.perf_counter()
+
         # Load cogs
         await self.load_extension("tier")
         await self.load_extension("general")
+        loaded = time.perf_counter()
+
+        # Sync ONLY to the configured guilds (instant), and only when their commands changed.
+        # In a cluster the process holding shard 0 does it for everyone.
+        for guild in guild_objects() if not self.shard_ids or 0 in self.shard_ids else ():
+            key = f"command_hash:{guild.id}"
+            digest = command_tree_hash(self.tree, guild)
+            if FORCE_SYNC or digest != await self.store.get_meta(key):
+                synced = await self.tree.sync(guild=guild)
+                await self.store.set_meta(key, digest)
+                print(f"✅ Synced {len(synced)} commands to guild {guild.id}: {[c.name for c in synced]}")
+            else:
+                print(f"✅ Command tree unchanged for guild {guild.id}, skipping sync")
+        synced_at = time.perf_counter()
+
+        print(
+            f"⏱️ Startup: cache warm {warmed - started:.3f}s, "
+            f"extension load {loaded - warmed:.3f}s, sync {synced_at - loaded:.3f}s"
+        )
+
+    async def close(self):
+        await super().close()
+        if self.coordinator:
+            await self.coordinator.stop()
+        await REGISTRY.stop()
+        self.store.close()
+
+    async def on_ready(self):
+        print(f"✅ Logged in as {self.user} (ID: {self.user.id}), shards {sorted(self.shards)}")
+
 
-        # Sync ONLY to this guild (instant)
-        guild = discord.Object(id=GUILD_ID)
-        synced = await self.tree.sync(guild=guild)
-        print(f"✅ Synced {len(synced)} commands to guild {GUILD_ID}: {[c.name for c in synced]}")
+def run(shard_ids=None, shard_count=None, clustered: bool = False, metrics_port: int = METRICS_PORT):
+    bot = MyBot(
+        command_prefix="!",
+        intents=intents,
+        shard_ids=shard_ids,
+        shard_count=shard_count,
+        clustered=clustered,
+        metrics_port=metrics_port,
+    )
+    bot.run(TOKEN)
 
-bot = MyBot(command_prefix="!", intents=intents)
 
-@bot.event
-async def on_ready():
-    print(f"✅ Logged in as {bot.user} (ID: {bot.user.id})")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--force-sync", action="store_true", help="sync the command tree even if unchanged")
+    parser.add_argument("--shards", type=int, help="total shard count (default: Discord's recommendation)")
+    parser.add_argument("--processes", type=int, default=1, help="split the shards over this many processes")
+    args = parser.parse_args()
 
-bot.run("token")
+    if args.processes > 1:
+        if not args.shards:
+            parser.error("--processes needs --shards")
+        launch(args.shards, args.processes)
+    else:
+        run(shard_count=args.shards)
 
 
 
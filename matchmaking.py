@@ -0,0 +1,86 @@
+from typing import Dict, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+# A queued player: (points, joined_at epoch ms, user_id). Plain tuples keep
+# SortedList comparisons in C.
+Entry = Tuple[int, int, int]
+
+
+class MatchQueue:
+    """One guild's matchmaking pool, mirroring its rows of the queue table.
+
+    Entries sit in a SortedList ordered by points, so a player's closest
+    opponents are the entries directly either side of their own, found by
+    bisection in O(log n). A player accepts an opponent within
+    ``band(joined_at, now)`` points: ``base`` at first, widening by
+    ``growth`` per minute waited up to ``cap``. Points are taken when the
+    player joins; queued players are not battling, so they rarely move.
+    """
+
+    def __init__(self, base: int = 10, growth: int = 10, cap: int = 500):
+        self.base = base
+        self.growth = growth
+        self.cap = cap
+        self._pool = SortedList()
+        # Insertion order is join order: sweeps serve the longest waiters first
+        self._entries: Dict[int, Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._entries
+
+    def band(self, joined_at: int, now: int) -> int:
+        return min(self.cap, self.base + self.growth * ((now - joined_at) // 60_000))
+
+    def get(self, user_id: int) -> Optional[Entry]:
+        return self._entries.get(user_id)
+
+    def add(self, entry: Entry) -> None:
+        self.remove(entry[2])
+        self._entries[entry[2]] = entry
+        self._pool.add(entry)
+
+    def remove(self, user_id: int) -> Optional[Entry]:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._pool.remove(entry)
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._pool.clear()
+
+    # ---------- matching ----------
+    def closest(self, user_id: int, now: int) -> Optional[Entry]:
+        """The queued player nearest in points to ``user_id`` and within their band (longest waiter on a tie)."""
+        entry = self._entries[user_id]
+        pos = self._pool.index(entry)
+        band = self.band(entry[1], now)
+        best = None
+        for i in (pos - 1, pos + 1):
+            if 0 <= i < len(self._pool):
+                other = self._pool[i]
+                gap = abs(other[0] - entry[0])
+                if gap <= band and (best is None or (gap, other[1]) < best[0]):
+                    best = ((gap, other[1]), other)
+        return best[1] if best else None
+
+    def pop_match(self, user_id: int, now: int) -> Optional[Tuple[Entry, Entry]]:
+        """Take ``user_id`` and their closest acceptable opponent out of the pool."""
+        opponent = self.closest(user_id, now)
+        if opponent is None:
+            return None
+        return self.remove(user_id), self.remove(opponent[2])
+
+    def pop_matches(self, now: int) -> List[Tuple[Entry, Entry]]:
+        """Pair off everyone who can be paired, longest waiters (widest bands) first."""
+        matches = []
+        for user_id in list(self._entries):
+            if user_id in self._entries:
+                match = self.pop_match(user_id, now)
+                if match:
+                    matches.append(match)
+        return matches
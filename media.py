@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import io
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+import discord
+from PIL import Image
+
+# Re-upload this long before Discord's signed attachment URL expires
+URL_EXPIRY_MARGIN = 3600
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    path: str
+    filename: str
+    source_hash: str
+
+
+class MediaCache:
+    """Upload-once cache for the bot's static images (welcome.png, rules.png).
+
+    At startup each source image is content-hashed and, if that hash has not
+    been processed before, downscaled and recompressed into ``cache_dir``.
+    The first send uploads the processed file and remembers the CDN URL
+    Discord gives back; later sends only reference that URL. A changed
+    source hash, or a signed URL close to expiry, triggers a fresh upload.
+    """
+
+    def __init__(self, store, cache_dir: str = ".media_cache", max_side: int = 1280, max_bytes: int = 512_000):
+        self.store = store
+        self.cache_dir = cache_dir
+        self.max_side = max_side
+        self.max_bytes = max_bytes
+        self._images: Dict[str, PreparedImage] = {}
+
+    async def prepare(self, name: str) -> PreparedImage:
+        image = await asyncio.to_thread(self._prepare, name)
+        self._images[name] = image
+        return image
+
+    def _prepare(self, name: str) -> PreparedImage:
+        with open(name, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        stem = os.path.splitext(os.path.basename(name))[0]
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for ext in ("png", "webp"):
+            filename = f"{stem}-{digest[:12]}.{ext}"
+            path = os.path.join(self.cache_dir, filename)
+            if os.path.exists(path):
+                return PreparedImage(path, filename, digest)
+
+        ext, out = self._compress(data)
+        filename = f"{stem}-{digest[:12]}.{ext}"
+        path = os.path.join(self.cache_dir, filename)
+        with open(path, "wb") as f:
+            f.write(out)
+        return PreparedImage(path, filename, digest)
+
+    def _compress(self, data: bytes) -> tuple[str, bytes]:
+        img = Image.open(io.BytesIO(data))
+        img.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+
+        buf = io.BytesIO()
+        img.save(buf, format="PNG", optimize=True)
+        if buf.tell() <= self.max_bytes:
+            return "png", buf.getvalue()
+
+        # Still too big as PNG: fall back to lossy WebP, which keeps alpha
+        for quality in (90, 80, 70, 60, 50):
+            buf = io.BytesIO()
+            img.save(buf, format="WEBP", quality=quality, method=6)
+            if buf.tell() <= self.max_bytes:
+                break
+        return "webp", buf.getvalue()
+
+    @staticmethod
+    def _url_fresh(url: str) -> bool:
+        # Discord attachment URLs are signed; "ex" is the expiry as hex epoch seconds
+        ex = parse_qs(urlparse(url).query).get("ex")
+        if not ex:
+            return True
+        try:
+            return int(ex[0], 16) - URL_EXPIRY_MARGIN > time.time()
+        except ValueError:
+            return False
+
+    async def send(self, channel: discord.abc.Messageable, embed: discord.Embed, name: str, **kwargs) -> discord.Message:
+        """Send ``embed`` with image ``name``, uploading it only if no usable CDN URL is cached."""
+        image = self._images.get(name) or await self.prepare(name)
+
+        cached = await self.store.get_media(name)
+        if cached and cached[0] == image.source_hash and self._url_fresh(cached[1]):
+            embed.set_image(url=cached[1])
+            return await channel.send(embed=embed, **kwargs)
+
+        embed.set_image(url=f"attachment://{image.filename}")
+        msg = await channel.send(embed=embed, file=discord.File(image.path, filename=image.filename), **kwargs)
+
+        url = msg.attachments[0].url if msg.attachments else None
+        if url:
+            await self.store.set_media(name, image.source_hash, url)
+        return msg
@@ -0,0 +1,206 @@
+import asyncio
+import bisect
+import functools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from aiohttp import web
+from discord import app_commands
+
+log = logging.getLogger(__name__)
+
+# Prometheus client defaults, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _fmt_value(value) -> str:
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _fmt_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label set; safe to observe from threads."""
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                total += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_fmt_labels(labels, le)} {total}")
+            lines.append(f"{self.name}_sum{_fmt_labels(labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_fmt_labels(labels)} {total}")
+        return lines
+
+
+class Metrics:
+    """Process-wide metrics, rendered in the Prometheus text format.
+
+    Histograms are updated on the hot path (a lock and a bisect per
+    observation). Gauges are callbacks read only when ``/metrics`` is
+    scraped, so queue depths and counts cost nothing between scrapes.
+    """
+
+    def __init__(self):
+        self.command_seconds = Histogram("bot_command_seconds", "App command handler latency")
+        self.db_seconds = Histogram("bot_db_seconds", "DataStore method latency, measured on the DB thread")
+        self.loop_lag_seconds = Histogram(
+            "bot_event_loop_lag_seconds", "Event loop scheduling delay",
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+        )
+        self._gauges: Dict[str, Tuple[str, Callable[[], object]]] = {}
+        self._lag_task: asyncio.Task | None = None
+        self._runner: web.AppRunner | None = None
+
+    def gauge(self, name: str, help: str, fn: Callable[[], object]) -> None:
+        """Register a gauge; ``fn`` returns a number or a ``{label_value: number}`` dict."""
+        self._gauges[name] = (help, fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for hist in (self.command_seconds, self.db_seconds, self.loop_lag_seconds):
+            lines.extend(hist.render())
+        for name, (help, fn) in sorted(self._gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                log.exception("gauge %s failed", name)
+                continue
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            if isinstance(value, dict):
+                lines += [f'{name}{{key="{k}"}} {_fmt_value(v)}' for k, v in sorted(value.items())]
+            else:
+                lines.append(f"{name} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    # ---------- server ----------
+    async def start(self, host: str = "0.0.0.0", port: int = 9100, lag_interval: float = 0.5) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._lag_task = asyncio.create_task(self._measure_lag(lag_interval))
+
+    async def stop(self) -> None:
+        if self._lag_task:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+    async def _measure_lag(self, interval: float) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag_seconds.observe(max(0.0, loop.time() - expected))
+
+
+REGISTRY = Metrics()
+
+
+# ----------------------------
+# Instrumentation
+# ----------------------------
+def instrument_commands(cls):
+    """Class decorator: time every app command defined on a cog.
+
+    The handler callback is wrapped after discord.py has parsed its
+    parameters, so the command's signature and options are untouched.
+    """
+    for value in vars(cls).values():
+        if isinstance(value, app_commands.Command):
+            value._callback = _timed_callback(value.qualified_name, value._callback)
+    return cls
+
+
+def _timed_callback(name: str, callback):
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await callback(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            REGISTRY.command_seconds.observe(time.perf_counter() - started, command=name, outcome=outcome)
+    return wrapper
+
+
+class TimedDataStore:
+    """Wraps a DataStore so each public method call is counted and timed.
+
+    Calls run on the store's writer/reader threads, so the timings are pure
+    SQLite time, without the wait for a thread or a group-commit batch.
+    """
+
+    # Not timed: context managers, and generators that do their work after returning
+    _passthrough = frozenset({"transaction", "close", "export_rows"})
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._store, name)
+        if name.startswith("_") or name in self._passthrough or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                REGISTRY.db_seconds.observe(time.perf_counter() - started, method=name)
+
+        # Cache on the instance so later lookups skip __getattr__
+        self.__dict__[name] = timed
+        return timed
+
+
+def instrument_store(async_store) -> None:
+    """Route an AsyncDataStore's DB calls through TimedDataStore."""
+    if not isinstance(async_store.store, TimedDataStore):
+        async_store.store = TimedDataStore(async_store.store)
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import discord
+
+
+class NameCache:
+    """Per-guild display names for user IDs, persisted in SQLite with a TTL.
+
+    Names are filled in bulk from guild member lists (on guild availability
+    and member/user update events), so list commands normally resolve every
+    row from memory. IDs that are missing or stale fall back to the gateway
+    cache, then to REST ``fetch_user`` calls made together with bounded
+    concurrency, and the results are written back in one batch.
+    """
+
+    def __init__(self, bot: discord.Client, store, ttl: float = 7 * 86400, max_concurrency: int = 5):
+        self.bot = bot
+        self.store = store
+        self.ttl = ttl
+        # (guild_id, user_id) -> (display name, refreshed_at)
+        self._names: Dict[Tuple[int, int], Tuple[str, float]] = {}
+        self._fetch_limit = asyncio.Semaphore(max_concurrency)
+
+    async def warm(self) -> None:
+        self._names = {(gid, uid): (name, ts) for gid, uid, name, ts in await self.store.load_names()}
+
+    def attach(self) -> None:
+        self.bot.add_listener(self._on_guild_available, "on_guild_available")
+        self.bot.add_listener(self._on_member, "on_member_join")
+        self.bot.add_listener(self._on_member_update, "on_member_update")
+        self.bot.add_listener(self._on_user_update, "on_user_update")
+
+    # ---------- refresh from gateway events ----------
+    async def remember(self, guild_id: int, entries: Iterable[Tuple[int, str]]) -> None:
+        now = time.time()
+        rows = []
+        for uid, name in entries:
+            entry = self._names.get((guild_id, uid))
+            if entry and entry[0] == name and not self._stale(guild_id, uid, now):
+                continue
+            rows.append((guild_id, uid, name, now))
+        if not rows:
+            return
+        for gid, uid, name, ts in rows:
+            self._names[(gid, uid)] = (name, ts)
+        await self.store.upsert_names(rows)
+
+    async def _on_guild_available(self, guild: discord.Guild) -> None:
+        if not guild.chunked:
+            await guild.chunk()
+        await self.remember(guild.id, ((m.id, m.display_name) for m in guild.members))
+
+    async def _on_member(self, member: discord.Member) -> None:
+        await self.remember(member.guild.id, [(member.id, member.display_name)])
+
+    async def _on_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        if before.display_name != after.display_name:
+            await self.remember(after.guild.id, [(after.id, after.display_name)])
+
+    async def _on_user_update(self, before: discord.User, after: discord.User) -> None:
+        if before.display_name == after.display_name:
+            return
+        # A nickname still wins over the new global name, so re-read each membership
+        for guild in after.mutual_guilds:
+            member = guild.get_member(after.id)
+            if member:
+                await self.remember(guild.id, [(member.id, member.display_name)])
+
+    # ---------- lookup ----------
+    def _stale(self, guild_id: int, user_id: int, now: float) -> bool:
+        entry = self._names.get((guild_id, user_id))
+        return entry is None or now - entry[1] > self.ttl
+
+    async def _fetch(self, user_id: int) -> Tuple[int, str | None]:
+        async with self._fetch_limit:
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.HTTPException:
+                return user_id, None
+        return user_id, user.display_name
+
+    async def resolve_many(self, guild_id: int, user_ids: Iterable[int]) -> Dict[int, str]:
+        """Names as shown in ``guild_id`` for every ID, using at most one batch of concurrent REST lookups."""
+        now = time.time()
+        names: Dict[int, str] = {}
+        fresh: List[Tuple[int, str]] = []
+        missing: List[int] = []
+
+        for uid in dict.fromkeys(user_ids):
+            if not self._stale(guild_id, uid, now):
+                names[uid] = self._names[(guild_id, uid)][0]
+                continue
+            guild = self.bot.get_guild(guild_id)
+            user = (guild.get_member(uid) if guild else None) or self.bot.get_user(uid)
+            if user:
+                names[uid] = user.display_name
+                fresh.append((uid, user.display_name))
+            else:
+                missing.append(uid)
+
+        if missing:
+            for uid, name in await asyncio.gather(*(self._fetch(uid) for uid in missing)):
+                if name is not None:
+                    names[uid] = name
+                    fresh.append((uid, name))
+
+        if fresh:
+            await self.remember(guild_id, fresh)
+
+        for uid in missing:
+            if uid not in names:
+                # Keep a stale name over the placeholder if we have one
+                entry = self._names.get((guild_id, uid))
+                names[uid] = entry[0] if entry else f"User {uid}"
+        return names
@@ -0,0 +1,47 @@
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import discord
+
+# fetch_page(cursor) -> (lines for this page, cursor for the next page or None)
+PageFetcher = Callable[[Any], Awaitable[Tuple[List[str], Optional[Any]]]]
+
+
+class KeysetPaginator(discord.ui.View):
+    """Prev/Next buttons over a keyset-paginated query.
+
+    Only the page being shown is fetched. The view remembers the cursor that
+    starts each visited page, so going back re-runs that page's query
+    instead of keeping every row in memory.
+    """
+
+    def __init__(self, author_id: int, title: str, fetch_page: PageFetcher, color: discord.Color, timeout: float = 180):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.title = title
+        self.fetch_page = fetch_page
+        self.color = color
+        self._starts: List[Any] = [None]
+        self._next: Any = None
+
+    async def render(self) -> discord.Embed:
+        lines, self._next = await self.fetch_page(self._starts[-1])
+        self.prev_page.disabled = len(self._starts) == 1
+        self.next_page.disabled = self._next is None
+        embed = discord.Embed(title=self.title, description="\n".join(lines) or "—", color=self.color)
+        embed.set_footer(text=f"Page {len(self._starts)}")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if len(self._starts) > 1:
+            self._starts.pop()
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self._next is not None:
+            self._starts.append(self._next)
+        await interaction.response.edit_message(embed=await self.render(), view=self)
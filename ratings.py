@@ -0,0 +1,153 @@
+import argparse
+import math
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Elo parameters. After changing them, rewrite the stored ratings with
+# ``python ratings.py --guild G --write`` (bot stopped) so they match.
+DEFAULT_RATING = 1500.0
+K_FACTOR = 32.0
+SCALE = 400.0
+
+# (rating, games, wins)
+Rating = Tuple[float, int, int]
+UNRATED: Rating = (DEFAULT_RATING, 0, 0)
+
+
+# ----------------------------
+# INCREMENTAL (hot path)
+# ----------------------------
+
+def expected(rating_a: float, rating_b: float, scale: float = SCALE) -> float:
+    """Probability that A beats B."""
+    return 1.0 / (1.0 + 10.0 ** ((rating_b - rating_a) / scale))
+
+
+def update(a: Rating, b: Rating, a_won: bool, k: float = K_FACTOR, scale: float = SCALE) -> Tuple[Rating, Rating]:
+    """Both players' ratings after one match between them."""
+    delta = k * ((1.0 if a_won else 0.0) - expected(a[0], b[0], scale))
+    return (
+        (a[0] + delta, a[1] + 1, a[2] + a_won),
+        (b[0] - delta, b[1] + 1, b[2] + (not a_won)),
+    )
+
+
+# ----------------------------
+# BATCH RECOMPUTE
+# ----------------------------
+# Elo is sequential, but two matches only depend on each other through a
+# shared player. Every match is given a round one past the latest round
+# of either player's previous match; a round then holds no player twice,
+# so it is applied as one set of NumPy array operations, and a player's
+# matches land in increasing rounds in the order they were played. The
+# result equals replaying the matches one by one.
+
+@dataclass
+class Replay:
+    ratings: Dict[int, Rating]
+    matches: int
+    rounds: int
+    # Mean -log(p) of each actual winner, from ratings before the match: lower is better
+    log_loss: float
+    seconds: float
+
+
+def _rounds(ia: List[int], ib: List[int], players: int) -> List[int]:
+    latest = [0] * players
+    rounds = []
+    for x, y in zip(ia, ib):
+        r = max(latest[x], latest[y])
+        rounds.append(r)
+        latest[x] = latest[y] = r + 1
+    return rounds
+
+
+def recompute(
+    history: Sequence[Tuple[int, int, int]],
+    k: float = K_FACTOR,
+    scale: float = SCALE,
+    initial: float = DEFAULT_RATING,
+) -> Replay:
+    """Replay ``(user_a, user_b, winner_id)`` matches, oldest first, from scratch."""
+    import numpy as np  # imported here: only the batch recompute needs it
+
+    started = time.perf_counter()
+    if not history:
+        return Replay({}, 0, 0, math.nan, 0.0)
+    table = np.asarray(history, dtype=np.int64)
+    ids, dense = np.unique(table[:, :2], return_inverse=True)
+    dense = dense.reshape(-1, 2)
+    ia, ib = dense[:, 0], dense[:, 1]
+    score = (table[:, 2] == table[:, 0]).astype(np.float64)
+
+    rounds = np.asarray(_rounds(ia.tolist(), ib.tolist(), len(ids)))
+    order = np.argsort(rounds, kind="stable")
+    ends = np.cumsum(np.bincount(rounds))
+    ia, ib, score = ia[order], ib[order], score[order]
+
+    rating = np.full(len(ids), initial, dtype=np.float64)
+    p_winner = np.empty(len(order), dtype=np.float64)
+    start = 0
+    for end in ends.tolist():
+        a, b, s = ia[start:end], ib[start:end], score[start:end]
+        e = 1.0 / (1.0 + 10.0 ** ((rating[b] - rating[a]) / scale))
+        p_winner[start:end] = np.where(s == 1.0, e, 1.0 - e)
+        delta = k * (s - e)
+        rating[a] += delta
+        rating[b] -= delta
+        start = end
+
+    games = np.bincount(dense.ravel(), minlength=len(ids))
+    wins = np.bincount(np.where(score == 1.0, ia, ib), minlength=len(ids))
+    log_loss = float(-np.log(np.clip(p_winner, 1e-12, 1.0)).mean())
+    ratings = {
+        uid: (r, g, w)
+        for uid, r, g, w in zip(ids.tolist(), rating.tolist(), games.tolist(), wins.tolist())
+    }
+    return Replay(ratings, len(order), len(ends), log_loss, time.perf_counter() - started)
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+# Tune K against a guild's history, e.g. --k 16 24 32 40, and compare the
+# log loss; --write stores the ratings of the (single) K given. Run with
+# the bot stopped: a single-process bot does not see changes made from
+# outside.
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from storage import DataStore  # imported here: storage imports this module
+
+    parser = argparse.ArgumentParser(description="Recompute Elo ratings from the match history")
+    parser.add_argument("--db", default="bot_state.sqlite3")
+    parser.add_argument("--guild", type=int, required=True)
+    parser.add_argument("--k", type=float, nargs="+", default=[K_FACTOR])
+    parser.add_argument("--scale", type=float, default=SCALE)
+    parser.add_argument("--write", action="store_true", help="replace the guild's stored ratings")
+    args = parser.parse_args(argv)
+    if args.write and len(args.k) != 1:
+        parser.error("--write takes a single --k")
+
+    store = DataStore(args.db)
+    try:
+        started = time.perf_counter()
+        history = store.match_history(args.guild)
+        print(f"Loaded {len(history):,} matches in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+        for k in args.k:
+            replay = recompute(history, k, args.scale)
+            print(
+                f"k={k:g} scale={args.scale:g}: log loss {replay.log_loss:.4f} over {replay.matches:,} matches, "
+                f"{len(replay.ratings):,} players, {replay.rounds:,} rounds in {replay.seconds:.2f}s"
+            )
+        if args.write:
+            store.replace_ratings(args.guild, replay.ratings)
+            print(f"Wrote {len(replay.ratings):,} ratings", file=sys.stderr)
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Set
+
+log = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """One timer for all time-based work.
+
+    Due times sit in a min-heap and a single task sleeps until the earliest
+    one, so the cost is the same with one open challenge or thousands.
+    When a time comes due, ``callback(now)`` runs once for everything due;
+    it is expected to sweep the DB and schedule whatever comes next.
+    Times are naive UTC datetimes: the DB stores epoch ms, so convert with
+    ``storage.from_ms()`` when scheduling.
+    """
+
+    def __init__(self, callback: Callable[[datetime], Awaitable[None]]):
+        self._callback = callback
+        self._heap: List[datetime] = []
+        self._queued: Set[datetime] = set()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, when: datetime) -> None:
+        if when in self._queued:
+            return
+        self._queued.add(when)
+        heapq.heappush(self._heap, when)
+        if self._heap[0] == when:
+            self._wake.set()
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._queued.clear()
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+
+            delay = (self._heap[0] - datetime.utcnow()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = datetime.utcnow()
+            while self._heap and self._heap[0] <= now:
+                self._queued.discard(heapq.heappop(self._heap))
+            try:
+                await self._callback(now)
+            except Exception:
+                log.exception("scheduled sweep failed; retrying in a minute")
+                self.schedule(now + timedelta(minutes=1))
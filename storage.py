@@ -1,9 +1,52 @@
+import asyncio
+import functools
+import logging
+import queue
 import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional, List, Tuple
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, Optional, List, Tuple
+
+from cache import BattleIndex, PointsCache
+from ratings import UNRATED, Rating, update as elo_update
 
 ISO_FMT = "%Y-%m-%dT%H:%M:%S.%fZ"
+EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+# Pending challenges get one reminder, then expire (challenged player loses)
+REMINDER_AFTER = timedelta(hours=24)
+CHALLENGE_TTL = timedelta(hours=48)
+
+# Rows of the changes table replayed per change-feed read
+FEED_BATCH = 5000
+
+# Keys bound per ``IN (...)`` lookup, under SQLite's host-parameter limit
+IN_CHUNK = 500
+
+# Players archived per season rollover step; other writes run between steps
+ROLLOVER_CHUNK = 2000
+# rollovers.archived_to once every player is archived and only ranking is left
+_ROLLOVER_RANKING = 2 ** 63 - 1
+# Per-player tables a season rollover archives and resets
+SEASON_TABLES = ("points", "completed")
+
+# Columns of each table in import/export files (see transfer.py), and the
+# column identifying a row; the guild is picked by whoever runs the transfer
+TRANSFER_COLUMNS = {
+    "points": ("user_id", "points"),
+    "pending": ("challenged_id", "challenger_id", "created_at"),
+    "active": ("user_a", "user_b", "accepted_at"),
+    "completed": ("user_id",),
+}
+_TRANSFER_KEYS = {"points": "user_id", "pending": "challenged_id", "active": "battle_id", "completed": "user_id"}
+
+log = logging.getLogger(__name__)
 
 
 def utcnow_iso() -> str:
@@ -14,295 +57,2248 @@ def parse_iso(s: str) -> datetime:
     return datetime.strptime(s, ISO_FMT)
 
 
-@dataclass(frozen=True)
+def to_iso(dt: datetime) -> str:
+    return dt.strftime(ISO_FMT)
+
+
+# Challenge and battle times are integer epoch milliseconds (UTC)
+def now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def to_ms(dt: datetime) -> int:
+    return round((dt - EPOCH) / _MS)
+
+
+def from_ms(ms: int) -> datetime:
+    return EPOCH + ms * _MS
+
+
+def battle_id(a: int, b: int) -> str:
+    x, y = (a, b) if a < b else (b, a)
+    return f"{x}:{y}"
+
+
+# Slotted: the battle index holds one of these per open battle
+@dataclass(frozen=True, slots=True)
 class PendingChallenge:
+    guild_id: int
     challenged_id: int
     challenger_id: int
-    created_at: str  # ISO string
+    created_at: int  # epoch ms
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ActiveBattle:
+    guild_id: int
     user_a: int
     user_b: int
-    accepted_at: str  # ISO string
+    accepted_at: int  # epoch ms
+
+
+# Tables that predate multi-guild support and are rebuilt with a guild_id
+# column by _partition_legacy() (media, meta and snapshot_points stay global:
+# uploaded CDN URLs and command hashes are not per guild, and snapshot rows
+# belong to a guild through their ledger_snapshots row).
+GUILD_TABLES = (
+    "points", "pending", "reminders", "active", "completed",
+    "ledger", "ledger_snapshots", "names", "flags",
+)
 
 
 class DataStore:
-    def __init__(self, db_path: str = "bot_state.sqlite3"):
+    """SQLite state for every guild the bot serves.
+
+    Each table is partitioned by ``guild_id`` (the leading column of every
+    primary key and index), so one guild's queries never touch another
+    guild's rows. Methods take the guild first; the reminder/expiry sweeps
+    run across all guilds at once and return records tagged with theirs.
+    """
+
+    def __init__(self, db_path: str = "bot_state.sqlite3", legacy_guild_id: Optional[int] = None, journal: bool = False):
         self.db_path = db_path
+        # Rows from a single-guild database are assigned to this guild
+        self.legacy_guild_id = legacy_guild_id
+        # When several processes share the file, every cached-state change is
+        # also appended to the changes table for the others to replay
+        self.journal = journal
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
         self._init_db()
 
-    def _connect(self) -> sqlite3.Connection:
-        con = sqlite3.connect(self.db_path)
+    # Connections are long-lived and kept per thread. sqlite3 caches prepared
+    # statements per connection, so repeated queries skip re-parsing the SQL.
+    def _open(self, readonly: bool) -> sqlite3.Connection:
+        con = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=256,
+            isolation_level=None,  # transactions are managed by transaction()
+        )
         con.execute("PRAGMA journal_mode=WAL;")
         con.execute("PRAGMA foreign_keys=ON;")
+        if readonly:
+            con.execute("PRAGMA query_only=ON;")
+        with self._lock:
+            self._connections.append(con)
         return con
 
-    def _init_db(self) -> None:
+    def _connect(self) -> sqlite3.Connection:
+        con = getattr(self._local, "writer", None)
+        if con is None:
+            con = self._local.writer = self._open(readonly=False)
+        return con
+
+    def _reader(self) -> sqlite3.Connection:
+        con = getattr(self._local, "reader", None)
+        if con is None:
+            con = self._local.reader = self._open(readonly=True)
+        return con
+
+    def close(self) -> None:
+        with self._lock:
+            for con in self._connections:
+                con.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of writes in one transaction on this thread's writer.
+
+        Nested calls become savepoints, so a failing inner block only rolls
+        back its own writes and the outermost block decides when to commit.
+        """
         con = self._connect()
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
         try:
-            con.execute("""
-                CREATE TABLE IF NOT EXISTS points (
-                    user_id INTEGER PRIMARY KEY,
-                    points  INTEGER NOT NULL
-                )
-            """)
-            con.execute("""
-                CREATE TABLE IF NOT EXISTS pending (
-                    challenged_id INTEGER PRIMARY KEY,
+            con.execute("BEGIN IMMEDIATE" if depth == 0 else f"SAVEPOINT sp{depth}")
+            try:
+                yield con
+                con.execute("COMMIT" if depth == 0 else f"RELEASE sp{depth}")
+            except BaseException:
+                # Also reached when COMMIT fails (busy, I/O error): the writer must
+                # not be left inside a transaction. SQLite may have rolled back
+                # already, hence the in_transaction check.
+                if con.in_transaction:
+                    if depth == 0:
+                        con.execute("ROLLBACK")
+                    else:
+                        con.execute(f"ROLLBACK TO sp{depth}")
+                        con.execute(f"RELEASE sp{depth}")
+                raise
+        finally:
+            self._local.depth = depth
+
+    @staticmethod
+    def _has_table(con: sqlite3.Connection, name: str) -> bool:
+        return con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+        ).fetchone() is not None
+
+    @staticmethod
+    def _select_in(con: sqlite3.Connection, sql: str, params: tuple, keys: List) -> Iterator[tuple]:
+        """Rows of ``sql`` for every key; its ``IN ({})`` is filled a chunk of keys at a time, within SQLite's variable limit."""
+        for i in range(0, len(keys), IN_CHUNK):
+            chunk = keys[i:i + IN_CHUNK]
+            yield from con.execute(sql.format(",".join("?" * len(chunk))), (*params, *chunk))
+
+    def _init_db(self) -> None:
+        with self.transaction() as con:
+            self._migrate(con)
+
+    # ---------- schema migrations ----------
+    # PRAGMA user_version holds the number of migrations applied. Pending ones
+    # run in order inside the startup transaction, so a crash leaves the
+    # database at the old version; each is also written to be safe to re-run.
+    def _migrate(self, con: sqlite3.Connection) -> None:
+        version = con.execute("PRAGMA user_version").fetchone()[0]
+        if version > len(self.MIGRATIONS):
+            raise RuntimeError(f"database schema v{version} is newer than this code (v{len(self.MIGRATIONS)})")
+        for target, migration in enumerate(self.MIGRATIONS[version:], start=version + 1):
+            started = time.perf_counter()
+            migration(self, con)
+            con.execute(f"PRAGMA user_version={target}")
+            log.info("schema migrated to v%d (%s) in %.3fs", target, migration.__name__, time.perf_counter() - started)
+
+    @staticmethod
+    def _column_type(con: sqlite3.Connection, table: str, column: str) -> Optional[str]:
+        for row in con.execute(f"PRAGMA table_info({table})"):
+            if row[1] == column:
+                return str(row[2]).upper()
+        return None
+
+    def _rebuild(self, con: sqlite3.Connection, table: str, create: str, select: str) -> None:
+        """Recreate ``table`` from ``create`` (written for ``{table}``) filled by ``select``, keeping its indexes."""
+        indexes = [sql for (sql,) in con.execute(
+            "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL", (table,)
+        )]
+        con.execute(create.format(table=f"{table}_new"))
+        con.execute(f"INSERT INTO {table}_new {select}")
+        con.execute(f"DROP TABLE {table}")
+        con.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        for sql in indexes:
+            con.execute(sql)
+
+    def _v1_baseline(self, con: sqlite3.Connection) -> None:
+        """Every table as of multi-guild support; upgrades any earlier unversioned database."""
+        legacy = self._set_aside_legacy(con)
+
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS points (
+                guild_id INTEGER NOT NULL,
+                user_id  INTEGER NOT NULL,
+                points   INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS pending (
+                guild_id      INTEGER NOT NULL,
+                challenged_id INTEGER NOT NULL,
+                challenger_id INTEGER NOT NULL,
+                created_at    TEXT NOT NULL,
+                PRIMARY KEY (guild_id, challenged_id)
+            )
+        """)
+        # Per-guild listing, plus a global one for the cross-guild expiry sweep
+        con.execute("CREATE INDEX IF NOT EXISTS idx_pending_guild_created_at ON pending(guild_id, created_at, challenged_id)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_pending_created_at ON pending(created_at)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_pending_challenger_id ON pending(guild_id, challenger_id)")
+        # One reminder DM per pending challenge, due REMINDER_AFTER after creation
+        backfill_reminders = not self._has_table(con, "reminders") and "reminders" not in legacy
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS reminders (
+                guild_id      INTEGER NOT NULL,
+                challenged_id INTEGER NOT NULL,
+                due_at        TEXT NOT NULL,
+                PRIMARY KEY (guild_id, challenged_id)
+            )
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_reminders_due_at ON reminders(due_at)")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS active (
+                guild_id    INTEGER NOT NULL,
+                battle_id   TEXT NOT NULL,
+                user_a      INTEGER NOT NULL,
+                user_b      INTEGER NOT NULL,
+                accepted_at TEXT NOT NULL,
+                PRIMARY KEY (guild_id, battle_id)
+            )
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_active_user_a ON active(guild_id, user_a)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_active_user_b ON active(guild_id, user_b)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_active_accepted_at ON active(guild_id, accepted_at, battle_id)")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS completed (
+                guild_id INTEGER NOT NULL,
+                user_id  INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_points_points ON points(guild_id, points DESC)")
+        # Append-only history of every points change; the points table is
+        # the materialized balance and is updated in the same transaction.
+        backfill_ledger = not self._has_table(con, "ledger") and "ledger" not in legacy
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS ledger (
+                entry_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id   INTEGER NOT NULL,
+                user_id    INTEGER NOT NULL,
+                delta      INTEGER NOT NULL,
+                reason     TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_ledger_user_id ON ledger(guild_id, user_id)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_ledger_guild_entry ON ledger(guild_id, entry_id)")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS ledger_snapshots (
+                snapshot_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id      INTEGER NOT NULL,
+                last_entry_id INTEGER NOT NULL,
+                created_at    TEXT NOT NULL
+            )
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_ledger_snapshots_guild ON ledger_snapshots(guild_id, snapshot_id)")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS snapshot_points (
+                snapshot_id INTEGER NOT NULL,
+                user_id     INTEGER NOT NULL,
+                points      INTEGER NOT NULL,
+                PRIMARY KEY (snapshot_id, user_id)
+            )
+        """)
+        # Display-name cache (see names.py); refreshed_at is epoch seconds
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS names (
+                guild_id     INTEGER NOT NULL,
+                user_id      INTEGER NOT NULL,
+                name         TEXT NOT NULL,
+                refreshed_at REAL NOT NULL,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+        # Uploaded image CDN URLs, keyed by asset name (see media.py)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS media (
+                name        TEXT PRIMARY KEY,
+                source_hash TEXT NOT NULL,
+                url         TEXT NOT NULL,
+                updated_at  TEXT NOT NULL
+            )
+        """)
+        # Free-form text values (e.g. the synced command-tree hash)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key   TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+
+        # Cross-process coordination (see cluster.py): a journal of cached-state
+        # changes that other processes poll, and leader leases
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS changes (
+                change_id  INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id   INTEGER NOT NULL,
+                kind       TEXT NOT NULL,
+                user_id    INTEGER,
+                created_at REAL NOT NULL
+            )
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_changes_created_at ON changes(created_at)")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name       TEXT PRIMARY KEY,
+                holder     TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+        # 🔹 NEW: flags table (for startup image, etc.)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS flags (
+                guild_id INTEGER NOT NULL,
+                key      TEXT NOT NULL,
+                value    INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, key)
+            )
+        """)
+
+        self._partition_legacy(con, legacy)
+
+        # Backfills for tables added after the data they describe (run once the
+        # single-guild rows, if any, have been copied in)
+        if backfill_reminders:
+            rows = con.execute("SELECT guild_id, challenged_id, created_at FROM pending").fetchall()
+            con.executemany(
+                "INSERT INTO reminders(guild_id, challenged_id, due_at) VALUES(?, ?, ?)",
+                [(gid, cid, to_iso(parse_iso(created) + REMINDER_AFTER)) for gid, cid, created in rows],
+            )
+        if backfill_ledger:
+            con.execute(
+                "INSERT INTO ledger(guild_id, user_id, delta, reason, created_at) "
+                "SELECT guild_id, user_id, points, 'opening', ? FROM points WHERE points != 0",
+                (utcnow_iso(),),
+            )
+
+    def _v2_epoch_ms(self, con: sqlite3.Connection) -> None:
+        """Challenge, battle and reminder times: ISO text -> INTEGER epoch milliseconds."""
+        to_ms_sql = "CAST(ROUND((julianday({0}) - 2440587.5) * 86400000.0) AS INTEGER)"
+        if self._column_type(con, "pending", "created_at") != "INTEGER":
+            self._rebuild(con, "pending", """
+                CREATE TABLE {table} (
+                    guild_id      INTEGER NOT NULL,
+                    challenged_id INTEGER NOT NULL,
                     challenger_id INTEGER NOT NULL,
-                    created_at    TEXT NOT NULL
+                    created_at    INTEGER NOT NULL,
+                    PRIMARY KEY (guild_id, challenged_id)
+                )
+            """, "SELECT guild_id, challenged_id, challenger_id, " + to_ms_sql.format("created_at") + " FROM pending")
+        if self._column_type(con, "reminders", "due_at") != "INTEGER":
+            self._rebuild(con, "reminders", """
+                CREATE TABLE {table} (
+                    guild_id      INTEGER NOT NULL,
+                    challenged_id INTEGER NOT NULL,
+                    due_at        INTEGER NOT NULL,
+                    PRIMARY KEY (guild_id, challenged_id)
                 )
-            """)
-            con.execute("""
-                CREATE TABLE IF NOT EXISTS active (
-                    battle_id   TEXT PRIMARY KEY,
+            """, "SELECT guild_id, challenged_id, " + to_ms_sql.format("due_at") + " FROM reminders")
+        if self._column_type(con, "active", "accepted_at") != "INTEGER":
+            self._rebuild(con, "active", """
+                CREATE TABLE {table} (
+                    guild_id    INTEGER NOT NULL,
+                    battle_id   TEXT NOT NULL,
                     user_a      INTEGER NOT NULL,
                     user_b      INTEGER NOT NULL,
-                    accepted_at TEXT NOT NULL
+                    accepted_at INTEGER NOT NULL,
+                    PRIMARY KEY (guild_id, battle_id)
                 )
-            """)
-            con.execute("""
-                CREATE TABLE IF NOT EXISTS completed (
-                    user_id INTEGER PRIMARY KEY
-                )
-            """)
-            # 🔹 NEW: flags table (for startup image, etc.)
-            con.execute("""
-                CREATE TABLE IF NOT EXISTS flags (
-                    key   TEXT PRIMARY KEY,
-                    value INTEGER NOT NULL
-                )
-            """)
-            con.commit()
-        finally:
-            con.close()
+            """, "SELECT guild_id, battle_id, user_a, user_b, " + to_ms_sql.format("accepted_at") + " FROM active")
+        # warm() lists every guild's battles oldest first
+        con.execute("CREATE INDEX IF NOT EXISTS idx_active_accepted_at_all ON active(accepted_at)")
+
+    def _v3_seasons(self, con: sqlite3.Connection) -> None:
+        """Archive tables for past seasons' standings and completions."""
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS seasons (
+                guild_id INTEGER NOT NULL,
+                season   INTEGER NOT NULL,
+                ended_at INTEGER NOT NULL,
+                players  INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, season)
+            )
+        """)
+        # Stored in final leaderboard order: rollover appends, pages are range scans
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS season_points (
+                guild_id INTEGER NOT NULL,
+                season   INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                user_id  INTEGER NOT NULL,
+                points   INTEGER NOT NULL,
+                rank     INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, season, position)
+            ) WITHOUT ROWID
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_season_points_user ON season_points(guild_id, season, user_id)")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS season_completed (
+                guild_id INTEGER NOT NULL,
+                season   INTEGER NOT NULL,
+                user_id  INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, season, user_id)
+            ) WITHOUT ROWID
+        """)
+
+    def _v4_queue(self, con: sqlite3.Connection) -> None:
+        """Players waiting in the /queue matchmaking pool."""
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS queue (
+                guild_id  INTEGER NOT NULL,
+                user_id   INTEGER NOT NULL,
+                joined_at INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+
+    def _v5_matches(self, con: sqlite3.Connection) -> None:
+        """Match history and the Elo ratings derived from it."""
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS matches (
+                match_id     INTEGER PRIMARY KEY,
+                guild_id     INTEGER NOT NULL,
+                user_a       INTEGER NOT NULL,
+                user_b       INTEGER NOT NULL,
+                winner_id    INTEGER NOT NULL,
+                accepted_at  INTEGER NOT NULL,
+                completed_at INTEGER NOT NULL
+            )
+        """)
+        # Rating replays read a guild's matches in the order they were recorded
+        con.execute("CREATE INDEX IF NOT EXISTS idx_matches_guild ON matches(guild_id, match_id)")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS ratings (
+                guild_id INTEGER NOT NULL,
+                user_id  INTEGER NOT NULL,
+                rating   REAL NOT NULL,
+                games    INTEGER NOT NULL,
+                wins     INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+
+    def _v6_rollover_steps(self, con: sqlite3.Connection) -> None:
+        """State of season rollovers in progress, which run as a series of short writes."""
+        # One row per guild whose rollover is under way: players with user_id
+        # up to ``archived_to`` are archived, then position and the last
+        # points and rank carry the ranking from one step to the next
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS rollovers (
+                guild_id    INTEGER PRIMARY KEY,
+                season      INTEGER NOT NULL,
+                ended_at    INTEGER NOT NULL,
+                archived_to INTEGER NOT NULL,
+                position    INTEGER NOT NULL DEFAULT 0,
+                last_points INTEGER,
+                last_rank   INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Final balances waiting to be ranked into season_points; NULL marks a
+        # player archived without a balance
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS season_staging (
+                guild_id INTEGER NOT NULL,
+                season   INTEGER NOT NULL,
+                user_id  INTEGER NOT NULL,
+                points   INTEGER,
+                PRIMARY KEY (guild_id, season, user_id)
+            ) WITHOUT ROWID
+        """)
+        con.execute(
+            "CREATE INDEX IF NOT EXISTS idx_season_staging_points ON season_staging(guild_id, season, points DESC, user_id)"
+        )
+
+    MIGRATIONS = (_v1_baseline, _v2_epoch_ms, _v3_seasons, _v4_queue, _v5_matches, _v6_rollover_steps)
+
+    # ---------- single-guild upgrade ----------
+    def _set_aside_legacy(self, con: sqlite3.Connection) -> List[str]:
+        """Rename pre-guild tables out of the way so the new schema can be created."""
+        legacy = []
+        for table in GUILD_TABLES:
+            if not self._has_table(con, table):
+                continue
+            columns = {r[1] for r in con.execute(f"PRAGMA table_info({table})")}
+            if "guild_id" in columns:
+                continue
+            # Old indexes keep their names on the renamed table; drop them first
+            for (index,) in con.execute(
+                "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL",
+                (table,),
+            ).fetchall():
+                con.execute(f"DROP INDEX {index}")
+            con.execute(f"ALTER TABLE {table} RENAME TO legacy_{table}")
+            legacy.append(table)
+        if legacy and self.legacy_guild_id is None:
+            raise RuntimeError("single-guild database found; pass legacy_guild_id to upgrade it")
+        return legacy
+
+    def _partition_legacy(self, con: sqlite3.Connection, legacy: List[str]) -> None:
+        for table in legacy:
+            columns = [r[1] for r in con.execute(f"PRAGMA table_info(legacy_{table})")]
+            cols = ", ".join(columns)
+            con.execute(
+                f"INSERT INTO {table}(guild_id, {cols}) SELECT ?, {cols} FROM legacy_{table}",
+                (self.legacy_guild_id,),
+            )
+            con.execute(f"DROP TABLE legacy_{table}")
+        if legacy:
+            log.info("assigned single-guild data (%s) to guild %s", ", ".join(legacy), self.legacy_guild_id)
 
     # ---------- flags ----------
-    def get_flag(self, key: str) -> bool:
-        con = self._connect()
-        try:
-            row = con.execute(
-                "SELECT value FROM flags WHERE key=?",
-                (key,)
-            ).fetchone()
-            return bool(row[0]) if row else False
-        finally:
-            con.close()
+    def get_flag(self, guild_id: int, key: str) -> bool:
+        row = self._reader().execute(
+            "SELECT value FROM flags WHERE guild_id=? AND key=?",
+            (guild_id, key)
+        ).fetchone()
+        return bool(row[0]) if row else False
 
-    def set_flag(self, key: str, value: bool) -> None:
-        con = self._connect()
-        try:
+    def set_flag(self, guild_id: int, key: str, value: bool) -> None:
+        with self.transaction() as con:
             con.execute(
-                "INSERT OR REPLACE INTO flags(key, value) VALUES(?, ?)",
-                (key, int(value))
+                "INSERT OR REPLACE INTO flags(guild_id, key, value) VALUES(?, ?, ?)",
+                (guild_id, key, int(value))
+            )
+
+    # Integer settings share the flags table (e.g. pinned message IDs)
+    def get_setting(self, guild_id: int, key: str) -> Optional[int]:
+        row = self._reader().execute(
+            "SELECT value FROM flags WHERE guild_id=? AND key=?",
+            (guild_id, key)
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def set_setting(self, guild_id: int, key: str, value: int) -> None:
+        with self.transaction() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO flags(guild_id, key, value) VALUES(?, ?, ?)",
+                (guild_id, key, value)
+            )
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._reader().execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.transaction() as con:
+            con.execute("INSERT OR REPLACE INTO meta(key, value) VALUES(?, ?)", (key, value))
+
+    # ---------- names ----------
+    def load_names(self) -> List[Tuple[int, int, str, float]]:
+        rows = self._reader().execute("SELECT guild_id, user_id, name, refreshed_at FROM names").fetchall()
+        return [(int(r[0]), int(r[1]), str(r[2]), float(r[3])) for r in rows]
+
+    def upsert_names(self, rows: Iterable[Tuple[int, int, str, float]]) -> None:
+        with self.transaction() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO names(guild_id, user_id, name, refreshed_at) VALUES(?, ?, ?, ?)",
+                rows,
+            )
+
+    # ---------- media ----------
+    def get_media(self, name: str) -> Optional[Tuple[str, str]]:
+        row = self._reader().execute(
+            "SELECT source_hash, url FROM media WHERE name=?",
+            (name,)
+        ).fetchone()
+        return (str(row[0]), str(row[1])) if row else None
+
+    def set_media(self, name: str, source_hash: str, url: str) -> None:
+        with self.transaction() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO media(name, source_hash, url, updated_at) VALUES(?, ?, ?, ?)",
+                (name, source_hash, url, utcnow_iso()),
             )
-            con.commit()
-        finally:
-            con.close()
 
     # ---------- points ----------
-    def get_points(self, user_id: int) -> int:
-        con = self._connect()
-        try:
+    def guild_ids(self) -> List[int]:
+        """Guilds that have any points rows."""
+        rows = self._reader().execute("SELECT DISTINCT guild_id FROM points").fetchall()
+        return [int(r[0]) for r in rows]
+
+    def get_points(self, guild_id: int, user_id: int) -> int:
+        pts = self.get_points_row(guild_id, user_id)
+        return pts if pts is not None else 0
+
+    def get_points_row(self, guild_id: int, user_id: int) -> Optional[int]:
+        con = self._reader()
+        live, params = self._live(con, guild_id)
+        row = con.execute(
+            "SELECT points FROM points WHERE guild_id=? AND user_id=?" + live,
+            (guild_id, user_id, *params)
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def get_points_rows(self, guild_id: int, user_ids: Iterable[int]) -> Dict[int, int]:
+        """Balances for the given players; players without a row are left out."""
+        con = self._reader()
+        live, params = self._live(con, guild_id)
+        rows = self._select_in(
+            con, "SELECT user_id, points FROM points WHERE guild_id=?" + live + " AND user_id IN ({})",
+            (guild_id, *params), list(user_ids),
+        )
+        return {int(r[0]): int(r[1]) for r in rows}
+
+    def _record(self, con: sqlite3.Connection, guild_id: int, entries: List[Tuple[int, int]], reason: str) -> None:
+        now = utcnow_iso()
+        con.executemany(
+            "INSERT INTO ledger(guild_id, user_id, delta, reason, created_at) VALUES(?, ?, ?, ?, ?)",
+            [(guild_id, uid, delta, reason, now) for uid, delta in entries if delta],
+        )
+        self._journal(con, guild_id, "points", [uid for uid, _ in entries])
+
+    def add_points(self, guild_id: int, user_id: int, amount: int, reason: str = "adjust") -> int:
+        with self.transaction() as con:
+            self._settle(con, guild_id, [user_id])
             row = con.execute(
-                "SELECT points FROM points WHERE user_id=?",
-                (user_id,)
+                "INSERT INTO points(guild_id, user_id, points) VALUES(?, ?, ?) "
+                "ON CONFLICT(guild_id, user_id) DO UPDATE SET points=points + excluded.points "
+                "RETURNING points",
+                (guild_id, user_id, amount),
             ).fetchone()
-            return int(row[0]) if row else 0
-        finally:
-            con.close()
+            self._record(con, guild_id, [(user_id, amount)], reason)
+        return int(row[0])
 
-    def add_points(self, user_id: int, amount: int) -> int:
-        con = self._connect()
-        try:
-            cur = con.execute(
-                "SELECT points FROM points WHERE user_id=?",
-                (user_id,)
+    def add_points_many(self, guild_id: int, deltas: Iterable[Tuple[int, int]], reason: str = "adjust") -> Dict[int, int]:
+        """Apply several ``(user_id, amount)`` changes in one transaction; returns the new totals."""
+        deltas = list(deltas)
+        user_ids = list({uid for uid, _ in deltas})
+        with self.transaction() as con:
+            self._settle(con, guild_id, user_ids)
+            con.executemany(
+                "INSERT INTO points(guild_id, user_id, points) VALUES(?, ?, ?) "
+                "ON CONFLICT(guild_id, user_id) DO UPDATE SET points=points + excluded.points",
+                [(guild_id, uid, amount) for uid, amount in deltas],
+            )
+            self._record(con, guild_id, deltas, reason)
+            rows = self._select_in(
+                con, "SELECT user_id, points FROM points WHERE guild_id=? AND user_id IN ({})", (guild_id,), user_ids
+            )
+            totals = {int(r[0]): int(r[1]) for r in rows}
+        return totals
+
+    def debit_points(self, guild_id: int, user_id: int, amount: int, reason: str) -> Optional[int]:
+        """Take ``amount`` points if the balance covers it; returns the new balance or None."""
+        with self.transaction() as con:
+            self._settle(con, guild_id, [user_id])
+            row = con.execute(
+                "UPDATE points SET points=points - ? WHERE guild_id=? AND user_id=? AND points >= ? RETURNING points",
+                (amount, guild_id, user_id, amount),
+            ).fetchone()
+            if not row:
+                return None
+            self._record(con, guild_id, [(user_id, -amount)], reason)
+        return int(row[0])
+
+    def set_points(self, guild_id: int, user_id: int, points: int, reason: str = "adjust") -> None:
+        with self.transaction() as con:
+            self._settle(con, guild_id, [user_id])
+            old = con.execute(
+                "SELECT points FROM points WHERE guild_id=? AND user_id=?", (guild_id, user_id)
+            ).fetchone()
+            con.execute(
+                "INSERT INTO points(guild_id, user_id, points) VALUES(?, ?, ?) "
+                "ON CONFLICT(guild_id, user_id) DO UPDATE SET points=excluded.points",
+                (guild_id, user_id, points),
+            )
+            self._record(con, guild_id, [(user_id, points - (int(old[0]) if old else 0))], reason)
+
+    def clear_points(self, guild_id: int, reason: str = "reset") -> None:
+        with self.transaction() as con:
+            live, params = self._live(con, guild_id)
+            con.execute(
+                "INSERT INTO ledger(guild_id, user_id, delta, reason, created_at) "
+                "SELECT guild_id, user_id, -points, ?, ? FROM points WHERE guild_id=? AND points != 0" + live,
+                (reason, utcnow_iso(), guild_id, *params),
             )
-            row = cur.fetchone()
+            con.execute("DELETE FROM points WHERE guild_id=?" + live, (guild_id, *params))
+            # The ledger nets cleared players to zero; the snapshot records that
+            # their rows are gone, so rebuild_points() does not bring them back
+            self.snapshot_ledger(guild_id)
+            self._journal(con, guild_id, "points")
+
+    # ---------- ledger ----------
+    def snapshot_ledger(self, guild_id: int, keep: int = 7) -> int:
+        """Copy a guild's balances into a snapshot tagged with its last ledger entry.
+
+        Rebuilding then only replays the ledger tail after the newest snapshot.
+        Only the newest ``keep`` snapshots per guild are retained.
+        """
+        with self.transaction() as con:
+            last = con.execute(
+                "SELECT COALESCE(MAX(entry_id), 0) FROM ledger WHERE guild_id=?", (guild_id,)
+            ).fetchone()[0]
+            sid = con.execute(
+                "INSERT INTO ledger_snapshots(guild_id, last_entry_id, created_at) VALUES(?, ?, ?) RETURNING snapshot_id",
+                (guild_id, last, utcnow_iso()),
+            ).fetchone()[0]
+            live, params = self._live(con, guild_id)
+            con.execute(
+                "INSERT INTO snapshot_points(snapshot_id, user_id, points) "
+                "SELECT ?, user_id, points FROM points WHERE guild_id=?" + live,
+                (sid, guild_id, *params),
+            )
+            old = [r[0] for r in con.execute(
+                "SELECT snapshot_id FROM ledger_snapshots WHERE guild_id=? "
+                "ORDER BY snapshot_id DESC LIMIT -1 OFFSET ?",
+                (guild_id, keep),
+            ).fetchall()]
+            con.executemany("DELETE FROM snapshot_points WHERE snapshot_id=?", [(x,) for x in old])
+            con.executemany("DELETE FROM ledger_snapshots WHERE snapshot_id=?", [(x,) for x in old])
+        return int(sid)
+
+    @staticmethod
+    def _replay(con: sqlite3.Connection, guild_id: int) -> Tuple[str, tuple]:
+        """A SELECT of ``(user_id, points)`` from the newest snapshot plus the ledger tail, and its params."""
+        snap = con.execute(
+            "SELECT snapshot_id, last_entry_id FROM ledger_snapshots WHERE guild_id=? "
+            "ORDER BY snapshot_id DESC LIMIT 1",
+            (guild_id,),
+        ).fetchone()
+        sid, last = snap if snap else (None, 0)
+        return (
+            "SELECT user_id, SUM(points) FROM ("
+            "    SELECT user_id, points FROM snapshot_points WHERE snapshot_id=?"
+            "    UNION ALL"
+            "    SELECT user_id, delta FROM ledger WHERE guild_id=? AND entry_id > ?"
+            ") GROUP BY user_id",
+            (sid, guild_id, last),
+        )
+
+    def ledger_points(self, guild_id: int) -> List[Tuple[int, int]]:
+        """The balances rebuild_points() would write, without writing them."""
+        con = self._reader()
+        select, params = self._replay(con, guild_id)
+        return [(int(r[0]), int(r[1])) for r in con.execute(select, params).fetchall()]
+
+    def rebuild_points(self, guild_id: int) -> int:
+        """Recompute a guild's balances from its newest snapshot plus the ledger tail.
+
+        Players whose changes net to zero keep a zero row, as in the live
+        table. Not recreated: a row only ever written with no change (e.g.
+        add_points(0)) since the newest snapshot, as zero deltas are not
+        logged.
+        """
+        with self.transaction() as con:
+            if self._live(con, guild_id)[0]:
+                raise RuntimeError(f"guild {guild_id} is rolling over its season; rebuild once that has finished")
+            select, params = self._replay(con, guild_id)
+            con.execute("DELETE FROM points WHERE guild_id=?", (guild_id,))
+            con.execute(f"INSERT INTO points(guild_id, user_id, points) SELECT ?, * FROM ({select})", (guild_id, *params))
+            self._journal(con, guild_id, "points")
+            return con.execute("SELECT COUNT(*) FROM points WHERE guild_id=?", (guild_id,)).fetchone()[0]
+
+    def all_points(self, guild_id: int) -> List[Tuple[int, int]]:
+        con = self._reader()
+        live, params = self._live(con, guild_id)
+        rows = con.execute(
+            "SELECT user_id, points FROM points WHERE guild_id=?" + live, (guild_id, *params)
+        ).fetchall()
+        return [(int(r[0]), int(r[1])) for r in rows]
+
+    def top_points(self, guild_id: int, limit: int = 10) -> List[Tuple[int, int]]:
+        con = self._reader()
+        live, params = self._live(con, guild_id)
+        rows = con.execute(
+            "SELECT user_id, points FROM points WHERE guild_id=?" + live + " ORDER BY points DESC LIMIT ?",
+            (guild_id, *params, limit),
+        ).fetchall()
+        return [(int(r[0]), int(r[1])) for r in rows]
+
+    # ---------- seasons ----------
+    # A rollover runs as a series of short writes, so other guilds' writes
+    # queue between them instead of behind the whole guild. Its rollovers
+    # row is the season marker: while players remain to be archived, rows
+    # of points and completed above archived_to still belong to the ending
+    # season and readers skip them (_live()). Writing to such a player
+    # first archives their old rows (_settle()), so the new season starts
+    # for them at once. The seasons row appears in the last step, so an
+    # archive is never read half-built.
+    def _live(self, con: sqlite3.Connection, guild_id: int, table: str = "points") -> Tuple[str, tuple]:
+        """``(sql, params)`` to add to a WHERE on ``table``, skipping rows a rollover has yet to archive."""
+        row = con.execute(
+            "SELECT season FROM rollovers WHERE guild_id=? AND archived_to < ?", (guild_id, _ROLLOVER_RANKING)
+        ).fetchone()
+        if row is None:
+            return "", ()
+        # archived_to is looked up again inside the query, so it all reads one snapshot
+        return (
+            f" AND ({table}.user_id <= COALESCE((SELECT archived_to FROM rollovers WHERE guild_id=?), ?)"
+            f" OR EXISTS (SELECT 1 FROM season_staging s WHERE s.guild_id=? AND s.season=? AND s.user_id={table}.user_id))",
+            (guild_id, _ROLLOVER_RANKING, guild_id, row[0]),
+        )
+
+    def _settle(self, con: sqlite3.Connection, guild_id: int, user_ids: Iterable[int]) -> None:
+        """Archive the ending season's rows of ``user_ids`` before they are written to."""
+        row = con.execute("SELECT season, archived_to FROM rollovers WHERE guild_id=?", (guild_id,)).fetchone()
+        if row is None or row[1] == _ROLLOVER_RANKING:
+            return
+        season, archived_to = row
+        todo = {uid for uid in user_ids if uid > archived_to}
+        if not todo:
+            return
+        todo -= {r[0] for r in self._select_in(
+            con, "SELECT user_id FROM season_staging WHERE guild_id=? AND season=? AND user_id IN ({})",
+            (guild_id, season), list(todo),
+        )}
+        if not todo:
+            return
+        old = dict(self._select_in(
+            con, "DELETE FROM points WHERE guild_id=? AND user_id IN ({}) RETURNING user_id, points", (guild_id,), list(todo)
+        ))
+        # A NULL balance still marks the player as archived
+        con.executemany(
+            "INSERT INTO season_staging(guild_id, season, user_id, points) VALUES(?, ?, ?, ?)",
+            [(guild_id, season, uid, old.get(uid)) for uid in todo],
+        )
+        done = [r[0] for r in self._select_in(
+            con, "DELETE FROM completed WHERE guild_id=? AND user_id IN ({}) RETURNING user_id", (guild_id,), list(todo)
+        )]
+        con.executemany(
+            "INSERT INTO season_completed(guild_id, season, user_id) VALUES(?, ?, ?)",
+            [(guild_id, season, uid) for uid in done],
+        )
+
+    def rollover_season(self, guild_id: int, ended_at: Optional[int] = None) -> Tuple[int, int]:
+        """Archive the guild's standings and completions as its next season, then reset both.
+
+        Runs begin_rollover() and then rollover_step() until it is done, each
+        in its own transaction. Returns ``(season, players)``.
+        """
+        season = self.begin_rollover(guild_id, ended_at)
+        while (done := self.rollover_step(guild_id, season)) is None:
+            pass
+        return done
+
+    def begin_rollover(self, guild_id: int, ended_at: Optional[int] = None) -> int:
+        """Start archiving the guild's season; returns its number, or that of the rollover already under way.
+
+        From here on the guild's points and completions read as reset.
+        Rather than a ledger entry per player, the reset is recorded as a
+        ledger snapshot with no balances, so rebuild_points() starts the new
+        season from zero.
+        """
+        with self.transaction() as con:
+            row = con.execute("SELECT season FROM rollovers WHERE guild_id=?", (guild_id,)).fetchone()
             if row:
-                new_val = int(row[0]) + amount
-                con.execute(
-                    "UPDATE points SET points=? WHERE user_id=?",
-                    (new_val, user_id)
-                )
-            else:
-                new_val = amount
-                con.execute(
-                    "INSERT INTO points(user_id, points) VALUES(?,?)",
-                    (user_id, new_val)
-                )
-            con.commit()
-            return new_val
-        finally:
-            con.close()
+                return int(row[0])
+            season = con.execute(
+                "SELECT COALESCE(MAX(season), 0) + 1 FROM seasons WHERE guild_id=?", (guild_id,)
+            ).fetchone()[0]
+            con.execute(
+                "INSERT INTO rollovers(guild_id, season, ended_at, archived_to) VALUES(?, ?, ?, -1)",
+                (guild_id, season, ended_at or now_ms()),
+            )
+            self.snapshot_ledger(guild_id)
+            self._journal(con, guild_id, "points")
+        return int(season)
 
-    def set_points(self, user_id: int, points: int) -> None:
-        con = self._connect()
-        try:
+    def rollover_step(self, guild_id: int, season: int, chunk: int = ROLLOVER_CHUNK) -> Optional[Tuple[int, int]]:
+        """Archive or rank up to ``chunk`` more players; returns ``(season, players)`` once the season is archived."""
+        with self.transaction() as con:
+            row = con.execute(
+                "SELECT archived_to, position, last_points, last_rank FROM rollovers WHERE guild_id=? AND season=?",
+                (guild_id, season),
+            ).fetchone()
+            if row is None:
+                # Finished by an earlier call
+                done = con.execute(
+                    "SELECT players FROM seasons WHERE guild_id=? AND season=?", (guild_id, season)
+                ).fetchone()
+                if done is None:
+                    raise RuntimeError(f"guild {guild_id} has no season {season} rollover")
+                return season, int(done[0])
+            archived_to, position, last_points, last_rank = row
+            if archived_to != _ROLLOVER_RANKING:
+                self._archive_players(con, guild_id, season, archived_to, chunk)
+                return None
+            return self._rank_players(con, guild_id, season, chunk, position, last_points, last_rank)
+
+    def _archive_players(self, con: sqlite3.Connection, guild_id: int, season: int, archived_to: int, chunk: int) -> None:
+        # Up to the lower of the chunk-th next user_id in either table
+        ends = [con.execute(
+            f"SELECT user_id FROM {table} WHERE guild_id=? AND user_id > ? ORDER BY user_id LIMIT 1 OFFSET ?",
+            (guild_id, archived_to, chunk - 1),
+        ).fetchone() for table in SEASON_TABLES]
+        upto = min((int(r[0]) for r in ends if r), default=_ROLLOVER_RANKING)
+        # Players archived by _settle() already have a staging row, and their rows are new
+        pick = (
+            "WHERE guild_id=? AND user_id > ? AND user_id <= ? AND NOT EXISTS "
+            "(SELECT 1 FROM season_staging s WHERE s.guild_id=? AND s.season=? AND s.user_id={}.user_id)"
+        )
+        params = (guild_id, archived_to, upto, guild_id, season)
+        done = con.execute(f"DELETE FROM completed {pick.format('completed')} RETURNING user_id", params).fetchall()
+        con.executemany(
+            "INSERT INTO season_completed(guild_id, season, user_id) VALUES(?, ?, ?)",
+            [(guild_id, season, uid) for (uid,) in done],
+        )
+        moved = con.execute(f"DELETE FROM points {pick.format('points')} RETURNING user_id, points", params).fetchall()
+        con.executemany(
+            "INSERT INTO season_staging(guild_id, season, user_id, points) VALUES(?, ?, ?, ?)",
+            [(guild_id, season, uid, pts) for uid, pts in moved],
+        )
+        con.execute("UPDATE rollovers SET archived_to=? WHERE guild_id=?", (upto, guild_id))
+
+    def _rank_players(
+        self, con: sqlite3.Connection, guild_id: int, season: int, chunk: int,
+        position: int, last_points: Optional[int], last_rank: int,
+    ) -> Optional[Tuple[int, int]]:
+        # Highest balances first, the NULL markers last
+        rows = con.execute(
+            "SELECT user_id, points FROM season_staging WHERE guild_id=? AND season=? ORDER BY points DESC, user_id LIMIT ?",
+            (guild_id, season, chunk),
+        ).fetchall()
+        ranked = []
+        for uid, pts in rows:
+            if pts is None:
+                continue
+            position += 1
+            # Tied players share the rank of the first of them, like RANK()
+            if pts != last_points:
+                last_points, last_rank = pts, position
+            ranked.append((guild_id, season, position, uid, pts, last_rank))
+        con.executemany(
+            "INSERT INTO season_points(guild_id, season, position, user_id, points, rank) VALUES(?, ?, ?, ?, ?, ?)",
+            ranked,
+        )
+        con.executemany(
+            "DELETE FROM season_staging WHERE guild_id=? AND season=? AND user_id=?",
+            [(guild_id, season, uid) for uid, _ in rows],
+        )
+        if len(rows) == chunk:
             con.execute(
-                "INSERT INTO points(user_id, points) VALUES(?, ?) "
-                "ON CONFLICT(user_id) DO UPDATE SET points=excluded.points",
-                (user_id, points),
+                "UPDATE rollovers SET position=?, last_points=?, last_rank=? WHERE guild_id=?",
+                (position, last_points, last_rank, guild_id),
             )
-            con.commit()
-        finally:
-            con.close()
+            return None
+        con.execute(
+            "INSERT INTO seasons(guild_id, season, ended_at, players) "
+            "SELECT guild_id, season, ended_at, ? FROM rollovers WHERE guild_id=?",
+            (position, guild_id),
+        )
+        con.execute("DELETE FROM rollovers WHERE guild_id=?", (guild_id,))
+        return season, position
 
-    def clear_points(self) -> None:
-        con = self._connect()
-        try:
-            con.execute("DELETE FROM points")
-            con.commit()
-        finally:
-            con.close()
+    def list_rollovers(self) -> List[Tuple[int, int]]:
+        """``(guild_id, season)`` of every rollover left unfinished, e.g. by a restart."""
+        rows = self._reader().execute("SELECT guild_id, season FROM rollovers").fetchall()
+        return [(int(r[0]), int(r[1])) for r in rows]
 
-    def top_points(self, limit: int = 10) -> List[Tuple[int, int]]:
-        con = self._connect()
-        try:
-            rows = con.execute(
-                "SELECT user_id, points FROM points ORDER BY points DESC LIMIT ?",
-                (limit,),
-            ).fetchall()
-            return [(int(r[0]), int(r[1])) for r in rows]
-        finally:
-            con.close()
+    def list_seasons(self, guild_id: int) -> List[Tuple[int, int, int]]:
+        """``(season, ended_at, players)`` for every archived season, oldest first."""
+        rows = self._reader().execute(
+            "SELECT season, ended_at, players FROM seasons WHERE guild_id=? ORDER BY season", (guild_id,)
+        ).fetchall()
+        return [(int(r[0]), int(r[1]), int(r[2])) for r in rows]
+
+    def season_standings(self, guild_id: int, season: int, start: int = 1, limit: int = 10) -> List[Tuple[int, int, int]]:
+        """``(rank, user_id, points)`` for ``limit`` players from leaderboard position ``start``."""
+        # Joined to seasons so a season still being archived reads as absent
+        rows = self._reader().execute(
+            "SELECT rank, user_id, points FROM season_points JOIN seasons USING (guild_id, season) "
+            "WHERE guild_id=? AND season=? AND position >= ? ORDER BY position LIMIT ?",
+            (guild_id, season, start, limit),
+        ).fetchall()
+        return [(int(r[0]), int(r[1]), int(r[2])) for r in rows]
+
+    def season_position(self, guild_id: int, season: int, user_id: int) -> Optional[int]:
+        row = self._reader().execute(
+            "SELECT position FROM season_points JOIN seasons USING (guild_id, season) "
+            "WHERE guild_id=? AND season=? AND user_id=?",
+            (guild_id, season, user_id),
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def season_completed(self, guild_id: int, season: int) -> List[int]:
+        rows = self._reader().execute(
+            "SELECT user_id FROM season_completed JOIN seasons USING (guild_id, season) "
+            "WHERE guild_id=? AND season=? ORDER BY user_id",
+            (guild_id, season),
+        ).fetchall()
+        return [int(r[0]) for r in rows]
 
     # ---------- completed ----------
-    def mark_completed(self, user_id: int) -> None:
-        con = self._connect()
-        try:
+    def mark_completed(self, guild_id: int, user_id: int) -> None:
+        with self.transaction() as con:
+            self._settle(con, guild_id, [user_id])
             con.execute(
-                "INSERT OR IGNORE INTO completed(user_id) VALUES(?)",
-                (user_id,)
+                "INSERT OR IGNORE INTO completed(guild_id, user_id) VALUES(?, ?)",
+                (guild_id, user_id)
             )
-            con.commit()
-        finally:
-            con.close()
 
-    def clear_completed(self) -> None:
-        con = self._connect()
-        try:
-            con.execute("DELETE FROM completed")
-            con.commit()
-        finally:
-            con.close()
+    def clear_completed(self, guild_id: int) -> None:
+        with self.transaction() as con:
+            live, params = self._live(con, guild_id, "completed")
+            con.execute("DELETE FROM completed WHERE guild_id=?" + live, (guild_id, *params))
 
-    def list_completed(self) -> List[int]:
-        con = self._connect()
-        try:
-            rows = con.execute("SELECT user_id FROM completed").fetchall()
-            return [int(r[0]) for r in rows]
-        finally:
-            con.close()
+    def list_completed(self, guild_id: int) -> List[int]:
+        con = self._reader()
+        live, params = self._live(con, guild_id, "completed")
+        rows = con.execute(
+            "SELECT user_id FROM completed WHERE guild_id=?" + live, (guild_id, *params)
+        ).fetchall()
+        return [int(r[0]) for r in rows]
+
+    # Keyset pages: pass the last row's key from the previous page as ``after``.
+    def page_completed(self, guild_id: int, after: Optional[int] = None, limit: int = 25) -> List[int]:
+        con = self._reader()
+        live, params = self._live(con, guild_id, "completed")
+        rows = con.execute(
+            "SELECT user_id FROM completed WHERE guild_id=? AND user_id > ?" + live + " ORDER BY user_id LIMIT ?",
+            (guild_id, after if after is not None else -1, *params, limit),
+        ).fetchall()
+        return [int(r[0]) for r in rows]
 
     # ---------- pending ----------
-    def add_pending(self, challenged_id: int, challenger_id: int, created_at: Optional[str] = None) -> None:
-        con = self._connect()
-        try:
+    def _add_reminder(self, con: sqlite3.Connection, guild_id: int, challenged_id: int, created_at: int) -> None:
+        con.execute(
+            "INSERT OR REPLACE INTO reminders(guild_id, challenged_id, due_at) VALUES(?, ?, ?)",
+            (guild_id, challenged_id, created_at + REMINDER_AFTER // _MS),
+        )
+
+    def add_pending(self, guild_id: int, challenged_id: int, challenger_id: int, created_at: Optional[int] = None) -> None:
+        created_at = created_at or now_ms()
+        with self.transaction() as con:
             con.execute(
-                "INSERT OR REPLACE INTO pending(challenged_id, challenger_id, created_at) VALUES(?,?,?)",
-                (challenged_id, challenger_id, created_at or utcnow_iso()),
+                "INSERT OR REPLACE INTO pending(guild_id, challenged_id, challenger_id, created_at) VALUES(?,?,?,?)",
+                (guild_id, challenged_id, challenger_id, created_at),
             )
-            con.commit()
-        finally:
-            con.close()
+            self._add_reminder(con, guild_id, challenged_id, created_at)
+            self._journal(con, guild_id, "battles")
 
-    def remove_pending(self, challenged_id: int) -> None:
-        con = self._connect()
-        try:
-            con.execute("DELETE FROM pending WHERE challenged_id=?", (challenged_id,))
-            con.commit()
-        finally:
-            con.close()
+    def try_add_pending(self, guild_id: int, challenged_id: int, challenger_id: int, created_at: Optional[int] = None) -> bool:
+        """Insert a challenge unless the player already has a pending or active battle in the guild."""
+        created_at = created_at or now_ms()
+        with self.transaction() as con:
+            cur = con.execute(
+                "INSERT INTO pending(guild_id, challenged_id, challenger_id, created_at) "
+                "SELECT ?, ?, ?, ? WHERE NOT EXISTS ("
+                "    SELECT 1 FROM active WHERE guild_id=? AND (user_a=? OR user_b=?)"
+                ") ON CONFLICT(guild_id, challenged_id) DO NOTHING",
+                (guild_id, challenged_id, challenger_id, created_at, guild_id, challenged_id, challenged_id),
+            )
+            if cur.rowcount != 1:
+                return False
+            self._add_reminder(con, guild_id, challenged_id, created_at)
+            self._journal(con, guild_id, "battles")
+            return True
 
-    def get_pending(self, challenged_id: int) -> Optional[PendingChallenge]:
-        con = self._connect()
-        try:
+    def remove_pending(self, guild_id: int, challenged_id: int) -> None:
+        with self.transaction() as con:
+            con.execute("DELETE FROM pending WHERE guild_id=? AND challenged_id=?", (guild_id, challenged_id))
+            con.execute("DELETE FROM reminders WHERE guild_id=? AND challenged_id=?", (guild_id, challenged_id))
+            self._journal(con, guild_id, "battles")
+
+    def get_pending(self, guild_id: int, challenged_id: int) -> Optional[PendingChallenge]:
+        row = self._reader().execute(
+            "SELECT challenger_id, created_at FROM pending WHERE guild_id=? AND challenged_id=?",
+            (guild_id, challenged_id),
+        ).fetchone()
+        if not row:
+            return None
+        return PendingChallenge(guild_id, challenged_id, int(row[0]), int(row[1]))
+
+    def list_pending(self, guild_id: Optional[int] = None) -> List[PendingChallenge]:
+        """One guild's pending challenges, or every guild's when ``guild_id`` is None."""
+        if guild_id is None:
+            rows = self._reader().execute(
+                "SELECT guild_id, challenged_id, challenger_id, created_at FROM pending ORDER BY created_at ASC"
+            ).fetchall()
+        else:
+            rows = self._reader().execute(
+                "SELECT guild_id, challenged_id, challenger_id, created_at FROM pending "
+                "WHERE guild_id=? ORDER BY created_at ASC",
+                (guild_id,),
+            ).fetchall()
+        return [PendingChallenge(int(r[0]), int(r[1]), int(r[2]), int(r[3])) for r in rows]
+
+    def page_pending(
+        self,
+        guild_id: int,
+        after: Optional[Tuple[int, int]] = None,
+        limit: int = 25,
+        user_id: Optional[int] = None,
+        created_before: Optional[int] = None,
+    ) -> List[PendingChallenge]:
+        """Pending challenges ordered by (created_at, challenged_id), optionally for one player or older than a time."""
+        where, params = ["guild_id = ?"], [guild_id]
+        if after is not None:
+            where.append("(created_at, challenged_id) > (?, ?)")
+            params += list(after)
+        if user_id is not None:
+            where.append("(challenged_id = ? OR challenger_id = ?)")
+            params += [user_id, user_id]
+        if created_before is not None:
+            where.append("created_at <= ?")
+            params.append(created_before)
+        rows = self._reader().execute(
+            "SELECT challenged_id, challenger_id, created_at FROM pending "
+            "WHERE " + " AND ".join(where) + " "
+            "ORDER BY created_at, challenged_id LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+        return [PendingChallenge(guild_id, int(r[0]), int(r[1]), int(r[2])) for r in rows]
+
+    def clear_pending(self, guild_id: int) -> None:
+        with self.transaction() as con:
+            con.execute("DELETE FROM pending WHERE guild_id=?", (guild_id,))
+            con.execute("DELETE FROM reminders WHERE guild_id=?", (guild_id,))
+            self._journal(con, guild_id, "battles")
+
+    def accept_pending(self, guild_id: int, challenged_id: int, accepted_at: Optional[int] = None) -> Optional[PendingChallenge]:
+        """Move a pending challenge to active in one transaction; None if it was no longer pending."""
+        with self.transaction() as con:
             row = con.execute(
-                "SELECT challenged_id, challenger_id, created_at FROM pending WHERE challenged_id=?",
-                (challenged_id,),
+                "DELETE FROM pending WHERE guild_id=? AND challenged_id=? RETURNING challenger_id, created_at",
+                (guild_id, challenged_id),
             ).fetchone()
             if not row:
                 return None
-            return PendingChallenge(int(row[0]), int(row[1]), str(row[2]))
-        finally:
-            con.close()
+            con.execute("DELETE FROM reminders WHERE guild_id=? AND challenged_id=?", (guild_id, challenged_id))
+            con.execute(
+                "INSERT OR REPLACE INTO active(guild_id, battle_id, user_a, user_b, accepted_at) VALUES(?,?,?,?,?)",
+                (guild_id, battle_id(challenged_id, row[0]), challenged_id, int(row[0]), accepted_at or now_ms()),
+            )
+            self._journal(con, guild_id, "battles")
+        return PendingChallenge(guild_id, challenged_id, int(row[0]), int(row[1]))
 
-    def list_pending(self) -> List[PendingChallenge]:
-        con = self._connect()
-        try:
+    # ---------- reminders / expiry (all guilds) ----------
+    def next_due(self) -> List[int]:
+        """Earliest reminder and earliest expiry still outstanding, in epoch ms (index lookups only)."""
+        con = self._reader()
+        reminder = con.execute("SELECT MIN(due_at) FROM reminders").fetchone()[0]
+        oldest = con.execute("SELECT MIN(created_at) FROM pending").fetchone()[0]
+        due = [int(reminder)] if reminder is not None else []
+        if oldest is not None:
+            due.append(int(oldest) + CHALLENGE_TTL // _MS)
+        return due
+
+    def pop_due_reminders(self, now: int) -> List[Tuple[int, int]]:
+        """``(guild_id, challenged_id)`` for every reminder due by ``now``."""
+        with self.transaction() as con:
             rows = con.execute(
-                "SELECT challenged_id, challenger_id, created_at FROM pending ORDER BY created_at ASC"
+                "DELETE FROM reminders WHERE due_at <= ? RETURNING guild_id, challenged_id",
+                (now,),
             ).fetchall()
-            return [PendingChallenge(int(r[0]), int(r[1]), str(r[2])) for r in rows]
-        finally:
-            con.close()
+        return [(int(r[0]), int(r[1])) for r in rows]
 
-    def clear_pending(self) -> None:
-        con = self._connect()
-        try:
-            con.execute("DELETE FROM pending")
-            con.commit()
-        finally:
-            con.close()
+    def expire_pending(self, created_before: int) -> List[PendingChallenge]:
+        """Delete every challenge created at or before ``created_before`` in one sweep."""
+        with self.transaction() as con:
+            rows = con.execute(
+                "DELETE FROM pending WHERE created_at <= ? "
+                "RETURNING guild_id, challenged_id, challenger_id, created_at",
+                (created_before,),
+            ).fetchall()
+            con.executemany(
+                "DELETE FROM reminders WHERE guild_id=? AND challenged_id=?",
+                [(r[0], r[1]) for r in rows],
+            )
+            for guild_id in {int(r[0]) for r in rows}:
+                self._journal(con, guild_id, "battles")
+        return [PendingChallenge(int(r[0]), int(r[1]), int(r[2]), int(r[3])) for r in rows]
 
     # ---------- active ----------
     def _battle_id(self, a: int, b: int) -> str:
-        x, y = (a, b) if a < b else (b, a)
-        return f"{x}:{y}"
+        return battle_id(a, b)
 
-    def add_active(self, user_a: int, user_b: int, accepted_at: Optional[str] = None) -> None:
+    def add_active(self, guild_id: int, user_a: int, user_b: int, accepted_at: Optional[int] = None) -> None:
         bid = self._battle_id(user_a, user_b)
-        con = self._connect()
-        try:
+        with self.transaction() as con:
             con.execute(
-                "INSERT OR REPLACE INTO active(battle_id, user_a, user_b, accepted_at) VALUES(?,?,?,?)",
-                (bid, user_a, user_b, accepted_at or utcnow_iso()),
+                "INSERT OR REPLACE INTO active(guild_id, battle_id, user_a, user_b, accepted_at) VALUES(?,?,?,?,?)",
+                (guild_id, bid, user_a, user_b, accepted_at or now_ms()),
             )
-            con.commit()
-        finally:
-            con.close()
+            self._journal(con, guild_id, "battles")
 
-    def remove_active(self, user_a: int, user_b: int) -> None:
+    def remove_active(self, guild_id: int, user_a: int, user_b: int) -> None:
         bid = self._battle_id(user_a, user_b)
-        con = self._connect()
-        try:
-            con.execute("DELETE FROM active WHERE battle_id=?", (bid,))
-            con.commit()
-        finally:
-            con.close()
+        with self.transaction() as con:
+            con.execute("DELETE FROM active WHERE guild_id=? AND battle_id=?", (guild_id, bid))
+            self._journal(con, guild_id, "battles")
 
-    def get_active(self, user_a: int, user_b: int) -> Optional[ActiveBattle]:
+    def complete_active(self, guild_id: int, user_a: int, user_b: int) -> Optional[ActiveBattle]:
+        """Remove an active battle to record its result; None if it was no longer active."""
         bid = self._battle_id(user_a, user_b)
-        con = self._connect()
-        try:
+        with self.transaction() as con:
             row = con.execute(
-                "SELECT user_a, user_b, accepted_at FROM active WHERE battle_id=?",
-                (bid,),
+                "DELETE FROM active WHERE guild_id=? AND battle_id=? RETURNING user_a, user_b, accepted_at",
+                (guild_id, bid),
             ).fetchone()
             if not row:
                 return None
-            return ActiveBattle(int(row[0]), int(row[1]), str(row[2]))
-        finally:
-            con.close()
+            self._journal(con, guild_id, "battles")
+        return ActiveBattle(guild_id, int(row[0]), int(row[1]), int(row[2]))
 
-    def list_active(self) -> List[ActiveBattle]:
-        con = self._connect()
-        try:
-            rows = con.execute(
-                "SELECT user_a, user_b, accepted_at FROM active ORDER BY accepted_at ASC"
+    def get_active(self, guild_id: int, user_a: int, user_b: int) -> Optional[ActiveBattle]:
+        bid = self._battle_id(user_a, user_b)
+        row = self._reader().execute(
+            "SELECT user_a, user_b, accepted_at FROM active WHERE guild_id=? AND battle_id=?",
+            (guild_id, bid),
+        ).fetchone()
+        if not row:
+            return None
+        return ActiveBattle(guild_id, int(row[0]), int(row[1]), int(row[2]))
+
+    def list_active(self, guild_id: Optional[int] = None) -> List[ActiveBattle]:
+        """One guild's active battles, or every guild's when ``guild_id`` is None."""
+        if guild_id is None:
+            rows = self._reader().execute(
+                "SELECT guild_id, user_a, user_b, accepted_at FROM active ORDER BY accepted_at ASC"
+            ).fetchall()
+        else:
+            rows = self._reader().execute(
+                "SELECT guild_id, user_a, user_b, accepted_at FROM active "
+                "WHERE guild_id=? ORDER BY accepted_at ASC",
+                (guild_id,),
             ).fetchall()
-            return [ActiveBattle(int(r[0]), int(r[1]), str(r[2])) for r in rows]
+        return [ActiveBattle(int(r[0]), int(r[1]), int(r[2]), int(r[3])) for r in rows]
+
+    def page_active(
+        self,
+        guild_id: int,
+        after: Optional[Tuple[int, str]] = None,
+        limit: int = 25,
+        user_id: Optional[int] = None,
+        accepted_before: Optional[int] = None,
+    ) -> List[ActiveBattle]:
+        """Active battles ordered by (accepted_at, battle_id), optionally for one player or older than a time."""
+        where, params = ["guild_id = ?"], [guild_id]
+        if after is not None:
+            where.append("(accepted_at, battle_id) > (?, ?)")
+            params += list(after)
+        if user_id is not None:
+            where.append("(user_a = ? OR user_b = ?)")
+            params += [user_id, user_id]
+        if accepted_before is not None:
+            where.append("accepted_at <= ?")
+            params.append(accepted_before)
+        rows = self._reader().execute(
+            "SELECT user_a, user_b, accepted_at FROM active "
+            "WHERE " + " AND ".join(where) + " "
+            "ORDER BY accepted_at, battle_id LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+        return [ActiveBattle(guild_id, int(r[0]), int(r[1]), int(r[2])) for r in rows]
+
+    def clear_active(self, guild_id: int) -> None:
+        with self.transaction() as con:
+            con.execute("DELETE FROM active WHERE guild_id=?", (guild_id,))
+            self._journal(con, guild_id, "battles")
+
+    # ---------- matches / ratings ----------
+    def record_match(
+        self,
+        guild_id: int,
+        user_a: int,
+        user_b: int,
+        winner_id: int,
+        accepted_at: int,
+        completed_at: int,
+        ratings: Iterable[Tuple[int, Rating]],
+    ) -> int:
+        """Append a finished battle to the history and store both players' updated ratings."""
+        ratings = list(ratings)
+        with self.transaction() as con:
+            match_id = con.execute(
+                "INSERT INTO matches(guild_id, user_a, user_b, winner_id, accepted_at, completed_at) "
+                "VALUES(?, ?, ?, ?, ?, ?) RETURNING match_id",
+                (guild_id, user_a, user_b, winner_id, accepted_at, completed_at),
+            ).fetchone()[0]
+            con.executemany(
+                "INSERT OR REPLACE INTO ratings(guild_id, user_id, rating, games, wins) VALUES(?, ?, ?, ?, ?)",
+                [(guild_id, uid, *rating) for uid, rating in ratings],
+            )
+            self._journal(con, guild_id, "ratings", (uid for uid, _ in ratings))
+        return int(match_id)
+
+    def match_history(self, guild_id: int) -> List[Tuple[int, int, int]]:
+        """``(user_a, user_b, winner_id)`` for every recorded match, oldest first."""
+        return self._reader().execute(
+            "SELECT user_a, user_b, winner_id FROM matches WHERE guild_id=? ORDER BY match_id", (guild_id,)
+        ).fetchall()
+
+    def list_ratings(self, guild_id: Optional[int] = None) -> List[Tuple[int, int, Rating]]:
+        """``(guild_id, user_id, (rating, games, wins))`` for one guild, or every guild."""
+        sql = "SELECT guild_id, user_id, rating, games, wins FROM ratings"
+        rows = self._reader().execute(
+            sql + (" WHERE guild_id=?" if guild_id is not None else ""),
+            (guild_id,) if guild_id is not None else (),
+        ).fetchall()
+        return [(int(r[0]), int(r[1]), (float(r[2]), int(r[3]), int(r[4]))) for r in rows]
+
+    def get_ratings_rows(self, guild_id: int, user_ids: Iterable[int]) -> Dict[int, Rating]:
+        """Ratings for the given players; unrated players are left out."""
+        rows = self._select_in(
+            self._reader(), "SELECT user_id, rating, games, wins FROM ratings WHERE guild_id=? AND user_id IN ({})",
+            (guild_id,), list(user_ids),
+        )
+        return {int(r[0]): (float(r[1]), int(r[2]), int(r[3])) for r in rows}
+
+    def replace_ratings(self, guild_id: int, ratings: Dict[int, Rating]) -> None:
+        """Swap in a full recompute (see ratings.recompute)."""
+        with self.transaction() as con:
+            con.execute("DELETE FROM ratings WHERE guild_id=?", (guild_id,))
+            con.executemany(
+                "INSERT INTO ratings(guild_id, user_id, rating, games, wins) VALUES(?, ?, ?, ?, ?)",
+                [(guild_id, uid, *rating) for uid, rating in ratings.items()],
+            )
+            self._journal(con, guild_id, "ratings")
+
+    # ---------- matchmaking queue ----------
+    def queue_add(self, guild_id: int, user_id: int, joined_at: int) -> None:
+        with self.transaction() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO queue(guild_id, user_id, joined_at) VALUES(?, ?, ?)",
+                (guild_id, user_id, joined_at),
+            )
+
+    def queue_remove(self, guild_id: int, user_ids: Iterable[int]) -> None:
+        with self.transaction() as con:
+            con.executemany("DELETE FROM queue WHERE guild_id=? AND user_id=?", [(guild_id, uid) for uid in user_ids])
+
+    def clear_queue(self, guild_id: int) -> None:
+        with self.transaction() as con:
+            con.execute("DELETE FROM queue WHERE guild_id=?", (guild_id,))
+
+    def list_queue(self) -> List[Tuple[int, int, int]]:
+        """``(guild_id, user_id, joined_at)`` for every queued player, longest waiting first."""
+        rows = self._reader().execute(
+            "SELECT guild_id, user_id, joined_at FROM queue ORDER BY joined_at"
+        ).fetchall()
+        return [(int(r[0]), int(r[1]), int(r[2])) for r in rows]
+
+    def try_add_active(self, guild_id: int, user_a: int, user_b: int, accepted_at: Optional[int] = None) -> bool:
+        """Start a battle and dequeue both players, unless either has a pending challenge or active battle."""
+        with self.transaction() as con:
+            cur = con.execute(
+                "INSERT INTO active(guild_id, battle_id, user_a, user_b, accepted_at) "
+                "SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS ("
+                "    SELECT 1 FROM active WHERE guild_id=? AND (user_a IN (?, ?) OR user_b IN (?, ?))"
+                ") AND NOT EXISTS ("
+                "    SELECT 1 FROM pending WHERE guild_id=? AND challenged_id IN (?, ?)"
+                ") ON CONFLICT(guild_id, battle_id) DO NOTHING",
+                (
+                    guild_id, self._battle_id(user_a, user_b), user_a, user_b, accepted_at or now_ms(),
+                    guild_id, user_a, user_b, user_a, user_b,
+                    guild_id, user_a, user_b,
+                ),
+            )
+            if cur.rowcount != 1:
+                return False
+            con.executemany("DELETE FROM queue WHERE guild_id=? AND user_id=?", [(guild_id, user_a), (guild_id, user_b)])
+            self._journal(con, guild_id, "battles")
+            return True
+
+    # ---------- bulk import/export ----------
+    def export_rows(self, guild_id: int, kind: str, batch: int = 5000) -> Iterator[tuple]:
+        """Stream one guild's rows of ``kind`` in TRANSFER_COLUMNS order, ``batch`` rows at a time."""
+        con = self._reader()
+        live, params = self._live(con, guild_id, kind) if kind in SEASON_TABLES else ("", ())
+        cur = con.execute(
+            f"SELECT {', '.join(TRANSFER_COLUMNS[kind])} FROM {kind} WHERE guild_id=?{live} ORDER BY {_TRANSFER_KEYS[kind]}",
+            (guild_id, *params),
+        )
+        while rows := cur.fetchmany(batch):
+            yield from rows
+
+    @staticmethod
+    def _transfer_key(kind: str, row: tuple):
+        return battle_id(row[0], row[1]) if kind == "active" else row[0]
+
+    def _diff(self, con: sqlite3.Connection, guild_id: int, kind: str, rows: List[tuple]) -> Tuple[List[tuple], List[Tuple[tuple, tuple]]]:
+        # Last row wins for repeated keys, as it would row by row
+        imported = {self._transfer_key(kind, row): row for row in rows}
+        key_col = _TRANSFER_KEYS[kind]
+        cols = ", ".join(TRANSFER_COLUMNS[kind])
+        live, params = self._live(con, guild_id, kind) if kind in SEASON_TABLES else ("", ())
+        rows = self._select_in(
+            con, f"SELECT {key_col}, {cols} FROM {kind} WHERE guild_id=?{live} AND {key_col} IN ({{}})",
+            (guild_id, *params), list(imported),
+        )
+        stored = {r[0]: tuple(r[1:]) for r in rows}
+        added = [row for key, row in imported.items() if key not in stored]
+        changed = [(stored[key], row) for key, row in imported.items() if key in stored and stored[key] != row]
+        return added, changed
+
+    def diff_rows(self, guild_id: int, kind: str, rows: List[tuple]) -> Tuple[List[tuple], List[Tuple[tuple, tuple]]]:
+        """What importing ``rows`` would do: ``(new rows, [(stored row, imported row)] that differ)``."""
+        return self._diff(self._reader(), guild_id, kind, rows)
+
+    def import_rows(self, guild_id: int, kind: str, rows: List[tuple], reason: str = "import") -> Tuple[int, int]:
+        """Upsert one chunk of ``kind`` rows in a single transaction; returns ``(added, changed)``.
+
+        Only new and changed rows are written. Points land through the ledger
+        like any other change, pending rows get their reminder. Caches are
+        not touched: call ``mark_changed()`` once the last chunk is in.
+        """
+        with self.transaction() as con:
+            if kind in SEASON_TABLES:
+                self._settle(con, guild_id, [row[0] for row in rows])
+            added, changed = self._diff(con, guild_id, kind, rows)
+            writes = added + [new for _, new in changed]
+            if kind == "points":
+                deltas = [(uid, pts) for uid, pts in added if pts]
+                deltas += [(uid, pts - old) for (_, old), (uid, pts) in changed]
+                # Ledger rows as _record() writes them, minus the per-user journal
+                now = utcnow_iso()
+                con.executemany(
+                    "INSERT INTO ledger(guild_id, user_id, delta, reason, created_at) VALUES(?, ?, ?, ?, ?)",
+                    [(guild_id, uid, delta, reason, now) for uid, delta in deltas],
+                )
+                # In score order, so idx_points_points is appended to rather than scattered
+                writes.sort(key=lambda row: row[1], reverse=True)
+                con.executemany(
+                    "INSERT INTO points(guild_id, user_id, points) VALUES(?, ?, ?) "
+                    "ON CONFLICT(guild_id, user_id) DO UPDATE SET points=excluded.points",
+                    [(guild_id, uid, pts) for uid, pts in writes],
+                )
+            elif kind == "pending":
+                con.executemany(
+                    "INSERT OR REPLACE INTO pending(guild_id, challenged_id, challenger_id, created_at) VALUES(?,?,?,?)",
+                    [(guild_id, *row) for row in writes],
+                )
+                con.executemany(
+                    "INSERT OR REPLACE INTO reminders(guild_id, challenged_id, due_at) VALUES(?, ?, ?)",
+                    [(guild_id, cid, created + REMINDER_AFTER // _MS) for cid, _, created in writes],
+                )
+            elif kind == "active":
+                con.executemany(
+                    "INSERT OR REPLACE INTO active(guild_id, battle_id, user_a, user_b, accepted_at) VALUES(?,?,?,?,?)",
+                    [(guild_id, battle_id(a, b), a, b, accepted) for a, b, accepted in writes],
+                )
+            else:
+                con.executemany(
+                    "INSERT OR IGNORE INTO completed(guild_id, user_id) VALUES(?, ?)",
+                    [(guild_id, uid) for (uid,) in writes],
+                )
+        return len(added), len(changed)
+
+    def mark_changed(self, guild_id: int, kind: str) -> None:
+        """Journal a whole-table change to ``kind`` after a bulk import, for other processes to reload."""
+        with self.transaction() as con:
+            self._journal(con, guild_id, "points" if kind == "points" else "battles")
+
+    # ---------- multi-process coordination ----------
+    def _journal(self, con: sqlite3.Connection, guild_id: int, kind: str, user_ids: Optional[Iterable[int]] = None) -> None:
+        """Note a change to cached state; ``user_ids=None`` means the guild's whole ``kind`` changed."""
+        if not self.journal:
+            return
+        now = time.time()
+        if user_ids is None:
+            con.execute(
+                "INSERT INTO changes(guild_id, kind, user_id, created_at) VALUES(?, ?, NULL, ?)",
+                (guild_id, kind, now),
+            )
+        else:
+            con.executemany(
+                "INSERT INTO changes(guild_id, kind, user_id, created_at) VALUES(?, ?, ?, ?)",
+                [(guild_id, kind, uid, now) for uid in set(user_ids)],
+            )
+
+    def last_change_id(self) -> int:
+        return int(self._reader().execute("SELECT COALESCE(MAX(change_id), 0) FROM changes").fetchone()[0])
+
+    def changes_since(self, after: int, limit: int = FEED_BATCH) -> List[Tuple[int, int, str, Optional[int]]]:
+        """``(change_id, guild_id, kind, user_id)`` rows committed after ``after``, oldest first."""
+        rows = self._reader().execute(
+            "SELECT change_id, guild_id, kind, user_id FROM changes WHERE change_id > ? ORDER BY change_id LIMIT ?",
+            (after, limit),
+        ).fetchall()
+        return [(int(r[0]), int(r[1]), str(r[2]), None if r[3] is None else int(r[3])) for r in rows]
+
+    def prune_changes(self, before: float) -> int:
+        with self.transaction() as con:
+            return con.execute("DELETE FROM changes WHERE created_at < ?", (before,)).rowcount
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """Take or renew lease ``name`` for ``ttl`` seconds; False while someone else holds it."""
+        now = time.time()
+        with self.transaction() as con:
+            con.execute(
+                "INSERT INTO leases(name, holder, expires_at) VALUES(?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder=excluded.holder, expires_at=excluded.expires_at "
+                "WHERE leases.holder=excluded.holder OR leases.expires_at < ?",
+                (name, holder, now + ttl, now),
+            )
+            row = con.execute("SELECT holder FROM leases WHERE name=?", (name,)).fetchone()
+        return row is not None and row[0] == holder
+
+    def release_lease(self, name: str, holder: str) -> None:
+        with self.transaction() as con:
+            con.execute("DELETE FROM leases WHERE name=? AND holder=?", (name, holder))
+
+
+class _WriteOp:
+    __slots__ = ("fn", "args", "kwargs", "loop", "future")
+
+    def __init__(self, fn, args, kwargs, loop, future):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.loop = loop
+        self.future = future
+
+
+class AsyncDataStore:
+    """Awaitable DataStore for use inside the bot's event loop.
+
+    Every write goes through one dedicated writer thread, so writes are
+    serialized on a single connection. Reads run on a small pool of threads,
+    each holding its own read-only WAL connection, so readers never wait on
+    the writer or on each other.
+
+    The writer group-commits: it collects queued mutations for up to
+    ``flush_interval`` seconds or ``max_batch`` operations and applies them
+    in a single transaction, each in its own savepoint. Awaiting a write
+    returns once its batch is committed. With ``write_behind=True``,
+    mutations that return nothing resolve as soon as they are queued; await
+    ``flush()`` when durability matters.
+
+    Points are also kept in a write-through PointsCache, pending/active
+    battles in a BattleIndex and Elo ratings in a plain dict, one of each
+    per guild: call ``warm()`` once at startup and the per-player lookups
+    are served from memory.
+
+    When several processes share the database, pass ``journal=True`` and run
+    ``start_change_feed()``: the caches then replay the other processes'
+    changes from the changes table and are eventually consistent with disk.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "bot_state.sqlite3",
+        readers: int = 4,
+        flush_interval: float = 0.005,
+        max_batch: int = 64,
+        write_behind: bool = False,
+        legacy_guild_id: Optional[int] = None,
+        journal: bool = False,
+    ):
+        self.store = DataStore(db_path, legacy_guild_id, journal)
+        # Per-guild caches, created on first use
+        self.points: Dict[int, PointsCache] = defaultdict(PointsCache)
+        self.battles: Dict[int, BattleIndex] = defaultdict(BattleIndex)
+        self.ratings: Dict[int, Dict[int, Rating]] = defaultdict(dict)
+        self._points_listeners: List[Callable[[int], None]] = []
+        self._battle_listeners: List[Callable[[int], None]] = []
+        self._feed_after = 0
+        self._feed_task: Optional[asyncio.Task] = None
+        # Season rollovers an earlier run left unfinished, picked up by warm()
+        self._resumed: List[asyncio.Task] = []
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.write_behind = write_behind
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="store-reader")
+
+        self._queue: "queue.Queue[Optional[_WriteOp]]" = queue.Queue()
+        self._commit_ms: deque = deque(maxlen=1024)
+        self._batch_sizes: deque = deque(maxlen=1024)
+        self._batches = 0
+        self._ops = 0
+        self._failed = 0
+        self._writer = threading.Thread(target=self._writer_loop, name="store-writer", daemon=True)
+        self._writer.start()
+
+    async def _read(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, functools.partial(fn, *args, **kwargs))
+
+    def _submit(self, fn, *args, **kwargs) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._queue.put(_WriteOp(fn, args, kwargs, loop, fut))
+        return fut
+
+    async def _write(self, fn, *args, **kwargs):
+        return await self._submit(fn, *args, **kwargs)
+
+    async def _mutate(self, fn, *args, **kwargs) -> None:
+        fut = self._submit(fn, *args, **kwargs)
+        if self.write_behind:
+            fut.add_done_callback(self._log_failure)
+            return
+        await fut
+
+    @staticmethod
+    def _log_failure(fut: asyncio.Future) -> None:
+        if not fut.cancelled() and fut.exception():
+            log.error("write-behind mutation failed", exc_info=fut.exception())
+
+    async def flush(self) -> None:
+        """Wait until every write queued before this call is committed."""
+        await self._submit(lambda: None)
+
+    # ---------- writer thread ----------
+    def _writer_loop(self) -> None:
+        while True:
+            op = self._queue.get()
+            if op is None:
+                return
+            batch = [op]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                try:
+                    timeout = deadline - time.monotonic()
+                    nxt = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: List[_WriteOp]) -> None:
+        results = []
+        start = time.perf_counter()
+        try:
+            with self.store.transaction():
+                for op in batch:
+                    try:
+                        with self.store.transaction():
+                            results.append((op, op.fn(*op.args, **op.kwargs), None))
+                    except Exception as e:
+                        results.append((op, None, e))
+        except Exception as e:
+            results = [(op, None, e) for op in batch]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self._batches += 1
+        self._ops += len(batch)
+        self._failed += sum(1 for _, _, err in results if err is not None)
+        self._commit_ms.append(elapsed_ms)
+        self._batch_sizes.append(len(batch))
+
+        for op, result, err in results:
+            try:
+                op.loop.call_soon_threadsafe(self._resolve, op.future, result, err)
+            except RuntimeError:  # event loop already closed
+                pass
+
+    @staticmethod
+    def _resolve(fut: asyncio.Future, result, err) -> None:
+        if fut.done():
+            return
+        if err is not None:
+            fut.set_exception(err)
+        else:
+            fut.set_result(result)
+
+    def stats(self) -> dict:
+        """Group-commit stats over the last 1024 batches, for tuning the flush window."""
+        commit_ms = sorted(self._commit_ms)
+        sizes = list(self._batch_sizes)
+
+        def pct(p: float) -> float:
+            return commit_ms[min(len(commit_ms) - 1, int(p * len(commit_ms)))] if commit_ms else 0.0
+
+        return {
+            "batches": self._batches,
+            "ops": self._ops,
+            "failed": self._failed,
+            "queue_depth": self._queue.qsize(),
+            "batch_size_avg": sum(sizes) / len(sizes) if sizes else 0.0,
+            "batch_size_max": max(sizes, default=0),
+            "commit_ms_p50": pct(0.50),
+            "commit_ms_p99": pct(0.99),
+            "commit_ms_max": commit_ms[-1] if commit_ms else 0.0,
+        }
+
+    async def warm(self) -> None:
+        points = defaultdict(PointsCache)
+        for guild_id in await self._read(self.store.guild_ids):
+            points[guild_id].load(await self._read(self.store.all_points, guild_id))
+        self.points = points
+        ratings = defaultdict(dict)
+        for guild_id, user_id, rating in await self._read(self.store.list_ratings):
+            ratings[guild_id][user_id] = rating
+        self.ratings = ratings
+        await self._reload_battles()
+        for guild_id, season in await self._read(self.store.list_rollovers):
+            self._resumed.append(asyncio.create_task(self._resume_rollover(guild_id, season)))
+
+    async def _reload_battles(self) -> None:
+        pending: Dict[int, List[PendingChallenge]] = defaultdict(list)
+        active: Dict[int, List[ActiveBattle]] = defaultdict(list)
+        for p in await self._read(self.store.list_pending):
+            pending[p.guild_id].append(p)
+        for a in await self._read(self.store.list_active):
+            active[a.guild_id].append(a)
+        battles = defaultdict(BattleIndex)
+        for guild_id in pending.keys() | active.keys():
+            battles[guild_id].load(pending[guild_id], active[guild_id])
+        self.battles = battles
+
+    # ---------- change feed (multi-process) ----------
+    # Own writes are journaled and replayed too: re-reading a row after its
+    # commit is what repairs a cache entry that a concurrent reload clobbered.
+    def on_battles_changed(self, callback: Callable[[int], None]) -> None:
+        """Register a plain callback run with the guild ID when a guild's battles are reloaded wholesale."""
+        self._battle_listeners.append(callback)
+
+    def _battles_changed(self, guild_id: int) -> None:
+        for callback in self._battle_listeners:
+            try:
+                callback(guild_id)
+            except Exception:
+                log.exception("battles listener failed")
+
+    async def start_change_feed(self, interval: float = 0.25) -> None:
+        self._feed_after = await self._read(self.store.last_change_id)
+        self._feed_task = asyncio.create_task(self._follow_changes(interval))
+
+    async def stop_change_feed(self) -> None:
+        if self._feed_task:
+            self._feed_task.cancel()
+            self._feed_task = None
+
+    async def _follow_changes(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Keep going while the feed returns full batches
+                while await self.apply_changes() == FEED_BATCH:
+                    pass
+            except Exception:
+                log.exception("change feed failed")
+
+    async def apply_changes(self) -> int:
+        """Refresh the caches from changes committed since the last call; returns the rows read."""
+        rows = await self._read(self.store.changes_since, self._feed_after)
+        if not rows:
+            return 0
+        self._feed_after = rows[-1][0]
+
+        full_points = set()
+        user_points: Dict[int, set] = defaultdict(set)
+        battle_guilds = set()
+        user_ratings: Dict[int, set] = defaultdict(set)
+        for _, guild_id, kind, user_id in rows:
+            if kind == "battles":
+                battle_guilds.add(guild_id)
+            elif kind == "ratings":
+                # None (a full recompute) is reloaded like a user list of everyone
+                user_ratings[guild_id].add(user_id)
+            elif user_id is None:
+                full_points.add(guild_id)
+            else:
+                user_points[guild_id].add(user_id)
+
+        for guild_id in full_points:
+            self.points[guild_id].load(await self._read(self.store.all_points, guild_id))
+        for guild_id, user_ids in user_points.items():
+            if guild_id in full_points:
+                continue
+            found = await self._read(self.store.get_points_rows, guild_id, user_ids)
+            cache = self.points[guild_id]
+            for user_id in user_ids:
+                if user_id in found:
+                    cache.set(user_id, found[user_id])
+                else:
+                    cache.discard(user_id)
+        for guild_id in battle_guilds:
+            self.battles[guild_id].load(
+                await self._read(self.store.list_pending, guild_id),
+                await self._read(self.store.list_active, guild_id),
+            )
+        for guild_id, user_ids in user_ratings.items():
+            if None in user_ids:
+                self.ratings[guild_id] = {
+                    uid: rating for _, uid, rating in await self._read(self.store.list_ratings, guild_id)
+                }
+            else:
+                self.ratings[guild_id].update(await self._read(self.store.get_ratings_rows, guild_id, user_ids))
+
+        for guild_id in full_points | user_points.keys():
+            self._points_changed(guild_id)
+        for guild_id in battle_guilds:
+            self._battles_changed(guild_id)
+        return len(rows)
+
+    async def prune_changes(self, before: float) -> int:
+        return await self._write(self.store.prune_changes, before)
+
+    async def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        return await self._write(self.store.acquire_lease, name, holder, ttl)
+
+    async def release_lease(self, name: str, holder: str) -> None:
+        await self._write(self.store.release_lease, name, holder)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._writer.join()
+        self._readers.shutdown(wait=True)
+        self.store.close()
+
+    # ---------- flags ----------
+    async def get_flag(self, guild_id: int, key: str) -> bool:
+        return await self._read(self.store.get_flag, guild_id, key)
+
+    async def set_flag(self, guild_id: int, key: str, value: bool) -> None:
+        await self._mutate(self.store.set_flag, guild_id, key, value)
+
+    async def get_setting(self, guild_id: int, key: str) -> Optional[int]:
+        return await self._read(self.store.get_setting, guild_id, key)
+
+    async def set_setting(self, guild_id: int, key: str, value: int) -> None:
+        await self._mutate(self.store.set_setting, guild_id, key, value)
+
+    async def get_meta(self, key: str) -> Optional[str]:
+        return await self._read(self.store.get_meta, key)
+
+    async def set_meta(self, key: str, value: str) -> None:
+        await self._write(self.store.set_meta, key, value)
+
+    # ---------- names ----------
+    async def load_names(self) -> List[Tuple[int, int, str, float]]:
+        return await self._read(self.store.load_names)
+
+    async def upsert_names(self, rows: Iterable[Tuple[int, int, str, float]]) -> None:
+        await self._mutate(self.store.upsert_names, list(rows))
+
+    # ---------- media ----------
+    async def get_media(self, name: str) -> Optional[Tuple[str, str]]:
+        return await self._read(self.store.get_media, name)
+
+    async def set_media(self, name: str, source_hash: str, url: str) -> None:
+        await self._mutate(self.store.set_media, name, source_hash, url)
+
+    # ---------- points ----------
+    # The cache is updated first so concurrent callers see each other's
+    # changes immediately; if the write fails it is reloaded from the DB.
+    def on_points_changed(self, callback: Callable[[int], None]) -> None:
+        """Register a plain callback run with the guild ID after any points change there."""
+        self._points_listeners.append(callback)
+
+    def _points_changed(self, guild_id: int) -> None:
+        for callback in self._points_listeners:
+            try:
+                callback(guild_id)
+            except Exception:
+                log.exception("points listener failed")
+
+    async def get_points(self, guild_id: int, user_id: int) -> int:
+        return self.points[guild_id].get(user_id)
+
+    async def add_points(self, guild_id: int, user_id: int, amount: int, reason: str = "adjust") -> int:
+        self.points[guild_id].add(user_id, amount)
+        self._points_changed(guild_id)
+        try:
+            new_val = await self._write(self.store.add_points, guild_id, user_id, amount, reason)
+        except Exception:
+            await self._reload_points(guild_id, user_id)
+            raise
+        # The DB total also counts writes from other processes the feed has not replayed yet
+        self.points[guild_id].set(user_id, new_val)
+        return new_val
+
+    async def add_points_many(self, guild_id: int, deltas: Iterable[Tuple[int, int]], reason: str = "adjust") -> Dict[int, int]:
+        deltas = list(deltas)
+        cache = self.points[guild_id]
+        for uid, amount in deltas:
+            cache.add(uid, amount)
+        self._points_changed(guild_id)
+        try:
+            totals = await self._write(self.store.add_points_many, guild_id, deltas, reason)
+        except Exception:
+            for uid in {uid for uid, _ in deltas}:
+                await self._reload_points(guild_id, uid)
+            raise
+        for uid, total in totals.items():
+            cache.set(uid, total)
+        return totals
+
+    async def debit_points(self, guild_id: int, user_id: int, amount: int, reason: str) -> Optional[int]:
+        cache = self.points[guild_id]
+        if cache.get(user_id) < amount:
+            return None
+        cache.add(user_id, -amount)
+        self._points_changed(guild_id)
+        try:
+            new_val = await self._write(self.store.debit_points, guild_id, user_id, amount, reason)
+        except Exception:
+            await self._reload_points(guild_id, user_id)
+            raise
+        if new_val is None:
+            await self._reload_points(guild_id, user_id)
+        return new_val
+
+    async def set_points(self, guild_id: int, user_id: int, points: int, reason: str = "adjust") -> None:
+        self.points[guild_id].set(user_id, points)
+        self._points_changed(guild_id)
+        try:
+            await self._write(self.store.set_points, guild_id, user_id, points, reason)
+        except Exception:
+            await self._reload_points(guild_id, user_id)
+            raise
+
+    async def clear_points(self, guild_id: int, reason: str = "reset") -> None:
+        self.points[guild_id].clear()
+        self._points_changed(guild_id)
+        try:
+            await self._write(self.store.clear_points, guild_id, reason)
+        except Exception:
+            self.points[guild_id].load(await self._read(self.store.all_points, guild_id))
+            raise
+
+    async def snapshot_ledger(self, guild_id: int, keep: int = 7) -> int:
+        return await self._write(self.store.snapshot_ledger, guild_id, keep)
+
+    async def rebuild_points(self, guild_id: int) -> int:
+        count = await self._write(self.store.rebuild_points, guild_id)
+        self.points[guild_id].load(await self._read(self.store.all_points, guild_id))
+        self._points_changed(guild_id)
+        return count
+
+    async def _reload_points(self, guild_id: int, user_id: int) -> None:
+        row = await self._read(self.store.get_points_row, guild_id, user_id)
+        if row is None:
+            self.points[guild_id].discard(user_id)
+        else:
+            self.points[guild_id].set(user_id, row)
+
+    async def top_points(self, guild_id: int, limit: int = 10) -> List[Tuple[int, int]]:
+        return self.points[guild_id].top(limit)
+
+    async def get_rank(self, guild_id: int, user_id: int) -> Optional[int]:
+        return self.points[guild_id].rank(user_id)
+
+    async def points_around(self, guild_id: int, user_id: int, radius: int = 5) -> List[Tuple[int, int, int]]:
+        return self.points[guild_id].around(user_id, radius)
+
+    async def player_count(self, guild_id: int) -> int:
+        return len(self.points[guild_id])
+
+    # ---------- seasons ----------
+    # Archived seasons never change, so they are read straight from their
+    # indexed tables instead of being cached.
+    async def rollover_season(self, guild_id: int, ended_at: Optional[int] = None) -> Tuple[int, int]:
+        self.points[guild_id].clear()
+        self._points_changed(guild_id)
+        try:
+            season = await self._write(self.store.begin_rollover, guild_id, ended_at)
+        except Exception:
+            self.points[guild_id].load(await self._read(self.store.all_points, guild_id))
+            raise
+        return await self._finish_rollover(guild_id, season)
+
+    async def _finish_rollover(self, guild_id: int, season: int) -> Tuple[int, int]:
+        # One write per step, so other writes are committed in between
+        while (done := await self._write(self.store.rollover_step, guild_id, season)) is None:
+            pass
+        return done
+
+    async def _resume_rollover(self, guild_id: int, season: int) -> None:
+        try:
+            await self._finish_rollover(guild_id, season)
+            log.info("finished the season %d rollover of guild %s", season, guild_id)
+        except Exception:
+            log.exception("season %d rollover of guild %s failed", season, guild_id)
+
+    async def list_seasons(self, guild_id: int) -> List[Tuple[int, int, int]]:
+        return await self._read(self.store.list_seasons, guild_id)
+
+    async def season_standings(self, guild_id: int, season: int, start: int = 1, limit: int = 10) -> List[Tuple[int, int, int]]:
+        return await self._read(self.store.season_standings, guild_id, season, start, limit)
+
+    async def season_around(self, guild_id: int, season: int, user_id: int, radius: int = 5) -> List[Tuple[int, int, int]]:
+        position = await self._read(self.store.season_position, guild_id, season, user_id)
+        if position is None:
+            return []
+        start = max(1, position - radius)
+        return await self._read(self.store.season_standings, guild_id, season, start, position + radius + 1 - start)
+
+    async def season_completed(self, guild_id: int, season: int) -> List[int]:
+        return await self._read(self.store.season_completed, guild_id, season)
+
+    # ---------- completed ----------
+    async def mark_completed(self, guild_id: int, user_id: int) -> None:
+        await self._mutate(self.store.mark_completed, guild_id, user_id)
+
+    async def clear_completed(self, guild_id: int) -> None:
+        await self._mutate(self.store.clear_completed, guild_id)
+
+    async def list_completed(self, guild_id: int) -> List[int]:
+        return await self._read(self.store.list_completed, guild_id)
+
+    async def page_completed(self, guild_id: int, after: Optional[int] = None, limit: int = 25) -> List[int]:
+        return await self._read(self.store.page_completed, guild_id, after, limit)
+
+    # ---------- pending ----------
+    # Like points, the battle index is updated before the write is queued.
+    async def add_pending(self, guild_id: int, challenged_id: int, challenger_id: int, created_at: Optional[int] = None) -> None:
+        pending = PendingChallenge(guild_id, challenged_id, challenger_id, created_at or now_ms())
+        self.battles[guild_id].add_pending(pending)
+        await self._mutate(self.store.add_pending, guild_id, challenged_id, challenger_id, pending.created_at)
+
+    async def challenge(self, guild_id: int, challenged_id: int, challenger_id: int, created_at: Optional[int] = None) -> bool:
+        """Create a pending challenge unless the player is already busy in this guild.
+
+        The in-memory check rejects busy players without a DB round trip; the
+        insert itself re-checks both tables in one transaction.
+        """
+        battles = self.battles[guild_id]
+        if battles.get(challenged_id):
+            return False
+        pending = PendingChallenge(guild_id, challenged_id, challenger_id, created_at or now_ms())
+        battles.add_pending(pending)
+        ok = False
+        try:
+            ok = await self._write(self.store.try_add_pending, guild_id, challenged_id, challenger_id, pending.created_at)
         finally:
-            con.close()
+            if not ok and battles.get_pending(challenged_id) is pending:
+                battles.remove_pending(challenged_id)
+        return ok
 
-    def clear_active(self) -> None:
-        con = self._connect()
+    async def remove_pending(self, guild_id: int, challenged_id: int) -> None:
+        self.battles[guild_id].remove_pending(challenged_id)
+        await self._mutate(self.store.remove_pending, guild_id, challenged_id)
+
+    async def get_pending(self, guild_id: int, challenged_id: int) -> Optional[PendingChallenge]:
+        return self.battles[guild_id].get_pending(challenged_id)
+
+    # DMs carry no guild, so these two look across every guild's index
+    def has_pending(self, challenged_id: int) -> bool:
+        """In-memory check (one dict lookup per guild), cheap enough to run on every DM."""
+        return any(b.get_pending(challenged_id) is not None for b in self.battles.values())
+
+    def pending_for(self, challenged_id: int) -> List[PendingChallenge]:
+        """This player's pending challenges in every guild, oldest first."""
+        found = [p for b in self.battles.values() if (p := b.get_pending(challenged_id)) is not None]
+        return sorted(found, key=lambda p: p.created_at)
+
+    async def accept_pending(self, guild_id: int, challenged_id: int, accepted_at: Optional[int] = None) -> Optional[PendingChallenge]:
+        battles = self.battles[guild_id]
+        pending = battles.get_pending(challenged_id)
+        if pending is None:
+            return None
+        # Claimed in memory first, so a second "accept" racing this one sees nothing
+        battle = ActiveBattle(guild_id, challenged_id, pending.challenger_id, accepted_at or now_ms())
+        battles.remove_pending(challenged_id)
+        battles.add_active(battle)
+        try:
+            accepted = await self._write(self.store.accept_pending, guild_id, challenged_id, battle.accepted_at)
+        except Exception:
+            # Nothing was written: the challenge is still pending on disk
+            battles.remove_active(battle.user_a, battle.user_b)
+            if battles.get_pending(challenged_id) is None:
+                battles.add_pending(pending)
+            raise
+        if accepted is None:
+            # Gone from the DB (withdrawn, expired or accepted elsewhere)
+            battles.remove_active(battle.user_a, battle.user_b)
+        return accepted
+
+    async def get_busy(self, guild_id: int, user_id: int):
+        """The PendingChallenge or ActiveBattle that makes this player busy in the guild, if any."""
+        return self.battles[guild_id].get(user_id)
+
+    def battle_counts(self) -> Dict[str, int]:
+        """Pending challenges and active battles summed over every guild."""
+        totals = {"pending": 0, "active": 0}
+        for battles in self.battles.values():
+            for key, count in battles.counts().items():
+                totals[key] += count
+        return totals
+
+    async def list_pending(self, guild_id: Optional[int] = None) -> List[PendingChallenge]:
+        return await self._read(self.store.list_pending, guild_id)
+
+    async def page_pending(self, guild_id: int, after=None, limit: int = 25, user_id=None, created_before=None) -> List[PendingChallenge]:
+        return await self._read(self.store.page_pending, guild_id, after, limit, user_id, created_before)
+
+    async def clear_pending(self, guild_id: int) -> None:
+        self.battles[guild_id].clear_pending()
+        await self._mutate(self.store.clear_pending, guild_id)
+
+    # ---------- reminders / expiry (all guilds) ----------
+    async def next_due(self) -> List[int]:
+        return await self._read(self.store.next_due)
+
+    async def pop_due_reminders(self, now: int) -> List[Tuple[int, int]]:
+        return await self._write(self.store.pop_due_reminders, now)
+
+    async def expire_pending(self, created_before: int) -> List[PendingChallenge]:
+        expired = await self._write(self.store.expire_pending, created_before)
+        for p in expired:
+            battles = self.battles[p.guild_id]
+            if battles.get_pending(p.challenged_id) == p:
+                battles.remove_pending(p.challenged_id)
+        return expired
+
+    # ---------- active ----------
+    async def add_active(self, guild_id: int, user_a: int, user_b: int, accepted_at: Optional[int] = None) -> None:
+        battle = ActiveBattle(guild_id, user_a, user_b, accepted_at or now_ms())
+        self.battles[guild_id].add_active(battle)
+        await self._mutate(self.store.add_active, guild_id, user_a, user_b, battle.accepted_at)
+
+    async def remove_active(self, guild_id: int, user_a: int, user_b: int) -> None:
+        self.battles[guild_id].remove_active(user_a, user_b)
+        await self._mutate(self.store.remove_active, guild_id, user_a, user_b)
+
+    async def complete_active(self, guild_id: int, user_a: int, user_b: int) -> Optional[ActiveBattle]:
+        """Claim an active battle to record its result; None if it is gone or was claimed first."""
+        battles = self.battles[guild_id]
+        battle = battles.get_active(user_a, user_b)
+        if battle is None:
+            return None
+        # Claimed in memory before the first await, like accept_pending; the
+        # DB delete settles races with other processes
+        battles.remove_active(user_a, user_b)
         try:
-            con.execute("DELETE FROM active")
-            con.commit()
+            return await self._write(self.store.complete_active, guild_id, user_a, user_b)
+        except Exception:
+            if battles.get_active(user_a, user_b) is None:
+                battles.add_active(battle)
+            raise
+
+    async def get_active(self, guild_id: int, user_a: int, user_b: int) -> Optional[ActiveBattle]:
+        return self.battles[guild_id].get_active(user_a, user_b)
+
+    async def list_active(self, guild_id: Optional[int] = None) -> List[ActiveBattle]:
+        return await self._read(self.store.list_active, guild_id)
+
+    async def page_active(self, guild_id: int, after=None, limit: int = 25, user_id=None, accepted_before=None) -> List[ActiveBattle]:
+        return await self._read(self.store.page_active, guild_id, after, limit, user_id, accepted_before)
+
+    async def clear_active(self, guild_id: int) -> None:
+        self.battles[guild_id].clear_active()
+        await self._mutate(self.store.clear_active, guild_id)
+
+    # ---------- matches / ratings ----------
+    async def record_match(
+        self,
+        guild_id: int,
+        user_a: int,
+        user_b: int,
+        winner_id: int,
+        accepted_at: int,
+        completed_at: Optional[int] = None,
+    ) -> Tuple[Rating, Rating]:
+        """Record a finished battle and apply its Elo update; returns both players' new ratings.
+
+        The update is computed from the cached ratings and cached before the
+        write, like points, so back-to-back results build on each other.
+        """
+        cache = self.ratings[guild_id]
+        new_a, new_b = elo_update(cache.get(user_a, UNRATED), cache.get(user_b, UNRATED), winner_id == user_a)
+        cache[user_a] = new_a
+        cache[user_b] = new_b
+        try:
+            await self._write(
+                self.store.record_match, guild_id, user_a, user_b, winner_id,
+                accepted_at, completed_at or now_ms(), [(user_a, new_a), (user_b, new_b)],
+            )
+        except Exception:
+            found = await self._read(self.store.get_ratings_rows, guild_id, (user_a, user_b))
+            for uid in (user_a, user_b):
+                if uid in found:
+                    cache[uid] = found[uid]
+                else:
+                    cache.pop(uid, None)
+            raise
+        return new_a, new_b
+
+    async def get_rating(self, guild_id: int, user_id: int) -> Rating:
+        return self.ratings[guild_id].get(user_id, UNRATED)
+
+    async def match_history(self, guild_id: int) -> List[Tuple[int, int, int]]:
+        return await self._read(self.store.match_history, guild_id)
+
+    # ---------- matchmaking queue ----------
+    # The pool itself (matchmaking.MatchQueue) lives with the Tier cog; the
+    # queue table only lets it survive a restart.
+    async def match(self, guild_id: int, user_a: int, user_b: int, accepted_at: Optional[int] = None) -> bool:
+        """Start a battle between two queued players unless either became busy meanwhile.
+
+        Like accept_pending, the battle is claimed in the index before the
+        write, so a racing /tier or "accept" sees both players as busy.
+        """
+        battles = self.battles[guild_id]
+        if battles.get(user_a) or battles.get(user_b):
+            return False
+        battle = ActiveBattle(guild_id, user_a, user_b, accepted_at or now_ms())
+        battles.add_active(battle)
+        ok = False
+        try:
+            ok = await self._write(self.store.try_add_active, guild_id, user_a, user_b, battle.accepted_at)
         finally:
-            con.close()
\ No newline at end of file
+            if not ok:
+                battles.remove_active(user_a, user_b)
+        return ok
+
+    async def queue_add(self, guild_id: int, user_id: int, joined_at: int) -> None:
+        await self._mutate(self.store.queue_add, guild_id, user_id, joined_at)
+
+    async def queue_remove(self, guild_id: int, user_ids: Iterable[int]) -> None:
+        await self._mutate(self.store.queue_remove, guild_id, list(user_ids))
+
+    async def clear_queue(self, guild_id: int) -> None:
+        await self._mutate(self.store.clear_queue, guild_id)
+
+    async def list_queue(self) -> List[Tuple[int, int, int]]:
+        return await self._read(self.store.list_queue)
+
+    # ---------- bulk import/export ----------
+    # Each chunk is one op on the writer, so live commands' writes are
+    # committed in between chunks rather than after the whole import.
+    async def import_rows(self, guild_id: int, kind: str, rows: List[tuple], reason: str = "import") -> Tuple[int, int]:
+        return await self._write(self.store.import_rows, guild_id, kind, rows, reason)
+
+    async def diff_rows(self, guild_id: int, kind: str, rows: List[tuple]) -> Tuple[List[tuple], List[Tuple[tuple, tuple]]]:
+        return await self._read(self.store.diff_rows, guild_id, kind, rows)
+
+    async def export_rows(self, guild_id: int, kind: str, sink: Callable[[Iterator[tuple]], int]) -> int:
+        """Feed the streamed rows to ``sink`` on a reader thread; returns what ``sink`` returns."""
+        return await self._read(lambda: sink(self.store.export_rows(guild_id, kind)))
+
+    async def finish_import(self, guild_id: int, kind: str) -> None:
+        """Reload the guild's caches after ``import_rows`` (here and, via the journal, in other processes)."""
+        await self._write(self.store.mark_changed, guild_id, kind)
+        if kind == "points":
+            self.points[guild_id].load(await self._read(self.store.all_points, guild_id))
+            self._points_changed(guild_id)
+        elif kind in ("pending", "active"):
+            self.battles[guild_id].load(
+                await self._read(self.store.list_pending, guild_id),
+                await self._read(self.store.list_active, guild_id),
+            )
+            # e.g. Tier re-arms its reminder/expiry timer for imported challenges
+            self._battles_changed(guild_id)
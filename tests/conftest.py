@@ -0,0 +1,17 @@
+import sys
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+try:
+    import config  # noqa: F401
+except SyntaxError:
+    # config.py ships with placeholder IDs for each deployment to fill in;
+    # the tests configure no guilds
+    config = types.ModuleType("config")
+    config.GUILDS = {}
+    config.GUILD_CONFIGS = []
+    config.LEGACY_GUILD_ID = None
+    config.guild_objects = lambda: []
+    sys.modules["config"] = config
@@ -0,0 +1,46 @@
+import asyncio
+
+from adminlog import AdminLogDispatcher
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, embeds):
+        self.sent.append(embeds)
+
+
+class FakeBot:
+    """A bot that does not cache the admin channel, as on another shard's process."""
+
+    def __init__(self):
+        self.partial = FakeChannel()
+
+    def get_channel(self, channel_id):
+        return None
+
+    def get_partial_messageable(self, channel_id):
+        return self.partial
+
+
+def test_uncached_channel_is_sent_over_rest():
+    async def run():
+        bot = FakeBot()
+        dispatcher = AdminLogDispatcher(bot, 123, interval=0)
+        dispatcher.start()
+        try:
+            dispatcher.emit("expired", challenger="<@1>", challenged="<@2>")
+            for _ in range(100):
+                if bot.partial.sent:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            dispatcher.stop()
+        return bot, dispatcher
+
+    bot, dispatcher = asyncio.run(run())
+    assert len(bot.partial.sent) == 1
+    assert "Expired" in bot.partial.sent[0][0].description
+    assert dispatcher.dropped == 0
+    assert dispatcher.messages_sent == 1
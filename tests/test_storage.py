@@ -0,0 +1,74 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from ledger import diff_points
+from storage import AsyncDataStore, DataStore
+
+GUILD = 1
+
+
+def test_add_points_returns_the_database_total(tmp_path):
+    """A cache lagging another process's writes must not leak into the returned totals."""
+    path = str(tmp_path / "bot.sqlite3")
+
+    async def run():
+        here = AsyncDataStore(path, journal=True)
+        there = AsyncDataStore(path, journal=True)
+        try:
+            await here.warm()
+            await there.warm()
+            await there.add_points(GUILD, 10, 7)
+            await there.add_points_many(GUILD, [(20, 4)])
+            # ``here`` has not replayed the change feed yet
+            assert await here.add_points(GUILD, 10, 1) == 8
+            assert await here.get_points(GUILD, 10) == 8
+            assert await here.add_points_many(GUILD, [(10, 1), (20, 1)]) == {10: 9, 20: 5}
+            assert await here.get_points(GUILD, 20) == 5
+        finally:
+            here.close()
+            there.close()
+
+    asyncio.run(run())
+
+
+def test_failed_commit_leaves_no_transaction_open(tmp_path):
+    store = DataStore(str(tmp_path / "bot.sqlite3"))
+    try:
+        con = store._connect()
+        # A deferred foreign key is only checked by COMMIT, which then fails
+        con.execute("PRAGMA foreign_keys=ON")
+        con.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+        con.execute("CREATE TABLE child (parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED)")
+        with pytest.raises(sqlite3.IntegrityError):
+            with store.transaction() as tx:
+                tx.execute("INSERT INTO child VALUES(1)")
+        assert not con.in_transaction
+        store.add_points(GUILD, 10, 3)
+        assert store.get_points(GUILD, 10) == 3
+    finally:
+        store.close()
+
+
+def test_rebuild_points_reproduces_the_points_table(tmp_path):
+    store = DataStore(str(tmp_path / "bot.sqlite3"))
+    try:
+        store.add_points_many(GUILD, [(10, 5), (20, 3), (30, 8), (40, 2)])
+        store.add_points(GUILD, 20, -3)  # nets to zero: the row stays
+        store.snapshot_ledger(GUILD)
+        store.set_points(GUILD, 10, 12)
+        assert store.debit_points(GUILD, 30, 8, "redeem") == 0
+        store.import_rows(GUILD, "points", [(40, 9), (50, 1)])
+        store.clear_points(GUILD)
+        store.add_points_many(GUILD, [(10, 4), (60, 6), (60, -6)])
+        store.add_points(2, 2, 1)  # another guild's rows are left alone
+
+        live = sorted(store.all_points(GUILD))
+        assert live == [(10, 4), (60, 0)]
+        assert diff_points(store, GUILD) == []
+        assert store.rebuild_points(GUILD) == len(live)
+        assert sorted(store.all_points(GUILD)) == live
+        assert store.get_points(2, 2) == 1
+    finally:
+        store.close()
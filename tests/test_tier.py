@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+from storage import AsyncDataStore
+from tier import WinnerSelectView
+
+GUILD = 1
+
+
+class FakeResponse:
+    def __init__(self):
+        self.edits = []
+
+    async def edit_message(self, content=None, view=None):
+        self.edits.append(content)
+
+
+class FakeGeneral:
+    def __init__(self, store):
+        self.store = store
+
+    async def add_points_many(self, guild_id, deltas, reason="adjust"):
+        return await self.store.add_points_many(guild_id, deltas, reason)
+
+
+def player(user_id):
+    return SimpleNamespace(id=user_id, display_name=f"player{user_id}", mention=f"<@{user_id}>")
+
+
+def test_concurrent_winner_clicks_record_one_result(tmp_path):
+    async def run():
+        store = AsyncDataStore(str(tmp_path / "bot.sqlite3"))
+        try:
+            await store.warm()
+            await store.add_active(GUILD, 10, 20)
+            general = FakeGeneral(store)
+            view = WinnerSelectView(store, None, GUILD, player(10), player(20), None)
+            button = view.children[0]
+            clicks = [
+                SimpleNamespace(response=FakeResponse(), client=SimpleNamespace(get_cog=lambda name: general))
+                for _ in range(2)
+            ]
+            await asyncio.gather(*(button.callback(click) for click in clicks))
+
+            edits = [click.response.edits[0] for click in clicks]
+            assert sum(edit.startswith("🏁") for edit in edits) == 1
+            assert sum(edit.startswith("❌") for edit in edits) == 1
+            assert len(await store.match_history(GUILD)) == 1
+            assert await store._read(store.store.get_points_rows, GUILD, [10, 20]) == {10: 5, 20: 5}
+            assert await store.get_points(GUILD, 10) == 5
+            assert (await store.get_rating(GUILD, 10))[1] == 1
+            assert await store._read(store.store.get_active, GUILD, 10, 20) is None
+        finally:
+            store.close()
+
+    asyncio.run(run())
@@ -1,44 +1,94 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from datetime import datetime, timedelta
 import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Literal
 
-from storage import DataStore, parse_iso, utcnow_iso
+from adminlog import AdminLogDispatcher
+from config import GUILDS, guild_objects
+from matchmaking import Entry, MatchQueue
+from metrics import REGISTRY, instrument_commands
+from names import NameCache
+from pagination import KeysetPaginator
+from scheduler import Scheduler
+from storage import (
+    CHALLENGE_TTL, REMINDER_AFTER, AsyncDataStore, PendingChallenge, battle_id, from_ms, now_ms, to_ms,
+)
 
-GUILD_ID = ServerID
+log = logging.getLogger(__name__)
 
-# 🔴 Admin log channel for notifications
-ADMIN_LOG_CHANNEL_ID =Admim Channel ID
+# Rows per page in /battles and /tierlist
+PAGE_SIZE = 20
 
-# ✅ Role IDs allowed to use admin commands
-ADMIN_ROLE_IDS = {
-    ID1,
-    ID2
-   
-}
+# How often queued players are re-matched as their points bands widen
+QUEUE_SWEEP_SECONDS = 5
 
 
 def has_admin_role():
     async def predicate(interaction: discord.Interaction) -> bool:
-        if not interaction.guild:
+        cfg = GUILDS.get(interaction.guild_id)
+        if not interaction.guild or cfg is None:
             return False
         member = interaction.user
         if not isinstance(member, discord.Member):
             return False
-        return any(r.id in ADMIN_ROLE_IDS for r in member.roles)
+        return any(r.id in cfg.admin_role_ids for r in member.roles)
     return app_commands.check(predicate)
 
 
+@instrument_commands
 class Tier(commands.Cog):
-    def __init__(self, bot: commands.Bot):
+    def __init__(self, bot: commands.Bot, store: AsyncDataStore, names: NameCache):
         self.bot = bot
-        self.store = DataStore("bot_state.sqlite3")
-        self.reminder_tasks: dict[int, asyncio.Task] = {}
+        self.store = store
+        self.names = names
+        # One timer for every guild's pending-challenge reminders and expiry
+        self.scheduler = Scheduler(self._run_due)
+        # Admin log messages are batched and sent in the background, per guild
+        self.admin_logs = {
+            gid: AdminLogDispatcher(bot, cfg.admin_log_channel_id)
+            for gid, cfg in GUILDS.items() if cfg.admin_log_channel_id
+        }
+        # /queue matchmaking pools, restored from the queue table on load
+        self.queues: Dict[int, MatchQueue] = defaultdict(MatchQueue)
 
     async def cog_load(self):
-        for p in self.store.list_pending():
-            self._start_reminder(p.challenged_id)
+        self.scheduler.start()
+        for dispatcher in self.admin_logs.values():
+            dispatcher.start()
+        REGISTRY.gauge("bot_scheduled_timers", "Distinct due times queued in the reminder/expiry scheduler", lambda: len(self.scheduler))
+        REGISTRY.gauge("bot_challenges", "Pending challenges and active battles", self.store.battle_counts)
+        REGISTRY.gauge(
+            "bot_adminlog_queue", "Admin-log queue depth per guild",
+            lambda: {gid: d.stats()["queue_depth"] for gid, d in self.admin_logs.items()},
+        )
+        # Remote challenges reach the leader's timer through the change feed
+        self.store.on_battles_changed(self._battles_changed)
+        if self.bot.coordinator:
+            self.bot.coordinator.on_leadership(self._leadership_changed)
+        await self._schedule_next()
+
+        for gid, uid, joined_at in await self.store.list_queue():
+            self.queues[gid].add((await self.store.get_points(gid, uid), joined_at, uid))
+        REGISTRY.gauge(
+            "bot_queue", "Players waiting in the matchmaking queue per guild",
+            lambda: {gid: len(pool) for gid, pool in self.queues.items()},
+        )
+        self.sweep_queue.start()
+
+    async def cog_unload(self):
+        self.scheduler.stop()
+        self.sweep_queue.cancel()
+        for dispatcher in self.admin_logs.values():
+            dispatcher.stop()
+
+    def _log(self, guild_id: int, kind: str, **fields) -> None:
+        dispatcher = self.admin_logs.get(guild_id)
+        if dispatcher:
+            dispatcher.emit(kind, **fields)
 
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         if isinstance(error, app_commands.CheckFailure):
@@ -48,10 +98,6 @@ class Tier(commands.Cog):
             return await interaction.response.send_message(msg, ephemeral=True)
         raise error
 
-    def _admin_log(self) -> discord.TextChannel | None:
-        ch = self.bot.get_channel(ADMIN_LOG_CHANNEL_ID)
-        return ch if isinstance(ch, discord.TextChannel) else None
-
     # ----------------------------
     # /tier
     # ----------------------------
@@ -60,15 +106,18 @@ class Tier(commands.Cog):
         if member.bot or member.id == interaction.user.id:
             return await interaction.response.send_message("❌ Invalid player.", ephemeral=True)
 
-        if self.store.get_pending(member.id):
+        gid = interaction.guild_id
+        busy = await self.store.get_busy(gid, member.id)
+        if isinstance(busy, PendingChallenge):
             return await interaction.response.send_message("❌ That player already has a pending challenge.", ephemeral=True)
+        if busy:
+            return await interaction.response.send_message("❌ That player already has an active battle.", ephemeral=True)
 
-        for a in self.store.list_active():
-            if member.id in (a.user_a, a.user_b):
-                return await interaction.response.send_message("❌ That player already has an active battle.", ephemeral=True)
-
-        self.store.add_pending(member.id, interaction.user.id, created_at=utcnow_iso())
-        self._start_reminder(member.id)
+        created_at = now_ms()
+        if not await self.store.challenge(gid, member.id, interaction.user.id, created_at=created_at):
+            return await interaction.response.send_message("❌ That player is already in a tier battle.", ephemeral=True)
+        self.scheduler.schedule(from_ms(created_at) + REMINDER_AFTER)
+        self.scheduler.schedule(from_ms(created_at) + CHALLENGE_TTL)
 
         await interaction.response.send_message(f"⚔️ Tier challenge sent to {member.display_name}.")
 
@@ -81,35 +130,128 @@ class Tier(commands.Cog):
         except discord.Forbidden:
             pass
 
-        log = self._admin_log()
-        if log:
-            await log.send(
-                "⚔️ **Tier Challenge Created**\n"
-                f"**Challenger:** {interaction.user.mention}\n"
-                f"**Challenged:** {member.mention}"
+        self._log(gid, "created", challenger=interaction.user.mention, challenged=member.mention)
+
+    # ----------------------------
+    # /queue (matchmaking)
+    # ----------------------------
+    @app_commands.command(name="queue", description="Find a tier battle opponent near your points")
+    @app_commands.describe(action="Join or leave the queue, or check your wait")
+    async def queue(self, interaction: discord.Interaction, action: Literal["join", "leave", "status"] = "join"):
+        gid = interaction.guild_id
+        uid = interaction.user.id
+        pool = self.queues[gid]
+        entry = pool.get(uid)
+
+        if action == "leave":
+            if entry is None:
+                return await interaction.response.send_message("❌ You are not in the queue.", ephemeral=True)
+            pool.remove(uid)
+            await self.store.queue_remove(gid, [uid])
+            return await interaction.response.send_message("👋 You left the queue.", ephemeral=True)
+
+        if entry is not None or action == "status":
+            if entry is None:
+                return await interaction.response.send_message("❌ You are not in the queue.", ephemeral=True)
+            now = now_ms()
+            return await interaction.response.send_message(
+                f"🔎 Queued for {(now - entry[1]) // 60_000} min with {entry[0]} points, "
+                f"looking within ±{pool.band(entry[1], now)} points. {len(pool)} players are queued.",
+                ephemeral=True
             )
 
+        if await self.store.get_busy(gid, uid):
+            return await interaction.response.send_message("❌ You already have a pending or active tier battle.", ephemeral=True)
+
+        now = now_ms()
+        points = await self.store.get_points(gid, uid)
+        pool.add((points, now, uid))
+        await self.store.queue_add(gid, uid, now)
+
+        match = pool.pop_match(uid, now)
+        if match and await self._start_match(gid, *match):
+            await interaction.response.send_message("⚔️ Opponent found! Check your DMs.", ephemeral=True)
+            return await self._announce_match(gid, *match)
+
+        await interaction.response.send_message(
+            f"🔎 You joined the queue with {points} points. You will get a DM when an opponent is found; "
+            "the longer you wait, the wider the points range.",
+            ephemeral=True
+        )
+
+    @tasks.loop(seconds=QUEUE_SWEEP_SECONDS)
+    async def sweep_queue(self):
+        now = now_ms()
+        for gid, pool in list(self.queues.items()):
+            # In a cluster, each guild is matched by the process running its shard
+            if self.bot.coordinator and self.bot.get_guild(gid) is None:
+                continue
+            try:
+                await asyncio.gather(*(self._run_match(gid, a, b) for a, b in pool.pop_matches(now)))
+            except Exception:
+                log.exception("matchmaking sweep failed for guild %s", gid)
+
+    async def _run_match(self, guild_id: int, a: Entry, b: Entry) -> None:
+        if await self._start_match(guild_id, a, b):
+            await self._announce_match(guild_id, a, b)
+
+    async def _start_match(self, guild_id: int, a: Entry, b: Entry) -> bool:
+        """Turn a pair taken from the pool into an active battle; requeue whoever is still free if that fails."""
+        if await self.store.match(guild_id, a[2], b[2], accepted_at=now_ms()):
+            return True
+        # One of them was challenged or started a battle while queued
+        dropped = []
+        for entry in (a, b):
+            if await self.store.get_busy(guild_id, entry[2]):
+                dropped.append(entry[2])
+            else:
+                self.queues[guild_id].add(entry)
+        if dropped:
+            await self.store.queue_remove(guild_id, dropped)
+        return False
+
+    async def _announce_match(self, guild_id: int, a: Entry, b: Entry) -> None:
+        names = await self.names.resolve_many(guild_id, (a[2], b[2]))
+        users = {}
+        for entry, other in ((a, b), (b, a)):
+            user = users[entry[2]] = await self._get_user(entry[2])
+            if user:
+                try:
+                    await user.send(
+                        f"⚔️ **Matchmaking**\n"
+                        f"You were matched with **{names[other[2]]}** ({other[0]} points). "
+                        "The battle is now active; use /battlecomplete when it is over."
+                    )
+                except discord.HTTPException:
+                    pass
+
+        self._log(
+            guild_id,
+            "matched",
+            players=" vs ".join(users[e[2]].mention if users[e[2]] else str(e[2]) for e in (a, b)),
+            points=f"{a[0]} vs {b[0]}",
+        )
+
     # ----------------------------
     # DM LISTENER: accept
     # ----------------------------
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
-        if message.guild or message.content.lower().strip() != "accept":
+        # Set lookup first: most DMs come from players with no pending challenge
+        if message.guild or not self.store.has_pending(message.author.id):
+            return
+        if message.content.lower().strip() != "accept":
             return
 
-        pending = self.store.get_pending(message.author.id)
+        # Challenges from several servers are accepted one per "accept", oldest first
+        pending = None
+        for candidate in self.store.pending_for(message.author.id):
+            pending = await self.store.accept_pending(candidate.guild_id, message.author.id, accepted_at=now_ms())
+            if pending:
+                break
         if not pending:
             return
 
-        self.store.remove_pending(message.author.id)
-        self.store.add_active(
-            pending.challenged_id,
-            pending.challenger_id,
-            accepted_at=utcnow_iso()
-        )
-
-        self._stop_reminder(pending.challenged_id)
-
         await message.author.send("✅ Tier challenge accepted. The battle is now active.")
 
         challenger = self.bot.get_user(pending.challenger_id)
@@ -119,20 +261,19 @@ class Tier(commands.Cog):
             except discord.Forbidden:
                 pass
 
-        log = self._admin_log()
-        if log:
-            await log.send(
-                "✅ **Tier Challenge Accepted**\n"
-                f"**Challenger:** {challenger.mention if challenger else pending.challenger_id}\n"
-                f"**Challenged:** {message.author.mention}"
-            )
+        self._log(
+            pending.guild_id,
+            "accepted",
+            challenger=challenger.mention if challenger else pending.challenger_id,
+            challenged=message.author.mention,
+        )
 
     # ----------------------------
     # /battlecomplete
     # ----------------------------
     @app_commands.command(name="battlecomplete", description="Mark a tier battle as completed")
     async def battlecomplete(self, interaction: discord.Interaction, member: discord.Member):
-        active = self.store.get_active(interaction.user.id, member.id)
+        active = await self.store.get_active(interaction.guild_id, interaction.user.id, member.id)
         if not active:
             return await interaction.response.send_message(
                 "❌ No active tier battle found.",
@@ -141,10 +282,11 @@ class Tier(commands.Cog):
 
         view = WinnerSelectView(
             store=self.store,
-            admin_log_channel_id=ADMIN_LOG_CHANNEL_ID,
+            admin_log=self.admin_logs.get(interaction.guild_id),
+            guild_id=interaction.guild_id,
             p1=interaction.user,
             p2=member,
-            accepted_at_iso=active.accepted_at,
+            accepted_at=active.accepted_at,
         )
         await interaction.response.send_message("🏁 Who won the tier battle?", view=view, ephemeral=True)
 
@@ -154,49 +296,65 @@ class Tier(commands.Cog):
     @app_commands.command(name="tierlist", description="ADMIN: View players who completed tier battles")
     @has_admin_role()
     async def tierlist(self, interaction: discord.Interaction):
-        completed = self.store.list_completed()
-        if not completed:
+        gid = interaction.guild_id
+        if not await self.store.page_completed(gid, limit=1):
             return await interaction.response.send_message("❌ No completed tier battles.", ephemeral=True)
 
-        def name(uid: int) -> str:
-            u = self.bot.get_user(uid)
-            return u.display_name if u else f"User {uid}"
+        async def fetch(after):
+            rows = await self.store.page_completed(gid, after, limit=PAGE_SIZE + 1)
+            page = rows[:PAGE_SIZE]
+            names = await self.names.resolve_many(gid, page)
+            return [f"• {names[uid]}" for uid in page], (page[-1] if len(rows) > PAGE_SIZE else None)
 
-        embed = discord.Embed(
-            title="🏆 Completed Tier Battles",
-            description="\n".join(f"• {name(uid)}" for uid in completed),
-            color=discord.Color.gold()
-        )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        view = KeysetPaginator(interaction.user.id, "🏆 Completed Tier Battles", fetch, discord.Color.gold())
+        await interaction.response.send_message(embed=await view.render(), view=view, ephemeral=True)
 
     # ----------------------------
     # /battles
     # ----------------------------
     @app_commands.command(name="battles", description="ADMIN: View pending and active tier battles")
+    @app_commands.describe(
+        status="Which battles to list",
+        player="Only battles involving this player",
+        older_than_hours="Only battles created/accepted at least this many hours ago",
+    )
     @has_admin_role()
-    async def battles(self, interaction: discord.Interaction):
-        pending = self.store.list_pending()
-        active = self.store.list_active()
-
-        def name(uid: int) -> str:
-            u = self.bot.get_user(uid)
-            return u.display_name if u else f"User {uid}"
-
-        embed = discord.Embed(title="📋 Tier Battles", color=discord.Color.blurple())
-
-        embed.add_field(
-            name=f"Pending ({len(pending)})",
-            value="\n".join(f"• {name(p.challenger_id)} ➜ {name(p.challenged_id)}" for p in pending) or "—",
-            inline=False,
-        )
-
-        embed.add_field(
-            name=f"Active ({len(active)})",
-            value="\n".join(f"• {name(a.user_a)} vs {name(a.user_b)}" for a in active) or "—",
-            inline=False,
-        )
-
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+    async def battles(
+        self,
+        interaction: discord.Interaction,
+        status: Literal["pending", "active"] = "pending",
+        player: discord.Member | None = None,
+        older_than_hours: int | None = None,
+    ):
+        gid = interaction.guild_id
+        uid = player.id if player else None
+        cutoff = to_ms(datetime.utcnow() - timedelta(hours=older_than_hours)) if older_than_hours else None
+
+        if status == "active":
+            async def fetch(after):
+                rows = await self.store.page_active(gid, after, PAGE_SIZE + 1, uid, cutoff)
+                page = rows[:PAGE_SIZE]
+                names = await self.names.resolve_many(gid, (u for a in page for u in (a.user_a, a.user_b)))
+                lines = [f"• {names[a.user_a]} vs {names[a.user_b]}" for a in page]
+                last = page[-1] if page else None
+                more = len(rows) > PAGE_SIZE
+                return lines, ((last.accepted_at, battle_id(last.user_a, last.user_b)) if more else None)
+
+            title = "📋 Active Tier Battles"
+        else:
+            async def fetch(after):
+                rows = await self.store.page_pending(gid, after, PAGE_SIZE + 1, uid, cutoff)
+                page = rows[:PAGE_SIZE]
+                names = await self.names.resolve_many(gid, (u for p in page for u in (p.challenger_id, p.challenged_id)))
+                lines = [f"• {names[p.challenger_id]} ➜ {names[p.challenged_id]}" for p in page]
+                last = page[-1] if page else None
+                more = len(rows) > PAGE_SIZE
+                return lines, ((last.created_at, last.challenged_id) if more else None)
+
+            title = "📋 Pending Tier Battles"
+
+        view = KeysetPaginator(interaction.user.id, title, fetch, discord.Color.blurple())
+        await interaction.response.send_message(embed=await view.render(), view=view, ephemeral=True)
 
     # ----------------------------
     # /clearlist
@@ -204,82 +362,93 @@ class Tier(commands.Cog):
     @app_commands.command(name="clearlist", description="ADMIN: Clear all tier battles")
     @has_admin_role()
     async def clearlist(self, interaction: discord.Interaction):
-        for t in self.reminder_tasks.values():
-            t.cancel()
-        self.reminder_tasks.clear()
+        gid = interaction.guild_id
+        await self.store.clear_pending(gid)
+        await self.store.clear_active(gid)
+        await self.store.clear_completed(gid)
+        self.queues[gid].clear()
+        await self.store.clear_queue(gid)
 
-        self.store.clear_pending()
-        self.store.clear_active()
-        self.store.clear_completed()
+        # The timer is shared by every guild; re-arm it from what is left
+        self.scheduler.clear()
+        await self._schedule_next()
 
         await interaction.response.send_message("🧹 Tier system reset.", ephemeral=True)
 
     # ----------------------------
     # reminders + auto-loss (48h)
     # ----------------------------
-    def _start_reminder(self, challenged_id: int):
-        if challenged_id not in self.reminder_tasks:
-            self.reminder_tasks[challenged_id] = asyncio.create_task(
-                self._reminder_loop(challenged_id)
-            )
+    async def _schedule_next(self):
+        for due in await self.store.next_due():
+            self.scheduler.schedule(from_ms(due))
+
+    async def _get_user(self, user_id: int):
+        user = self.bot.get_user(user_id)
+        if user is None and self.bot.coordinator:
+            # Users are cached per shard; the leader may never have seen this one
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.HTTPException:
+                return None
+        return user
+
+    def _battles_changed(self, guild_id: int) -> None:
+        if self.bot.is_leader:
+            asyncio.create_task(self._schedule_next())
+
+    def _leadership_changed(self, leading: bool) -> None:
+        if leading:
+            asyncio.create_task(self._schedule_next())
+
+    async def _run_due(self, now: datetime):
+        # Every process keeps a timer, but only the cluster leader sweeps
+        if not self.bot.is_leader:
+            return
+        expired = await self.store.expire_pending(to_ms(now - CHALLENGE_TTL))
+        for pending in expired:
+            challenger = await self._get_user(pending.challenger_id)
+            challenged = await self._get_user(pending.challenged_id)
 
-    def _stop_reminder(self, challenged_id: int):
-        task = self.reminder_tasks.pop(challenged_id, None)
-        if task:
-            task.cancel()
+            try:
+                if challenger:
+                    await challenger.send("❌ Battle wasn’t accepted within 48 hours.")
 
-    async def _reminder_loop(self, challenged_id: int):
-        try:
-            while True:
-                await asyncio.sleep(86400)
-
-                pending = self.store.get_pending(challenged_id)
-                if not pending:
-                    return
-
-                created_at = parse_iso(pending.created_at)
-                if datetime.utcnow() - created_at >= timedelta(hours=48):
-                    self.store.remove_pending(challenged_id)
-                    self._stop_reminder(challenged_id)
-
-                    challenger = self.bot.get_user(pending.challenger_id)
-                    challenged = self.bot.get_user(challenged_id)
-
-                    if challenger:
-                        await challenger.send("❌ Battle wasn’t accepted within 48 hours.")
-
-                    if challenged:
-                        await challenged.send("❌ You did not accept the tier challenge and lost the battle.")
-
-                    log = self._admin_log()
-                    if log:
-                        await log.send(
-                            "🚫 **Tier Challenge Expired**\n"
-                            f"**Challenger:** {challenger.mention if challenger else pending.challenger_id}\n"
-                            f"**Challenged:** {challenged.mention if challenged else challenged_id}\n"
-                            "**Result:** Challenged player lost"
-                        )
-                    return
-
-                challenged = self.bot.get_user(challenged_id)
                 if challenged:
+                    await challenged.send("❌ You did not accept the tier challenge and lost the battle.")
+            except discord.HTTPException:
+                pass
+
+            self._log(
+                pending.guild_id,
+                "expired",
+                challenger=challenger.mention if challenger else pending.challenger_id,
+                challenged=challenged.mention if challenged else pending.challenged_id,
+                result="Challenged player lost",
+            )
+
+        for _, challenged_id in await self.store.pop_due_reminders(to_ms(now)):
+            challenged = await self._get_user(challenged_id)
+            if challenged:
+                try:
                     await challenged.send(
                         "⏰ Reminder: You have a pending tier challenge.\n"
                         "Reply **accept** to avoid an automatic loss."
                     )
+                except discord.HTTPException:
+                    pass
 
-        except asyncio.CancelledError:
-            return
+        await self._schedule_next()
 
 
 class WinnerSelectView(discord.ui.View):
-    def __init__(self, store, admin_log_channel_id, p1, p2, accepted_at_iso):
+    def __init__(self, store, admin_log, guild_id, p1, p2, accepted_at):
         super().__init__(timeout=60)
         self.store = store
-        self.admin_log_channel_id = admin_log_channel_id
+        self.admin_log = admin_log
+        self.guild_id = guild_id
         self.p1 = p1
         self.p2 = p2
-        self.accepted_at_iso = accepted_at_iso
+        self.accepted_at = accepted_at
 
         self.add_item(WinnerButton(p1))
         self.add_item(WinnerButton(p2))
@@ -293,39 +462,41 @@ class WinnerButton(discord.ui.Button):
     async def callback(self, interaction: discord.Interaction):
         view: WinnerSelectView = self.view
 
-        active = view.store.get_active(view.p1.id, view.p2.id)
+        gid = view.guild_id
+        # Only the click that claims the battle records it and pays out
+        active = await view.store.complete_active(gid, view.p1.id, view.p2.id)
         if not active:
             return await interaction.response.edit_message(content="❌ Battle no longer active.", view=None)
 
-        accepted_at = parse_iso(active.accepted_at)
-        elapsed = datetime.utcnow() - accepted_at
+        elapsed = timedelta(milliseconds=now_ms() - active.accepted_at)
 
         points = 5 if elapsed <= timedelta(hours=24) else 3 if elapsed <= timedelta(hours=48) else 1
 
-        view.store.remove_active(view.p1.id, view.p2.id)
-        view.store.mark_completed(view.p1.id)
-        view.store.mark_completed(view.p2.id)
-
+        # Queued together so the writer commits them as one batch
+        writes = [
+            view.store.record_match(gid, view.p1.id, view.p2.id, self.player.id, active.accepted_at),
+            view.store.mark_completed(gid, view.p1.id),
+            view.store.mark_completed(gid, view.p2.id),
+        ]
         general = interaction.client.get_cog("General")
         if general:
-            general.add_points(view.p1.id, points)
-            general.add_points(view.p2.id, points)
+            writes.append(general.add_points_many(gid, [(view.p1.id, points), (view.p2.id, points)], reason="battle"))
+        (rating_1, rating_2), *_ = await asyncio.gather(*writes)
 
         await interaction.response.edit_message(
-            content=f"🏁 Winner: **{self.player.display_name}** (+{points} points each)",
+            content=f"🏁 Winner: **{self.player.display_name}** (+{points} points each)\n"
+                    f"📈 Ratings: {view.p1.display_name} {rating_1[0]:.0f}, {view.p2.display_name} {rating_2[0]:.0f}",
             view=None
         )
 
-        log = interaction.client.get_channel(view.admin_log_channel_id)
-        if isinstance(log, discord.TextChannel):
-            await log.send(
-                f"🏁 **Tier Battle Completed**\n"
-                f"**Winner:** {self.player.mention}\n"
-                f"**Players:** {view.p1.mention} vs {view.p2.mention}"
+        if view.admin_log:
+            view.admin_log.emit(
+                "completed",
+                winner=self.player.mention,
+                players=f"{view.p1.mention} vs {view.p2.mention}",
             )
 
 
 async def setup(bot: commands.Bot):
-    guild = discord.Object(id=GUILD_ID)
-    await bot.add_cog(Tier(bot), guild=guild)
+    await bot.add_cog(Tier(bot, bot.store, bot.names), guilds=guild_objects())
 
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from storage import TRANSFER_COLUMNS, AsyncDataStore, DataStore
+
+FORMATS = ("csv", "ndjson")
+KINDS = tuple(TRANSFER_COLUMNS)
+
+# Rows per import transaction
+CHUNK_ROWS = 10_000
+
+# Differences kept for the dry-run report
+DIFF_SAMPLES = 10
+
+
+def detect_format(path: str) -> str:
+    return "ndjson" if path.lower().endswith((".ndjson", ".jsonl", ".json")) else "csv"
+
+
+# ----------------------------
+# FILE FORMATS
+# ----------------------------
+# Every column is an integer (IDs, points, epoch-ms times). CSV files start
+# with a header row; NDJSON has one object per line. Both are read and
+# written one row at a time.
+
+def read_rows(fp: TextIO, fmt: str, kind: str) -> Iterator[tuple]:
+    columns = TRANSFER_COLUMNS[kind]
+    if fmt == "csv":
+        reader = csv.reader(fp)
+        header = next(reader, [])
+        missing = set(columns) - set(header)
+        if missing:
+            raise ValueError(f"missing CSV columns: {', '.join(sorted(missing))}")
+        # Positional lookups: much cheaper than a dict per row
+        positions = [header.index(c) for c in columns]
+        for line, record in enumerate(reader, start=2):
+            try:
+                yield tuple(int(record[i]) for i in positions)
+            except (IndexError, ValueError):
+                raise ValueError(f"line {line}: expected integer {', '.join(columns)}") from None
+    else:
+        for line, text in enumerate(fp, start=1):
+            if text.strip():
+                try:
+                    record = json.loads(text)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"line {line}: {e}") from None
+                yield _coerce(record, columns, line)
+
+
+def _coerce(record, columns: Tuple[str, ...], line: int) -> tuple:
+    try:
+        return tuple(int(record[c]) for c in columns)
+    except KeyError as e:
+        raise ValueError(f"line {line}: missing {e}") from None
+    except (TypeError, ValueError):
+        raise ValueError(f"line {line}: {', '.join(columns)} must be integers") from None
+
+
+def write_rows(fp: TextIO, fmt: str, kind: str, rows: Iterable[tuple]) -> int:
+    columns = TRANSFER_COLUMNS[kind]
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(fp)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            fp.write(json.dumps(dict(zip(columns, row))) + "\n")
+            count += 1
+    return count
+
+
+def chunked(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+# ----------------------------
+# IMPORT
+# ----------------------------
+
+@dataclass
+class ImportReport:
+    kind: str
+    dry_run: bool
+    rows: int = 0
+    added: int = 0
+    changed: int = 0
+    seconds: float = 0.0
+    # Dry runs keep up to DIFF_SAMPLES (stored, imported) pairs; stored is None for new rows
+    samples: List[Tuple[Optional[tuple], tuple]] = field(default_factory=list)
+
+    def note(self, added: List[tuple], changed: List[Tuple[tuple, tuple]]) -> None:
+        """Count a dry-run chunk's differences, keeping the first few as samples."""
+        self.added += len(added)
+        self.changed += len(changed)
+        room = DIFF_SAMPLES - len(self.samples)
+        self.samples += [(None, row) for row in added[:room]]
+        room = DIFF_SAMPLES - len(self.samples)
+        self.samples += changed[:room]
+
+    def progress(self) -> str:
+        rate = self.rows / self.seconds if self.seconds else 0.0
+        verb = "checked" if self.dry_run else "imported"
+        return f"{self.rows:,} {self.kind} rows {verb} ({rate:,.0f}/s)"
+
+    def summary(self) -> str:
+        columns = ", ".join(TRANSFER_COLUMNS[self.kind])
+        lines = [
+            f"{self.progress()} in {self.seconds:.1f}s: "
+            f"{self.added:,} new, {self.changed:,} changed, {self.rows - self.added - self.changed:,} unchanged"
+            + (" (dry run, nothing written)" if self.dry_run else "")
+        ]
+        for stored, imported in self.samples:
+            lines.append(f"  + {imported}" if stored is None else f"  ~ {stored} -> {imported}")
+        if self.samples:
+            lines.insert(1, f"  ({columns})")
+        return "\n".join(lines)
+
+
+def import_rows(
+    store: DataStore,
+    guild_id: int,
+    kind: str,
+    rows: Iterable[tuple],
+    dry_run: bool = False,
+    chunk: int = CHUNK_ROWS,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """Upsert ``rows`` into one guild, a transaction per chunk; with ``dry_run``, only diff them."""
+    report = ImportReport(kind, dry_run)
+    started = time.perf_counter()
+    written = False
+    try:
+        for batch in chunked(rows, chunk):
+            if dry_run:
+                report.note(*store.diff_rows(guild_id, kind, batch))
+            else:
+                added, changed = store.import_rows(guild_id, kind, batch)
+                written = True
+                report.added += added
+                report.changed += changed
+            report.rows += len(batch)
+            report.seconds = time.perf_counter() - started
+            if progress:
+                progress(report)
+    finally:
+        # Chunks before a bad row stay committed: announce them either way
+        if written:
+            store.mark_changed(guild_id, kind)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+async def import_rows_async(
+    store: AsyncDataStore,
+    guild_id: int,
+    kind: str,
+    rows: Iterable[tuple],
+    dry_run: bool = False,
+    chunk: int = CHUNK_ROWS,
+    progress: Optional[Callable[[ImportReport], object]] = None,
+) -> ImportReport:
+    """``import_rows`` for the running bot: parsing happens off the event loop and caches are reloaded after.
+
+    The caches are reloaded even when a later chunk fails, since the chunks
+    before it are already committed.
+    """
+    report = ImportReport(kind, dry_run)
+    started = time.perf_counter()
+    batches = chunked(rows, chunk)
+    written = False
+    try:
+        while batch := await asyncio.to_thread(next, batches, None):
+            if dry_run:
+                report.note(*await store.diff_rows(guild_id, kind, batch))
+            else:
+                added, changed = await store.import_rows(guild_id, kind, batch)
+                written = True
+                report.added += added
+                report.changed += changed
+            report.rows += len(batch)
+            report.seconds = time.perf_counter() - started
+            if progress:
+                await progress(report)
+    finally:
+        if written:
+            await store.finish_import(guild_id, kind)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+# Run against a stopped bot: a single-process bot does not see changes
+# made from outside (use /import instead while it is up).
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import/export of points and battle state")
+    parser.add_argument("--db", default="bot_state.sqlite3")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("export", "import"):
+        p = sub.add_parser(name)
+        p.add_argument("kind", choices=KINDS)
+        p.add_argument("path", help="file to write/read ('-' for stdout/stdin)")
+        p.add_argument("--guild", type=int, required=True)
+        p.add_argument("--format", choices=FORMATS, help="default: from the file extension, else csv")
+    sub.choices["import"].add_argument("--dry-run", action="store_true", help="report the differences without writing")
+    sub.choices["import"].add_argument("--chunk", type=int, default=CHUNK_ROWS, help="rows per transaction")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    store = DataStore(args.db)
+    try:
+        if args.command == "export":
+            started = time.perf_counter()
+            if args.path == "-":
+                count = write_rows(sys.stdout, fmt, args.kind, store.export_rows(args.guild, args.kind))
+            else:
+                with open(args.path, "w", newline="", encoding="utf-8") as fp:
+                    count = write_rows(fp, fmt, args.kind, store.export_rows(args.guild, args.kind))
+            print(f"Exported {count:,} {args.kind} rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        else:
+            def progress(report: ImportReport) -> None:
+                print(f"\r{report.progress()}", end="", file=sys.stderr, flush=True)
+
+            fp = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+            try:
+                report = import_rows(
+                    store, args.guild, args.kind, read_rows(fp, fmt, args.kind),
+                    dry_run=args.dry_run, chunk=args.chunk, progress=progress,
+                )
+            except ValueError as e:
+                committed = "" if args.dry_run else " (chunks before it were committed)"
+                print(f"\n❌ {os.path.basename(args.path)}: {e}{committed}", file=sys.stderr)
+                return 1
+            finally:
+                if fp is not sys.stdin:
+                    fp.close()
+            print(f"\r{report.summary()}", file=sys.stderr)
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List
+
+import discord
+
+from ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+
+class WelcomePipeline:
+    """Coalesces member joins into batched welcome messages.
+
+    Joins are queued without blocking the gateway handler. A single worker
+    waits ``window`` seconds after the first join, then sends one message
+    for everyone who arrived in the meantime (up to ``max_batch``), paced by
+    a per-channel token bucket. While the bucket is empty, joins keep piling
+    into the next batch instead of into more messages. When the queue is
+    full, new joins are shed (counted, not welcomed) rather than growing the
+    backlog without bound.
+    """
+
+    def __init__(
+        self,
+        send_batch: Callable[[List[discord.Member]], Awaitable[None]],
+        window: float = 3.0,
+        max_batch: int = 50,
+        max_queue: int = 1000,
+        bucket: TokenBucket | None = None,
+    ):
+        self._send_batch = send_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._bucket = bucket or TokenBucket()
+        self._task: asyncio.Task | None = None
+
+        self.joins_seen = 0
+        self.joins_shed = 0
+        self.messages_sent = 0
+        self.members_coalesced = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def submit(self, member: discord.Member) -> bool:
+        self.joins_seen += 1
+        try:
+            self._queue.put_nowait(member)
+            return True
+        except asyncio.QueueFull:
+            self.joins_shed += 1
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "joins_seen": self.joins_seen,
+            "joins_shed": self.joins_shed,
+            "messages_sent": self.messages_sent,
+            "members_coalesced": self.members_coalesced,
+            "queue_depth": self._queue.qsize(),
+        }
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.window)
+            await self._bucket.acquire()
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._send_batch(batch)
+            except Exception:
+                log.exception("welcome batch of %d failed", len(batch))
+                continue
+            self.messages_sent += 1
+            self.members_coalesced += len(batch) - 1